@@ -11,6 +11,7 @@ from metis.services.mailer.internships import schedule_internship_approved_email
 
 from ...permissions import IsEducationOfficeMember
 from ...serializers import InternshipSerializer, MentorTinySerializer
+from ...serializers.disciplines import DisciplineSerializer
 from ..base import BaseModelViewSet
 from .projects import ProjectNestedModelViewSet
 
@@ -39,6 +40,12 @@ class InternshipViewSet(ProjectNestedModelViewSet):
 
         return user_id
 
+    @action(detail=True, pagination_class=None)
+    def disciplines(self, request, *args, **kwargs):
+        """Return the disciplines that can be chosen for the internship, within the constraints of its track."""
+        disciplines = self.get_object().get_feasible_disciplines()
+        return Response(DisciplineSerializer(disciplines, many=True).data)
+
     @action(detail=True, methods=["post"], permission_classes=(CanManageInternshipPlace,))
     def add_mentor(self, request, *args, **kwargs):
         """Add mentor to internship."""
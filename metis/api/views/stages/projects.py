@@ -8,6 +8,8 @@ from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 
 from metis.models import Project, Student, User
+from metis.services.analytics import get_evaluation_aggregates
+from metis.services.auditor import audit_discipline_constraints
 
 from ...permissions import IsEducationOfficeMember
 from ...serializers.stages import ProjectSerializer, StudentUserSerializer
@@ -61,6 +63,28 @@ class ProjectViewSet(EducationNestedModelViewSet):
         )
         return Response(StudentUserSerializer(students, many=True, context={"request": request}).data)
 
+    @action(detail=True, pagination_class=None, url_path="constraint-audit")
+    @method_decorator(never_cache)
+    def constraint_audit(self, request, *args, **kwargs):
+        """Return the violations of the discipline rules of the tracks, by the internships of the students."""
+        violations = audit_discipline_constraints(self.get_object())
+        return Response([violation._asdict() for violation in violations])
+
+    @action(detail=True, pagination_class=None, url_path="evaluation-analytics")
+    @method_decorator(never_cache)
+    def evaluation_analytics(self, request, *args, **kwargs):
+        """Return the aggregates of the scores of the approved evaluations, by place, mentor, discipline or period."""
+        try:
+            aggregates = get_evaluation_aggregates(
+                self.get_object(),
+                by=request.query_params.get("by", "place"),
+                intermediate=int(request.query_params.get("intermediate", 0)),
+            )
+        except ValueError as exc:
+            raise ValidationError(str(exc)) from exc
+
+        return Response(aggregates)
+
 
 class ProjectNestedModelViewSet(BaseModelViewSet):
     """Base viewset for project child models."""
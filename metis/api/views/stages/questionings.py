@@ -1,8 +1,17 @@
+from collections import Counter
+
+from django.urls import reverse
+from pydantic import ValidationError as PydanticValidationError
 from rest_framework.decorators import action
 from rest_framework.exceptions import PermissionDenied, ValidationError
 from rest_framework.response import Response
 
 from metis.models import Questioning
+from metis.services.file_generator.planner.planning import (
+    PlanningExcelOptions,
+    get_cached_planning_inputs,
+    solve_planning,
+)
 from metis.tasks.emails import schedule_questioning_email
 
 from ...permissions import IsEducationOfficeMember
@@ -36,3 +45,68 @@ class QuestioningViewSet(ProjectNestedModelViewSet):
         schedule_questioning_email(questioning, filtered_ids=ids)
 
         return Response({"status": "ok", "message": "Emails scheduled."})
+
+    @action(detail=True, methods=["post"])
+    def planning(self, request, *args, **kwargs):
+        """Make a planning proposal for a student tops questioning, with the options in the request data.
+
+        The planning inputs are cached until they change, so successive calls with other options only redo the solve.
+        A sweep is rejected, it runs as a background job from the planning file (see `PlanningFileView`).
+        """
+        questioning = self.get_object()
+
+        if questioning.type != Questioning.STUDENT_TOPS:
+            raise ValidationError({"type": "Questioning is not a student tops questioning."})
+
+        try:
+            options = PlanningExcelOptions.model_validate(request.data)
+        except PydanticValidationError as exc:
+            errors = {".".join(map(str, error["loc"])) or "options": error["msg"] for error in exc.errors()}
+            raise ValidationError(errors) from exc
+
+        if options.sweep:
+            # a sweep solves the planning once per seed, which is too slow for a request
+            url = request.build_absolute_uri(reverse("planning_file", args=[questioning.id]))
+            raise ValidationError(
+                {"sweep": f"A sweep is not supported here, it runs as a background job: {url}?sweep={options.sweep}"}
+            )
+
+        inputs = get_cached_planning_inputs(questioning)
+
+        try:
+            result = solve_planning(inputs, options)
+        except ValueError as exc:
+            raise ValidationError({"options": str(exc)}) from exc
+
+        students = Counter(project_place_id for _, project_place_id, _, _ in result.planning)
+        planned_student_ids = {student_id for student_id, _, _, _ in result.planning}
+
+        return Response(
+            {
+                "seed": result.seed,
+                "pairs": [
+                    {"student": student_id, "project_place": project_place_id, "rank": rank, "preassigned": preassigned}
+                    for student_id, project_place_id, rank, preassigned in result.planning
+                ],
+                "ranks": dict(sorted(Counter(rank for _, _, rank, _ in result.planning).items())),
+                "unplanned_students": [
+                    student_id
+                    for student_id, tops in inputs.student_tops
+                    if tops is not None
+                    and student_id in inputs.target_student_ids
+                    and student_id not in planned_student_ids
+                    and student_id not in (options.students_to_skip or [])
+                ],
+                "unfilled_places": [
+                    {
+                        "project_place": project_place_id,
+                        "students": students[project_place_id],
+                        "min": inputs.project_place_minimum.get(project_place_id, 0),
+                        "max": max_students,
+                    }
+                    for project_place_id, max_students in inputs.project_place_availability.items()
+                    if students[project_place_id] < inputs.project_place_minimum.get(project_place_id, 0)
+                    and project_place_id not in (options.places_to_skip or [])
+                ],
+            }
+        )
@@ -5,7 +5,7 @@ from rest_framework.exceptions import PermissionDenied
 from rest_framework.permissions import SAFE_METHODS, BasePermission
 from rest_framework.response import Response
 
-from metis.models import Absence, Signature, Timesheet
+from metis.models import Absence, Timesheet
 
 from ...serializers import AbsenceSerializer, TimesheetSerializer
 from .internships import InternshipNestedModelViewSet
@@ -79,8 +79,10 @@ class TimesheetViewSet(InternshipNestedModelViewSet):
         timesheet_ids = request.data.get("ids", [])
         signed_text = request.data.get("signed_text", "")
 
-        for timesheet in Timesheet.objects.filter(internship=internship, id__in=timesheet_ids, is_approved=False):
-            signature = Signature.objects.create(content_object=timesheet, user=request.user, signed_text=signed_text)
-            Timesheet.approve(timesheet, signature)
+        Timesheet.approve_in_bulk(
+            Timesheet.objects.filter(internship=internship, id__in=timesheet_ids),
+            user=request.user,
+            signed_text=signed_text,
+        )
 
         return Response(status=status.NO_CONTENT)
@@ -0,0 +1,36 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from metis.models import Project
+from metis.services.auditor import audit_discipline_constraints
+
+
+class Command(BaseCommand):
+    """Check the internships of all the students of a project against the discipline rules of their track.
+
+    :usage:
+    >>> python manage.py audit_constraints <project_id> [--json]
+    """
+
+    def add_arguments(self, parser):
+        """Add the command arguments."""
+        parser.add_argument("project_id", type=int)
+        parser.add_argument("--json", action="store_true", help="Output the violations as JSON.")
+
+    def handle(self, *args, **options):
+        """Handle command."""
+        project = Project.objects.get(id=options["project_id"])
+        violations = audit_discipline_constraints(project)
+
+        if options["json"]:
+            self.stdout.write(json.dumps([violation._asdict() for violation in violations], indent=2))
+            return
+
+        for violation in violations:
+            internship = f"internship {violation.internship_id}" if violation.internship_id else "track"
+            self.stdout.write(
+                f"{violation.student} ({violation.track}, {internship}): [{violation.code}] {violation.message}"
+            )
+
+        self.stdout.write(f"{len(violations)} violation(s) in {project}.")
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:58
+
+from django.db import migrations, models
+from django.db.models import Q, Sum
+from django.db.models.functions import Coalesce, ExtractHour, ExtractMinute
+
+
+def update_minutes(apps, schema_editor) -> None:
+    """Fill in the minutes of the timesheets of the existing internships."""
+    Internship = apps.get_model("metis", "Internship")
+    Timesheet = apps.get_model("metis", "Timesheet")
+
+    def get_minutes(field: str) -> models.Expression:
+        return ExtractHour(field) * 60 + ExtractMinute(field)
+
+    minutes = Coalesce(get_minutes("end_time_am") - get_minutes("start_time_am"), 0) + Coalesce(
+        get_minutes("end_time_pm") - get_minutes("start_time_pm"), 0
+    )
+    rows = (
+        Timesheet.objects.values("internship_id")
+        .annotate(total=Sum(minutes), approved=Sum(minutes, filter=Q(is_approved=True), default=0))
+        .values_list("internship_id", "total", "approved")
+    )
+
+    # bulk save to skip auto_now
+    updates = [
+        Internship(id=internship_id, total_minutes=total, approved_minutes=approved)
+        for internship_id, total, approved in rows
+    ]
+    Internship.objects.bulk_update(updates, ["total_minutes", "approved_minutes"], batch_size=1000)
+
+
+class Migration(migrations.Migration):  # noqa: D101
+    dependencies = [
+        ("metis", "0060_remark_tags"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="internship",
+            name="total_minutes",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="internship",
+            name="approved_minutes",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(update_minutes, migrations.RunPython.noop),
+    ]
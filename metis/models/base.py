@@ -1,5 +1,8 @@
+import weakref
+from threading import local
+
 from django.contrib.contenttypes.fields import GenericRelation
-from django.db import models
+from django.db import models, transaction
 
 from .rel.snapshots import Snapshot, save_snapshot
 from .validators import validate_list_of_strings
@@ -30,6 +33,44 @@ class TagsMixin(models.Model):
         abstract = True
 
 
+class ComputedTagsMixin(TagsMixin):
+    """A mixin for models with tags that are computed from their related objects (see `sync_tags`)."""
+
+    class Meta:  # noqa: D106
+        abstract = True
+
+    @classmethod
+    def get_tags_in_bulk(cls, objects: list, *, type: str = "all") -> dict[int, list[str]]:
+        """Process the tags of several objects, as pk: list of tags."""
+        raise NotImplementedError
+
+    @classmethod
+    def get_tags_fields(cls, *, type: str = "all") -> list[str]:
+        """Get the fields that `get_tags_in_bulk` sets on the objects for a type of tags, to save with the tags."""
+        return ["tags"]
+
+    @classmethod
+    def refresh_tags(cls, queryset: models.QuerySet, *, type: str = "all", batch_size: int = 1000) -> int:
+        """Recompute the tags of all the objects of a queryset, in batches, without calling clean() on the models.
+
+        Every batch takes the queries of `get_tags_in_bulk` and one bulk update (see `get_tags_fields`).
+
+        :returns: The number of objects.
+        """
+        count, last_id = 0, 0
+        queryset = queryset.order_by("pk")
+
+        while objects := list(queryset.filter(pk__gt=last_id)[:batch_size]):
+            objects_tags = cls.get_tags_in_bulk(objects, type=type)
+            for obj in objects:
+                obj.tags = objects_tags[obj.pk]
+
+            cls.objects.bulk_update(objects, cls.get_tags_fields(type=type))
+            count, last_id = count + len(objects), objects[-1].pk
+
+        return count
+
+
 class BaseModel(models.Model):
     """Base model for models that require auditing."""
 
@@ -63,3 +104,45 @@ class BaseModel(models.Model):
         # self.full_clean()
         super().save(*args, **kwargs)
         save_snapshot(self.__class__, self, user=self.updated_by)
+
+
+_pending_tags = local()
+
+
+def sync_tags(model: type[ComputedTagsMixin], object_id: int, *, type: str = "all") -> None:
+    """Update the tags of an object when the current transaction is committed, or immediately outside of one.
+
+    The updates are coalesced until the commit: the tags of every object (and type of tags) are only recomputed
+    once, e.g. when many timesheets of an internship are approved in one transaction.
+
+    :param model: The model of the object, with a `refresh_tags` class method.
+    :param object_id: The id of the object.
+    :param type: The type of tags to update.
+    """
+    state = _pending_tags.__dict__
+
+    # the flag only holds a weak reference to the callback of the transaction: the callback is released when it ran,
+    # or when the transaction (or savepoint) it was registered in is rolled back, along with the objects marked since
+    registered = (flag := state.get("flag")) is not None and flag() is not None
+    if not registered:
+        state["objects"] = {}
+    state["objects"].setdefault((model, type), set()).add(object_id)
+
+    if not registered:
+
+        def callback() -> None:
+            flush_tags()
+
+        state["flag"] = weakref.ref(callback)
+        transaction.on_commit(callback, robust=True)
+
+
+def flush_tags() -> None:
+    """Update the tags of the objects that were marked by `sync_tags`."""
+    state = _pending_tags.__dict__
+
+    try:
+        for (model, type), object_ids in state.pop("objects", {}).items():
+            model.refresh_tags(model.objects.filter(pk__in=object_ids), type=type)
+    finally:
+        state.pop("flag", None)
@@ -5,7 +5,7 @@ from django.db import models
 from django.urls import reverse
 from modeltranslation.translator import TranslationOptions
 
-from .base import BaseModel, TagsMixin
+from .base import BaseModel, ComputedTagsMixin
 from .rel import (
     AddressesMixin,
     FilesMixin,
@@ -15,6 +15,8 @@ from .rel import (
     TextEntriesMixin,
     append_files_tags,
     append_remarks_tags,
+    get_files_counts,
+    get_remarks_counts,
 )
 
 
@@ -29,17 +31,35 @@ def get_place_tags(obj: "Place", *, type: str = "all") -> list[str]:
     :param type: The type of tags to process.
     :returns: A list of tags.
     """
-    tags = obj.tags
+    return get_places_tags([obj], type=type)[obj.pk]
 
-    # files
-    if type in {"all", "files"}:
-        tags = append_files_tags(obj, tags=tags)
 
-    # remarks
-    if type in {"all", "remarks"}:
-        tags = append_remarks_tags(obj, tags=tags)
+def get_places_tags(places: list["Place"], *, type: str = "all") -> dict[int, list[str]]:
+    """For several places, process the tags, with one count query for each type of tags.
 
-    return list(set(tags))
+    :param places: A list of saved instances of the Place class.
+    :param type: The type of tags to process.
+    :returns: The tags, as place_id: list of tags.
+    """
+    place_ids = [place.pk for place in places]
+    files_counts = get_files_counts(Place, place_ids) if type in {"all", "files"} else {}
+    remarks_counts = get_remarks_counts(Place, place_ids) if type in {"all", "remarks"} else {}
+    places_tags = {}
+
+    for obj in places:
+        tags = obj.tags
+
+        # files
+        if type in {"all", "files"}:
+            tags = append_files_tags(obj, tags=tags, count=files_counts.get(obj.pk, 0))
+
+        # remarks
+        if type in {"all", "remarks"}:
+            tags = append_remarks_tags(obj, tags=tags, count=remarks_counts.get(obj.pk, 0))
+
+        places_tags[obj.pk] = list(set(tags))
+
+    return places_tags
 
 
 class PlaceLocation(BaseModel):
@@ -82,7 +102,14 @@ class PlaceTypeTranslationOptions(TranslationOptions):
 
 
 class Place(
-    AddressesMixin, FilesMixin, PhoneNumbersMixin, LinksMixin, RemarksMixin, TagsMixin, TextEntriesMixin, BaseModel
+    AddressesMixin,
+    FilesMixin,
+    PhoneNumbersMixin,
+    LinksMixin,
+    RemarksMixin,
+    ComputedTagsMixin,
+    TextEntriesMixin,
+    BaseModel,
 ):
     """Places where internships can be done.
 
@@ -115,10 +142,9 @@ class Place(
             raise ValidationError("Place type must be in the same education.")
 
     @classmethod
-    def update_tags(cls, place: "Place", *, type: str = "all") -> None:
-        """Update tags for a place, without calling clean() on the model."""
-        tags = get_place_tags(place, type=type)
-        cls.objects.filter(id=place.id).update(tags=tags)
+    def get_tags_in_bulk(cls, objects: list["Place"], *, type: str = "all") -> dict[int, list[str]]:
+        """Process the tags of several places (see `get_places_tags`)."""
+        return get_places_tags(objects, type=type)
 
     def __str__(self) -> str:
         return self.name
@@ -1,11 +1,20 @@
+import functools
+from collections.abc import Iterable
+
 from django.contrib.contenttypes.fields import GenericForeignKey, GenericRelation
 from django.contrib.contenttypes.models import ContentType
-from django.db import models
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django_countries.fields import CountryField
 
 from metis.services.mapbox import MapboxFeature
 
 
+COORDINATES_CACHE_TIMEOUT = 60 * 60 * 24  # seconds
+
+
 class Address(models.Model):
     """Reusable address model."""
 
@@ -45,3 +54,58 @@ class AddressesMixin(models.Model):
 
     class Meta:
         abstract = True
+
+
+def _coordinates_key(content_type_id: int, object_id: int) -> str:
+    return f"coordinates_{content_type_id}_{object_id}"
+
+
+def get_coordinates(model: type[models.Model], object_ids: Iterable[int]) -> dict[int, tuple[float, float]]:
+    """Get the stored (geocoded) coordinates of the addresses of some objects.
+
+    The coordinates of each object are cached (also when it has none), until one of its addresses is changed, so only
+    the objects that are not in the cache are loaded, in one query.
+
+    :param model: The model of the objects, e.g. Place or User.
+    :param object_ids: The ids of the objects.
+    :returns: A dictionary of object_id: (latitude, longitude), for the first geocoded address of each object.
+    """
+    content_type_id = ContentType.objects.get_for_model(model).id
+    keys = {object_id: _coordinates_key(content_type_id, object_id) for object_id in object_ids}
+    cached = cache.get_many(keys.values())
+    coordinates = {object_id: cached[key] for object_id, key in keys.items() if key in cached}
+    missing = [object_id for object_id in keys if object_id not in coordinates]
+
+    if missing:
+        loaded = {}
+        addresses = Address.objects.filter(
+            content_type_id=content_type_id, object_id__in=missing, mapbox_feature__isnull=False
+        ).order_by("id")
+
+        for object_id, mapbox_feature in addresses.values_list("object_id", "mapbox_feature"):
+            if object_id in loaded or not mapbox_feature:
+                continue
+            try:
+                feature = MapboxFeature(mapbox_feature)
+                loaded[object_id] = (float(feature.latitude), float(feature.longitude))
+            except (KeyError, IndexError, TypeError, ValueError):
+                continue
+
+        # objects without coordinates are cached as an empty tuple
+        cache.set_many({keys[object_id]: loaded.get(object_id, ()) for object_id in missing}, COORDINATES_CACHE_TIMEOUT)
+        coordinates.update(loaded)
+
+    return {object_id: value for object_id, value in coordinates.items() if value}
+
+
+def invalidate_coordinates(content_type_id: int, object_id: int) -> None:
+    """Remove the cached coordinates of an object."""
+    cache.delete(_coordinates_key(content_type_id, object_id))
+
+
+@receiver(post_save, sender=Address)
+@receiver(post_delete, sender=Address)
+def invalidate_coordinates_on_change(sender, instance, **kwargs):
+    """Invalidate the cached coordinates of the object of a changed address, now and when the transaction commits."""
+    invalidate_coordinates(instance.content_type_id, instance.object_id)
+    transaction.on_commit(functools.partial(invalidate_coordinates, instance.content_type_id, instance.object_id))
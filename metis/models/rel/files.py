@@ -7,7 +7,7 @@ from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.urls import reverse
 
-from metis.models.base import TagsMixin
+from metis.models.base import TagsMixin, sync_tags
 from metis.services.file_guard import check_file_access
 from metis.services.s3 import delete_s3_object
 
@@ -16,13 +16,27 @@ if TYPE_CHECKING:
     from metis.models.users import User
 
 
-def append_files_tags(obj, *, tags: list[str]) -> list[str]:
-    """For an object, process the tags."""
+def append_files_tags(obj, *, tags: list[str], count: int | None = None) -> list[str]:
+    """For an object, process the tags. The count of files is queried if it is not given."""
     tags = [tag for tag in tags if not tag.startswith("files.")]
-    tags.append(f"files.count:{obj.files.count()}")
+    tags.append(f"files.count:{obj.files.count() if count is None else count}")
     return tags
 
 
+def get_files_counts(model: type[models.Model], object_ids: list[int]) -> dict[int, int]:
+    """Count the files of several objects of a model, in one query.
+
+    :returns: The counts, as object_id: count (objects without files are left out).
+    """
+    return dict(
+        File.objects.filter(content_type=ContentType.objects.get_for_model(model), object_id__in=object_ids)
+        .order_by()
+        .values("object_id")
+        .annotate(count=models.Count("id"))
+        .values_list("object_id", "count")
+    )
+
+
 def get_upload_path(instance, filename) -> str:
     """Return the path to upload a file."""
     return f"private/{instance.content_type_id}/{instance.object_id}/{filename}".lower()
@@ -140,8 +154,6 @@ def sync_file_tags(instance):
     """Sync the file tags of the associated object."""
     from metis.models import Internship, Place
 
-    if isinstance(instance.content_object, Internship):
-        Internship.update_tags(instance.content_object, type="files")
-
-    if isinstance(instance.content_object, Place):
-        Place.update_tags(instance.content_object, type="files")
+    model = ContentType.objects.get_for_id(instance.content_type_id).model_class()
+    if model in {Internship, Place}:
+        sync_tags(model, instance.object_id, type="files")
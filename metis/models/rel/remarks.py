@@ -4,17 +4,30 @@ from django.db import models
 from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
-from ..base import BaseModel, TagsMixin
+from ..base import BaseModel, TagsMixin, sync_tags
 from .snapshots import save_snapshot
 
 
-def append_remarks_tags(obj, *, tags: list[str]) -> list[str]:
-    """For an object, process the tags."""
+def append_remarks_tags(obj, *, tags: list[str], count: int | None = None) -> list[str]:
+    """For an object, process the tags. The count of remarks is queried if it is not given."""
     tags = [tag for tag in tags if not tag.startswith("remarks.")]
-    tags.append(f"remarks.count:{obj.remarks.count()}")
+    tags.append(f"remarks.count:{obj.remarks.count() if count is None else count}")
     return tags
 
 
+def get_remarks_counts(model: type[models.Model], object_ids: list[int]) -> dict[int, int]:
+    """Count the remarks of several objects of a model, in one query.
+
+    :returns: The counts, as object_id: count (objects without remarks are left out).
+    """
+    return dict(
+        Remark.objects.filter(content_type=ContentType.objects.get_for_model(model), object_id__in=object_ids)
+        .values("object_id")
+        .annotate(count=models.Count("id"))
+        .values_list("object_id", "count")
+    )
+
+
 class Remark(TagsMixin, BaseModel):
     """Remarks made by administrators.
 
@@ -61,8 +74,6 @@ def sync_remark_tags(instance):
     """Sync the remark tags of the associated object."""
     from metis.models import Internship, Place
 
-    if isinstance(instance.content_object, Internship):
-        Internship.update_tags(instance.content_object, type="remarks")
-
-    if isinstance(instance.content_object, Place):
-        Place.update_tags(instance.content_object, type="remarks")
+    model = ContentType.objects.get_for_id(instance.content_type_id).model_class()
+    if model in {Internship, Place}:
+        sync_tags(model, instance.object_id, type="remarks")
@@ -1,12 +1,17 @@
+import functools
 import math
 from collections import Counter
+from collections.abc import Iterable
+from typing import NamedTuple
+from uuid import uuid4
 
 from django.contrib.contenttypes.fields import GenericForeignKey, GenericRelation
 from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.db import models, transaction
 from django.db.models.query import QuerySet
-from django.db.models.signals import m2m_changed, post_save
+from django.db.models.signals import m2m_changed, post_delete, post_save
 from django.dispatch import receiver
 
 from metis.models import Discipline
@@ -57,71 +62,330 @@ class DisciplineConstraint(models.Model):
         return f"{self.content_object} ({self.min_count}..{self.max_count})"
 
 
-@receiver(post_save, sender=DisciplineConstraint)
-def check_constraints(sender, instance, **kwargs):
-    content_object = instance.content_object
+class CompiledConstraints(NamedTuple):
+    """The discipline constraints of an object, compiled to integer bitmasks, for validation without queries.
 
-    if not content_object.check_constraints_compatibility():
-        raise ValidationError("The new constraint conflicts with existing constraints.")
+    - bits: the bit of each discipline in the masks, as discipline_id: bit
+    - masks: the disciplines of each constraint, as a bitmask
+    - min_counts, max_counts, max_repeats: the bounds of each constraint (None if there is no bound)
 
+    The constraints are ordered by id.
+    """
 
-@receiver(m2m_changed, sender=DisciplineConstraint.disciplines.through)
-def check_constraints_on_disciplines_update(sender, instance, action, **kwargs):
-    if action in ["post_add", "post_remove", "post_clear"]:
-        content_object = instance.content_object
+    bits: dict[int, int]
+    masks: tuple[int, ...]
+    min_counts: tuple[int | None, ...]
+    max_counts: tuple[int | None, ...]
+    max_repeats: tuple[int | None, ...]
+
+    @property
+    def discipline_ids(self) -> list[int]:
+        """The ids of all the disciplines in the constraints."""
+        return list(self.bits)
+
+    def get_discipline_ids(self, index: int) -> list[int]:
+        """Get the ids of the disciplines of a constraint, by index."""
+        return [discipline_id for discipline_id, bit in self.bits.items() if self.masks[index] >> bit & 1]
+
+    def is_compatible(self) -> bool:
+        """Check that no two constraints with common disciplines and overlapping counts have a different max_repeat."""
+        for i in range(len(self.masks)):
+            for j in range(i + 1, len(self.masks)):
+                if not self.masks[i] & self.masks[j]:
+                    continue
 
-        if not content_object.check_constraints_compatibility():
-            raise ValidationError("The constraint's disciplines conflict with another constraint.")
+                min_count1, max_count1 = self.min_counts[i] or 0, self.max_counts[i] or math.inf
+                min_count2, max_count2 = self.min_counts[j] or 0, self.max_counts[j] or math.inf
 
+                if max_count1 < min_count2 or max_count2 < min_count1:
+                    continue
 
-class DisciplineConstraintsMixin(models.Model):
-    constraints = GenericRelation(DisciplineConstraint)
+                if (
+                    None not in (self.max_repeats[i], self.max_repeats[j])
+                    and self.max_repeats[i] != self.max_repeats[j]
+                ):
+                    return False
 
-    class Meta:
-        abstract = True
+        return True
 
-    def _constraints_conflict(self, constraint1: DisciplineConstraint, constraint2: DisciplineConstraint) -> bool:
-        allowed_disciplines1 = set(constraint1.disciplines.values_list("id", flat=True))
-        allowed_disciplines2 = set(constraint2.disciplines.values_list("id", flat=True))
+    def validate(self, discipline_ids: list[int]) -> bool:
+        """Validate a list of discipline ids against the constraints (see `validate_discipline_constraints`)."""
+        discipline_counts = Counter(discipline_ids)
+        counts = [(1 << self.bits[d], count) for d, count in discipline_counts.items() if d in self.bits]
 
-        common_disciplines = allowed_disciplines1.intersection(allowed_disciplines2)
+        for mask, min_count, max_count, max_repeat in zip(
+            self.masks, self.min_counts, self.max_counts, self.max_repeats, strict=True
+        ):
+            intersecting_counts = [count for bit, count in counts if mask & bit]
+            total = sum(intersecting_counts)
 
-        if not common_disciplines:
-            return False
+            if min_count is not None and total < min_count:
+                return False
+            if max_count is not None and total > max_count:
+                return False
+            if max_repeat is not None and max(intersecting_counts, default=0) > max_repeat:
+                return False
+
+        return True
 
-        min_count1, max_count1 = self._get_count_bounds(constraint1)
-        min_count2, max_count2 = self._get_count_bounds(constraint2)
+    def get_feasible_disciplines(self, covered: dict[int, int], remaining: int) -> frozenset[int]:
+        """Get the disciplines that can be chosen next, and still leave a valid choice for the remaining internships.
+
+        The disciplines that are not part of the constraints are not counted, as in `validate`.
+
+        :param covered: The number of times each discipline was already chosen, as discipline_id: count.
+        :param remaining: The number of internships left to choose a discipline for, including the next one.
+        :returns: The ids of the disciplines that keep a feasible completion.
+        """
+        feasible = set()
+
+        for discipline_id in self.bits if remaining > 0 else ():
+            counts = Counter(covered)
+            counts[discipline_id] += 1
+            if self.is_completable(counts, remaining - 1):
+                feasible.add(discipline_id)
+
+        return frozenset(feasible)
+
+    def is_completable(self, covered: dict[int, int], remaining: int) -> bool:
+        """Check if `remaining` more disciplines can be chosen, so that all the disciplines pass `validate`.
+
+        The disciplines that are part of the same constraints are interchangeable, up to their max_repeat, so they
+        are grouped, and a memoized search looks for the number of choices of each group that meets all the counts.
+        The choices that are not needed for the constraints can be disciplines outside of the constraints.
+
+        :param covered: The number of times each discipline was already chosen, as discipline_id: count.
+        :param remaining: The number of disciplines left to choose.
+        """
+        n = len(self.masks)
+        min_counts = tuple(0 if count is None else count for count in self.min_counts)
+        max_counts = tuple(math.inf if count is None else count for count in self.max_counts)
+        totals = [0] * n
+        groups = {}  # constraint mask of the group: number of choices left in the group
+
+        for discipline_id, bit in self.bits.items():
+            constraint_mask = sum(1 << i for i in range(n) if self.masks[i] >> bit & 1)
+            count = covered.get(discipline_id, 0)
+            max_repeat = min(
+                (self.max_repeats[i] for i in range(n) if constraint_mask >> i & 1 and self.max_repeats[i] is not None),
+                default=count + remaining,
+            )
+            if count > max_repeat:
+                return False
+
+            groups[constraint_mask] = groups.get(constraint_mask, 0) + max_repeat - count
+            for i in range(n):
+                if constraint_mask >> i & 1:
+                    totals[i] += count
+
+        groups = list(groups.items())
+
+        @functools.cache
+        def search(index: int, remaining: int, totals: tuple[int, ...]) -> bool:
+            if any(total > max_count for total, max_count in zip(totals, max_counts, strict=True)):
+                return False
+            if any(total + remaining < min_count for total, min_count in zip(totals, min_counts, strict=True)):
+                return False
+            if index == len(groups):
+                # the other choices are disciplines outside of the constraints
+                return all(total >= min_count for total, min_count in zip(totals, min_counts, strict=True))
+
+            constraint_mask, choices = groups[index]
+            for count in range(min(choices, remaining), -1, -1):
+                new_totals = tuple(total + count * (constraint_mask >> i & 1) for i, total in enumerate(totals))
+                if search(index + 1, remaining - count, new_totals):
+                    return True
 
-        if max_count1 < min_count2 or max_count2 < min_count1:
             return False
 
-        return (
-            constraint1.max_repeat is not None
-            and constraint2.max_repeat is not None
-            and constraint1.max_repeat != constraint2.max_repeat
-        )
+        return search(0, remaining, tuple(totals))
 
-    def _get_count_bounds(self, constraint: DisciplineConstraint) -> tuple[int, int]:
-        min_count = constraint.min_count or 0
-        max_count = constraint.max_count or math.inf
 
-        return min_count, max_count
+CONSTRAINTS_CACHE_TIMEOUT = 60 * 60 * 24  # seconds
 
-    def check_constraints_compatibility(self) -> bool:
-        constraints = self.constraints.all()
 
-        for constraint1 in constraints:
-            for constraint2 in constraints:
-                if constraint1 == constraint2:
-                    continue
+def _compile_rows(rows: Iterable[tuple]) -> CompiledConstraints:
+    bits, masks, min_counts, max_counts, max_repeats = {}, {}, {}, {}, {}
 
-                if self._constraints_conflict(constraint1, constraint2):
-                    return False
+    for constraint_id, min_count, max_count, max_repeat, discipline_id in rows:
+        if constraint_id not in masks:
+            masks[constraint_id] = 0
+            min_counts[constraint_id], max_counts[constraint_id] = min_count, max_count
+            max_repeats[constraint_id] = max_repeat
+        if discipline_id is not None:
+            bit = bits.setdefault(discipline_id, len(bits))
+            masks[constraint_id] |= 1 << bit
 
-        return True
+    return CompiledConstraints(
+        bits=bits,
+        masks=tuple(masks.values()),
+        min_counts=tuple(min_counts.values()),
+        max_counts=tuple(max_counts.values()),
+        max_repeats=tuple(max_repeats.values()),
+    )
+
+
+def compile_discipline_constraints(constraints: models.QuerySet) -> CompiledConstraints:
+    """Compile discipline constraints, with their disciplines, in one query."""
+    return _compile_rows(
+        constraints.order_by("id").values_list("id", "min_count", "max_count", "max_repeat", "disciplines")
+    )
+
+
+def _constraints_version_key(content_type_id: int, object_id: int) -> str:
+    return f"discipline_constraints_{content_type_id}_{object_id}_version"
+
+
+def get_compiled_constraints(content_type_id: int, object_id: int) -> CompiledConstraints:
+    """Get the compiled discipline constraints of an object, from the cache if they did not change since.
+
+    The cache key contains a version that is replaced whenever a constraint of the object changes.
+    """
+    return get_compiled_constraints_for_objects(content_type_id, [object_id])[object_id]
+
+
+def get_compiled_constraints_for_objects(
+    content_type_id: int, object_ids: Iterable[int]
+) -> dict[int, CompiledConstraints]:
+    """Get the compiled discipline constraints of several objects of the same type (see `get_compiled_constraints`).
+
+    The constraints that are not in the cache are compiled together, in one query.
+
+    :returns: The compiled constraints, as object_id: compiled constraints.
+    """
+    object_ids = set(object_ids)
+    version_keys = {object_id: _constraints_version_key(content_type_id, object_id) for object_id in object_ids}
+    versions = cache.get_many(version_keys.values())
+    new_versions = {key: uuid4().hex for key in version_keys.values() if key not in versions}
+
+    if new_versions:
+        cache.set_many(new_versions, None)
+        versions.update(new_versions)
+
+    keys = {
+        object_id: f"discipline_constraints_{content_type_id}_{object_id}_{versions[version_keys[object_id]]}"
+        for object_id in object_ids
+    }
+    cached = cache.get_many(keys.values())
+    compiled = {object_id: cached[key] for object_id, key in keys.items() if key in cached}
+
+    if missing := object_ids - compiled.keys():
+        rows = {object_id: [] for object_id in missing}
+        constraints = DisciplineConstraint.objects.filter(content_type_id=content_type_id, object_id__in=missing)
+
+        for object_id, *row in constraints.order_by("id").values_list(
+            "object_id", "id", "min_count", "max_count", "max_repeat", "disciplines"
+        ):
+            rows[object_id].append(row)
+
+        for object_id, object_rows in rows.items():
+            compiled[object_id] = _compile_rows(object_rows)
+        cache.set_many({keys[object_id]: compiled[object_id] for object_id in missing}, CONSTRAINTS_CACHE_TIMEOUT)
+
+    return compiled
+
+
+def invalidate_compiled_constraints(content_type_id: int, object_id: int) -> None:
+    """Invalidate the compiled discipline constraints of an object, by replacing their version."""
+    cache.set(_constraints_version_key(content_type_id, object_id), uuid4().hex, None)
+
+
+def _invalidate_and_check_constraints(objects: Iterable[tuple[int, int]], message: str) -> None:
+    """Invalidate the compiled constraints of the objects, and check that their constraints are still compatible.
+
+    The constraints are invalidated now, and again when the transaction is committed, so that the constraints that
+    are compiled in the meantime (from the rows before the commit) are not kept. The check compiles the current rows
+    without the cache, and the constraints are invalidated once more if it fails, since the changes are rolled back.
+
+    :param objects: The objects, as (content_type_id, object_id).
+    :param message: The message of the ValidationError.
+    :raises ValidationError: If the constraints of an object are not compatible.
+    """
+    for content_type_id, object_id in objects:
+        invalidate_compiled_constraints(content_type_id, object_id)
+        transaction.on_commit(functools.partial(invalidate_compiled_constraints, content_type_id, object_id))
+
+    for content_type_id, object_id in objects:
+        constraints = DisciplineConstraint.objects.filter(content_type_id=content_type_id, object_id=object_id)
+        if not compile_discipline_constraints(constraints).is_compatible():
+            for invalid_content_type_id, invalid_object_id in objects:
+                invalidate_compiled_constraints(invalid_content_type_id, invalid_object_id)
+            raise ValidationError(message)
+
+
+@receiver(post_save, sender=DisciplineConstraint)
+def check_constraints(sender, instance, **kwargs):
+    _invalidate_and_check_constraints(
+        [(instance.content_type_id, instance.object_id)], "The new constraint conflicts with existing constraints."
+    )
+
+
+@receiver(post_delete, sender=DisciplineConstraint)
+def invalidate_constraints_on_delete(sender, instance, **kwargs):
+    """Invalidate the compiled constraints of the object of a deleted constraint."""
+    invalidate_compiled_constraints(instance.content_type_id, instance.object_id)
+    transaction.on_commit(
+        functools.partial(invalidate_compiled_constraints, instance.content_type_id, instance.object_id)
+    )
+
+
+@receiver(m2m_changed, sender=DisciplineConstraint.disciplines.through)
+def check_constraints_on_disciplines_update(sender, instance, action, reverse, pk_set, **kwargs):
+    if action in ["post_add", "post_remove", "post_clear", "pre_clear"]:
+        # with the reverse relation, the instance is a discipline, and pk_set holds the constraints
+        if not reverse:
+            objects = {(instance.content_type_id, instance.object_id)}
+        elif action == "pre_clear":
+            instance._cleared_constraint_objects = set(instance.constraints.values_list("content_type_id", "object_id"))
+            return
+        elif action == "post_clear":
+            objects = getattr(instance, "_cleared_constraint_objects", set())
+        else:
+            objects = set(
+                DisciplineConstraint.objects.filter(id__in=pk_set).values_list("content_type_id", "object_id")
+            )
+
+        _invalidate_and_check_constraints(objects, "The constraint's disciplines conflict with another constraint.")
+
+
+class DisciplineConstraintsMixin(models.Model):
+    constraints = GenericRelation(DisciplineConstraint)
+
+    class Meta:
+        abstract = True
+
+    def get_compiled_constraints(self) -> CompiledConstraints:
+        """Get the compiled discipline constraints of this object (see `CompiledConstraints`)."""
+        return get_compiled_constraints(ContentType.objects.get_for_model(self).id, self.pk)
+
+    def get_feasible_disciplines(self, covered: dict[int, int], remaining: int) -> frozenset[int]:
+        """Get the disciplines that keep a feasible completion of the constraints of this object.
+
+        The result is cached per covered multiset and number of remaining choices, until a constraint changes
+        (see `CompiledConstraints.get_feasible_disciplines`).
+        """
+        content_type_id = ContentType.objects.get_for_model(self).id
+        compiled = get_compiled_constraints(content_type_id, self.pk)
+        version = cache.get(_constraints_version_key(content_type_id, self.pk))
+        covered_key = ",".join(
+            f"{discipline_id}x{count}"
+            for discipline_id, count in sorted(covered.items())
+            if count and discipline_id in compiled.bits
+        )
+        key = f"discipline_constraints_{content_type_id}_{self.pk}_{version}_feasible_{remaining}_{covered_key}"
+
+        feasible = cache.get(key)
+        if feasible is None:
+            feasible = compiled.get_feasible_disciplines(covered, remaining)
+            cache.set(key, feasible, CONSTRAINTS_CACHE_TIMEOUT)
+
+        return feasible
+
+    def check_constraints_compatibility(self) -> bool:
+        return self.get_compiled_constraints().is_compatible()
 
     def validate_discipline_constraints(self, discipline_ids: list[int]) -> bool:
-        return validate_discipline_constraints(discipline_ids, list(self.constraints.all()))
+        return validate_discipline_constraints(discipline_ids, self.get_compiled_constraints())
 
     def add_required_discipline(self, discipline: Discipline) -> None:
         constraint = self.constraints.create(min_count=1, max_count=1, max_repeat=1)
@@ -142,7 +406,7 @@ def get_disciplines_from_constraints(constraints: models.QuerySet) -> "QuerySet[
 
 
 def validate_discipline_constraints(
-    discipline_ids: list[int], remaining_constraints: list[DisciplineConstraint]
+    discipline_ids: list[int], remaining_constraints: list[DisciplineConstraint] | CompiledConstraints
 ) -> bool:
     """Validate a list of discipline_ids against the remaining constraints.
 
@@ -152,32 +416,13 @@ def validate_discipline_constraints(
         3. The selected disciplines are within the allowed set of disciplines defined by the remaining constraints.
 
     :param discipline_ids: A list of discipline IDs to be validated.
-    :param remaining_constraints: A list of remaining DisciplineConstraint objects that define the constraints.
+    :param remaining_constraints: A list of remaining DisciplineConstraint objects that define the constraints,
+        or the compiled constraints (see `get_compiled_constraints`).
     :returns: True if the list of discipline_ids satisfies the remaining constraints, False otherwise.
     """
-    for constraint in remaining_constraints:
-        # Count the occurrences of each discipline
-        discipline_counts = Counter(discipline_ids)
-
-        # Get allowed_disciplines for the constraint
-        allowed_disciplines = set(constraint.disciplines.values_list("id", flat=True))
-
-        # Calculate the intersection of discipline_ids and allowed_disciplines
-        intersecting_disciplines = set(discipline_ids) & allowed_disciplines
-        intersecting_discipline_counts = sum(
-            discipline_counts[discipline_id] for discipline_id in intersecting_disciplines
+    if not isinstance(remaining_constraints, CompiledConstraints):
+        remaining_constraints = compile_discipline_constraints(
+            DisciplineConstraint.objects.filter(id__in=[constraint.id for constraint in remaining_constraints])
         )
 
-        # Check if the total number of intersecting disciplines is within the remaining min_count and max_count
-        if constraint.min_count is not None and intersecting_discipline_counts < constraint.min_count:
-            return False
-        if constraint.max_count is not None and intersecting_discipline_counts > constraint.max_count:
-            return False
-
-        # Check if each intersecting discipline is within the remaining max_repeat constraint
-        if constraint.max_repeat is not None:
-            for discipline_id in intersecting_disciplines:
-                if discipline_counts[discipline_id] > constraint.max_repeat:
-                    return False
-
-    return True
+    return remaining_constraints.validate(discipline_ids)
@@ -7,9 +7,10 @@ from django.db import models
 from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.urls import reverse
+from django.utils import timezone
 from django.utils.translation import pgettext_lazy
 
-from metis.models.base import BaseModel
+from metis.models.base import BaseModel, sync_tags
 from metis.models.rel.remarks import RemarksMixin
 from metis.models.rel.signatures import SignaturesMixin
 
@@ -41,7 +42,7 @@ class Evaluation(RemarksMixin, SignaturesMixin, BaseModel):
             raise ValidationError("Cannot modify an approved evaluation.")
         if self.is_self_evaluation and not self.form.has_self_evaluations:
             raise ValidationError("This form does not support self evaluations.")
-        if self.intermediate > self.form.definition["intermediate_evaluations"]:
+        if self.intermediate > self.form.compiled.intermediate_evaluations:
             raise ValidationError("Intermediate evaluation number is too high.")
         self.data = self.form.clean_response_data(self.data)
         return super().clean()
@@ -56,13 +57,13 @@ class Evaluation(RemarksMixin, SignaturesMixin, BaseModel):
             from metis.models.stages.internships import Internship
             from metis.services.mailer.evaluations import schedule_evaluation_notification
 
-            cls.objects.filter(id=evaluation.id).update(is_approved=True)  # type: ignore
+            cls.objects.filter(id=evaluation.id).update(is_approved=True, updated_at=timezone.now())  # type: ignore
 
             if not evaluation.is_self_evaluation:
                 # TODO: prepare extra notifications for self-evaluations
                 schedule_evaluation_notification(evaluation)
 
-            Internship.update_tags(evaluation.internship, type="evaluations")
+            sync_tags(Internship, evaluation.internship_id, type="evaluations")
 
     @property
     def is_final(self) -> bool:
@@ -107,12 +108,17 @@ def post_save_evaluation(sender, instance, **kwargs):
 
 @receiver(post_delete, sender=Evaluation)
 def post_delete_evaluation(sender, instance, **kwargs):
-    """Update the evaluation tags of the associated internship when an evaluation is deleted."""
+    """Update the evaluation tags of the internship, and drop the evaluation cube of its project, on delete."""
+    from metis.models.stages.internships import Internship
+    from metis.services.analytics import invalidate_evaluation_cube
+
     sync_evaluation_tags(instance)
+    if project_id := Internship.objects.filter(id=instance.internship_id).values_list("project_id", flat=True).first():
+        invalidate_evaluation_cube(project_id)
 
 
 def sync_evaluation_tags(instance):
     """Sync the evaluation tags of the associated internship."""
     from metis.models.stages.internships import Internship
 
-    Internship.update_tags(instance.internship, type="evaluations")
+    sync_tags(Internship, instance.internship_id, type="evaluations")
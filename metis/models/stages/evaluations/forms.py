@@ -1,9 +1,19 @@
+import copy
+import functools
+from uuid import uuid4
+
+from asgiref.local import Local
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.core.signals import request_finished, request_started
+from django.db import models, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 
 from metis.models.base import BaseModel
 from metis.services.form_builder.evaluations import (
-    validate_evaluation_form_definition,
+    CompiledEvaluationForm,
+    compile_evaluation_form,
     validate_evaluation_form_response,
 )
 
@@ -31,7 +41,7 @@ class EvaluationForm(BaseModel):
     def clean(self) -> None:
         """Validate the form definition."""
         try:
-            validate_evaluation_form_definition(self.form_definition)
+            compile_evaluation_form(self.form_definition)
         except ValueError as exc:
             raise ValidationError({"form_definition": str(exc)}) from exc
         return super().clean()
@@ -40,7 +50,116 @@ class EvaluationForm(BaseModel):
         """Validate a response for this evaluation form."""
         return validate_evaluation_form_response(self.form_definition, data)
 
+    @property
+    def compiled(self) -> CompiledEvaluationForm:
+        """Return the compiled form definition (see `compile_evaluation_form`)."""
+        return compile_evaluation_form(self.form_definition)
+
     @property
     def definition(self) -> dict:
-        """Return the form definition with default values filled in."""
-        return validate_evaluation_form_definition(self.form_definition).model_dump()
+        """Return the form definition with default values filled in.
+
+        This is a copy: the compiled definition is shared by all the forms with the same definition in the process.
+        """
+        return copy.deepcopy(self.compiled.definition)
+
+
+EVALUATION_FORMS_CACHE_TIMEOUT = 60 * 60 * 24  # seconds
+
+# the evaluation forms of the projects, as project_id: forms, for the duration of a request (None outside of one)
+_request_forms = Local()
+
+
+def _evaluation_forms_version_key(project_id: int) -> str:
+    return f"evaluation_forms_{project_id}_version"
+
+
+def get_project_evaluation_forms(project_id: int) -> list[EvaluationForm]:
+    """Get all the evaluation forms of a project, in one query.
+
+    The forms are kept for the rest of the request, and cached under a version that is replaced whenever a form of
+    the project is saved or deleted.
+
+    :param project_id: The ID of the project.
+    :returns: The evaluation forms, with the most recent version first.
+    """
+    request_forms = getattr(_request_forms, "projects", None)
+    if request_forms is not None and project_id in request_forms:
+        return request_forms[project_id]
+
+    version_key = _evaluation_forms_version_key(project_id)
+    version = cache.get(version_key)
+    if version is None:
+        version = uuid4().hex
+        cache.set(version_key, version, None)
+
+    key = f"evaluation_forms_{project_id}_{version}"
+    evaluation_forms = cache.get(key)
+    if evaluation_forms is None:
+        evaluation_forms = list(EvaluationForm.objects.filter(project_id=project_id))
+        cache.set(key, evaluation_forms, EVALUATION_FORMS_CACHE_TIMEOUT)
+
+    if request_forms is not None:
+        request_forms[project_id] = evaluation_forms
+
+    return evaluation_forms
+
+
+def resolve_evaluation_form(
+    project_id: int, period_id: int | None = None, discipline_id: int | None = None
+) -> EvaluationForm | None:
+    """Get the evaluation form for a period and discipline, from the forms of the project.
+
+    The forms of the period are preferred (if any), and of those the forms of the discipline (if any).
+
+    :param project_id: The ID of the project.
+    :param period_id: The ID of the period.
+    :param discipline_id: The ID of the discipline.
+    :returns: The evaluation form for the period and discipline.
+    """
+    return select_evaluation_form(get_project_evaluation_forms(project_id), period_id, discipline_id)
+
+
+def select_evaluation_form(
+    evaluation_forms: list[EvaluationForm], period_id: int | None = None, discipline_id: int | None = None
+) -> EvaluationForm | None:
+    """Select the form for a period and discipline, from the forms of a project (see `resolve_evaluation_form`)."""
+    if period_id and any(form.period_id == period_id for form in evaluation_forms):
+        evaluation_forms = [form for form in evaluation_forms if form.period_id == period_id]
+
+    if discipline_id and any(form.discipline_id == discipline_id for form in evaluation_forms):
+        evaluation_forms = [form for form in evaluation_forms if form.discipline_id == discipline_id]
+
+    return evaluation_forms[0] if evaluation_forms else None
+
+
+@receiver(request_started)
+def start_request_evaluation_forms(sender, **kwargs):
+    """Keep the evaluation forms that are resolved during a request."""
+    _request_forms.projects = {}
+
+
+@receiver(request_finished)
+def finish_request_evaluation_forms(sender, **kwargs):
+    """Forget the evaluation forms of the request."""
+    _request_forms.projects = None
+
+
+@receiver(post_save, sender=EvaluationForm)
+@receiver(post_delete, sender=EvaluationForm)
+def invalidate_evaluation_forms_on_change(sender, instance, **kwargs):
+    """Invalidate the cached evaluation forms of the project of a changed form, now and when the transaction commits.
+
+    The forms that are read by other requests before the commit are cached under the current version, so the version
+    is replaced once more after the commit.
+    """
+    invalidate_evaluation_forms(instance.project_id)
+    transaction.on_commit(functools.partial(invalidate_evaluation_forms, instance.project_id))
+
+
+def invalidate_evaluation_forms(project_id: int) -> None:
+    """Invalidate the cached evaluation forms of a project, by replacing their version."""
+    cache.set(_evaluation_forms_version_key(project_id), uuid4().hex, None)
+
+    if request_forms := getattr(_request_forms, "projects", None):
+        request_forms.pop(project_id, None)
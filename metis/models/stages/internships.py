@@ -1,25 +1,31 @@
+import functools
 import math
 from collections import Counter
-from datetime import date, datetime, time, timedelta
+from collections.abc import Iterable
+from datetime import date, datetime, time, timedelta, tzinfo
 from hashlib import sha1
 from math import ceil
 from typing import TYPE_CHECKING, NamedTuple, Optional
 from uuid import uuid4
 
 from django.conf import settings
-from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from django.db import models
 from django.urls import reverse
 from django.utils import timezone
 
-from metis.utils.dates import sum_times
-
-from ..base import BaseModel, TagsMixin
+from ..base import BaseModel, ComputedTagsMixin
 from ..disciplines import Discipline
-from ..rel.files import FilesMixin, append_files_tags
-from ..rel.remarks import RemarksMixin, append_remarks_tags
-from .evaluations import EvaluationForm
+from ..rel.files import FilesMixin, append_files_tags, get_files_counts
+from ..rel.remarks import RemarksMixin, append_remarks_tags, get_remarks_counts
+from .evaluations import (
+    Evaluation,
+    EvaluationForm,
+    get_project_evaluation_forms,
+    resolve_evaluation_form,
+    select_evaluation_form,
+)
+from .timesheets import get_timesheets_minutes
 
 
 if TYPE_CHECKING:
@@ -47,32 +53,26 @@ def get_cached_evaluation_form(
 ) -> Optional["EvaluationForm"]:
     """Get the evaluation form for a period and discipline.
 
-    This checks a cache of evaluation forms for the project, period and discipline to reduce database queries.
-    Necessary when requesting long lists of internships with the evaluation periods for the new UI.
+    The forms of the project are loaded once, and cached for the request and across requests, to reduce database
+    queries. Necessary when requesting long lists of internships with the evaluation periods for the new UI.
 
     :param project_id: The ID of the project.
     :param period_id: The ID of the period.
     :param discipline_id: The ID of the discipline.
     :returns: The evaluation form for the period and discipline.
     """
-    cache_key = f"evaluation_form_{project_id}_{period_id}_{discipline_id}"
-    evaluation_form = cache.get(cache_key)
-
-    if evaluation_form:
-        return evaluation_form if evaluation_form != "EvaluationForm.NotFound" else None
-
-    qs = EvaluationForm.objects.filter(project_id=project_id)
-
-    if period_id and qs.filter(period_id=period_id).exists():
-        qs = qs.filter(period_id=period_id)
+    return resolve_evaluation_form(project_id, period_id, discipline_id)
 
-    if discipline_id and qs.filter(discipline_id=discipline_id).exists():
-        qs = qs.filter(discipline_id=discipline_id)
 
-    evaluation_form = qs.first()
-    cache.set(cache_key, evaluation_form or "EvaluationForm.NotFound", 5)
+def get_evaluation_forms(keys: Iterable[tuple[int, int | None, int | None]]) -> dict[tuple, Optional["EvaluationForm"]]:
+    """Get the evaluation forms for several (project_id, period_id, discipline_id), with one query per project at most.
 
-    return evaluation_form
+    :param keys: The (project_id, period_id, discipline_id) tuples.
+    :returns: The evaluation forms, as (project_id, period_id, discipline_id): evaluation form.
+    """
+    keys = set(keys)
+    project_forms = {project_id: get_project_evaluation_forms(project_id) for project_id in {key[0] for key in keys}}
+    return {key: select_evaluation_form(project_forms[key[0]], key[1], key[2]) for key in keys}
 
 
 def get_evaluation_periods(start_date: date, end_date: date, intermediates: int = 0) -> list[EvaluationPeriod]:
@@ -84,11 +84,24 @@ def get_evaluation_periods(start_date: date, end_date: date, intermediates: int
     - intermediate evaluations: start a day after the previous one ends, ends a day before next one starts
     - final evaluation: starts a day after the last intermediate ends, ends a month after the end of the internship
 
+    The periods are memoised by (start_date, end_date, intermediates, current timezone), in a bounded LRU cache.
+
     :param start_date: The start date of the internship.
     :param end_date: The end date of the internship.
     :param intermediates: The number of intermediate evaluations.
     :returns: A list of EvaluationPeriod tuples with the start and end date of the evaluation periods.
     """
+    return list(_get_evaluation_periods(start_date, end_date, intermediates, timezone.get_current_timezone()))
+
+
+# the number of evaluation calendars, by (start_date, end_date, intermediates, tz), that are kept by each process
+EVALUATION_PERIODS_CACHE_SIZE = 4096
+
+
+@functools.lru_cache(maxsize=EVALUATION_PERIODS_CACHE_SIZE)
+def _get_evaluation_periods(
+    start_date: date, end_date: date, intermediates: int, tz: tzinfo
+) -> tuple[EvaluationPeriod, ...]:
     full_duration = (end_date - start_date).days
     evaluation_periods = []
     grace_period = 14 if full_duration > 60 and intermediates < 2 else 7
@@ -104,11 +117,11 @@ def get_evaluation_periods(start_date: date, end_date: date, intermediates: int
         for i in range(intermediates):
             start_at = timezone.make_aware(
                 datetime.combine(evaluation_deadlines[i], time(6, 0)),
-                timezone.get_current_timezone(),
+                tz,
             )
             end_at = timezone.make_aware(
                 datetime.combine(evaluation_dates[i + 1] - timedelta(days=1), time(23, 59)),
-                timezone.get_current_timezone(),
+                tz,
             )
 
             evaluation_periods.append(
@@ -130,11 +143,11 @@ def get_evaluation_periods(start_date: date, end_date: date, intermediates: int
 
     final_at = timezone.make_aware(
         datetime.combine(final_start, time(6, 0)),
-        timezone.get_current_timezone(),
+        tz,
     )
     end_at = timezone.make_aware(
         datetime.combine(final_end, time(23, 59)),
-        timezone.get_current_timezone(),
+        tz,
     )
 
     evaluation_periods.append(
@@ -146,7 +159,43 @@ def get_evaluation_periods(start_date: date, end_date: date, intermediates: int
         )
     )
 
-    return evaluation_periods
+    return tuple(evaluation_periods)
+
+
+def get_internships_evaluation_periods(
+    internships: models.QuerySet["Internship"], *, at: datetime | None = None
+) -> dict[int, list[EvaluationPeriod]]:
+    """Get the evaluation periods of many internships at once, without loading the internships.
+
+    The evaluation forms are resolved from the forms of the projects, and the periods come from the memoised calendar
+    (see `get_evaluation_periods`).
+
+    :param internships: The internships.
+    :param at: If given, only the periods that are open at this moment are kept, for the internships with one.
+    :returns: The evaluation periods, as internship_id: periods (no periods without an evaluation form).
+    """
+    rows = list(internships.values_list("id", "project_id", "period_id", "discipline_id", "start_date", "end_date"))
+    evaluation_forms = get_evaluation_forms({row[1:4] for row in rows})
+    tz = timezone.get_current_timezone()
+    internships_periods = {}
+
+    for internship_id, project_id, period_id, discipline_id, start_date, end_date in rows:
+        evaluation_form = evaluation_forms[(project_id, period_id, discipline_id)]
+        if not evaluation_form:
+            internships_periods[internship_id] = []
+            continue
+
+        periods = _get_evaluation_periods(start_date, end_date, evaluation_form.compiled.intermediate_evaluations, tz)
+        internships_periods[internship_id] = list(periods)
+
+    if at is not None:
+        internships_periods = {
+            internship_id: open_periods
+            for internship_id, periods in internships_periods.items()
+            if (open_periods := [period for period in periods if period.start_at <= at <= period.end_at])
+        }
+
+    return internships_periods
 
 
 def get_internship_tags(obj: "Internship", *, type: str = "all") -> list[str]:
@@ -156,46 +205,73 @@ def get_internship_tags(obj: "Internship", *, type: str = "all") -> list[str]:
     :param type: The type of tags to process.
     :returns: A list of tags.
     """
-    tags = obj.tags
-
-    # evaluations
-    if type in {"all", "evaluations"} and obj.pk and obj.evaluation_form:
-        tags = [tag for tag in tags if not tag.startswith("intermediate.")]
-        evaluations = obj.evaluations.all()
-
-        for i in range(0, obj.evaluation_form.definition["intermediate_evaluations"] + 1):
-            if evaluations.filter(intermediate=i, is_self_evaluation=False, is_approved=True).exists():
-                tags.append(f"intermediate.{i}:approved")
-            elif evaluations.filter(intermediate=i, is_self_evaluation=False, is_approved=False).exists():
-                tags.append(f"intermediate.{i}:not_approved")
-            else:
-                tags.append(f"intermediate.{i}:pending")
-
-            if obj.evaluation_form.has_self_evaluations:
-                if evaluations.filter(intermediate=i, is_self_evaluation=True, is_approved=True).exists():
-                    tags.append(f"intermediate.{i}.self:approved")
-                elif evaluations.filter(intermediate=i, is_self_evaluation=True, is_approved=False).exists():
-                    tags.append(f"intermediate.{i}.self:not_approved")
-                else:
-                    tags.append(f"intermediate.{i}.self:pending")
-
-    # hours
-    if type in {"all", "hours"}:
-        tags = [tag for tag in tags if not tag.startswith("hours.")]
-        hours, minutes = obj.total_hours
-        accepted_hours, accepted_minutes = obj.get_total_hours(approved_only=True)
-        tags.append(f'hours.total:"{hours}:{minutes:02d}"')
-        tags.append(f'hours.approved:"{accepted_hours}:{accepted_minutes:02d}"')
+    return get_internships_tags([obj], type=type)[obj.pk]
 
-    # files
-    if type in {"all", "files"}:
-        tags = append_files_tags(obj, tags=tags)
 
-    # remarks
+def get_internships_tags(internships: list["Internship"], *, type: str = "all") -> dict[int, list[str]]:
+    """For several internships, process the tags, with one aggregated query for each type of tags.
+
+    The hours tags also set the `total_minutes` and `approved_minutes` of the internships, which are saved with the
+    tags (see `Internship.get_tags_fields`).
+
+    :param internships: A list of saved instances of the Internship class.
+    :param type: The type of tags to process.
+    :returns: The tags, as internship_id: list of tags.
+    """
+    internship_ids = [internship.pk for internship in internships]
+    evaluations, evaluation_forms, minutes, files_counts, remarks_counts = {}, {}, {}, {}, {}
+
+    if type in {"all", "evaluations"}:
+        evaluation_forms = get_evaluation_forms(
+            (obj.project_id, obj.period_id, obj.discipline_id) for obj in internships
+        )
+        for internship_id, intermediate, is_self_evaluation, is_approved in Evaluation.objects.filter(
+            internship_id__in=internship_ids
+        ).values_list("internship_id", "intermediate", "is_self_evaluation", "is_approved"):
+            evaluations[internship_id, intermediate, is_self_evaluation] = is_approved
+    if type in {"all", "hours"}:
+        minutes = get_timesheets_minutes(internship_ids)
+    if type in {"all", "files"}:
+        files_counts = get_files_counts(Internship, internship_ids)
     if type in {"all", "remarks"}:
-        tags = append_remarks_tags(obj, tags=tags)
+        remarks_counts = get_remarks_counts(Internship, internship_ids)
+
+    internships_tags = {}
+
+    for obj in internships:
+        tags = obj.tags
+
+        # evaluations
+        evaluation_form = evaluation_forms.get((obj.project_id, obj.period_id, obj.discipline_id))
+        if type in {"all", "evaluations"} and evaluation_form:
+            tags = [tag for tag in tags if not tag.startswith("intermediate.")]
+            suffixes = [(False, "")] + ([(True, ".self")] if evaluation_form.has_self_evaluations else [])
 
-    return list(set(tags))
+            for i in range(0, evaluation_form.compiled.intermediate_evaluations + 1):
+                for is_self_evaluation, suffix in suffixes:
+                    is_approved = evaluations.get((obj.pk, i, is_self_evaluation))
+                    state = "pending" if is_approved is None else "approved" if is_approved else "not_approved"
+                    tags.append(f"intermediate.{i}{suffix}:{state}")
+
+        # hours
+        if type in {"all", "hours"}:
+            tags = [tag for tag in tags if not tag.startswith("hours.")]
+            total_minutes, approved_minutes = minutes.get(obj.pk, (0, 0))
+            obj.total_minutes, obj.approved_minutes = total_minutes, approved_minutes
+            tags.append(f'hours.total:"{total_minutes // 60}:{total_minutes % 60:02d}"')
+            tags.append(f'hours.approved:"{approved_minutes // 60}:{approved_minutes % 60:02d}"')
+
+        # files
+        if type in {"all", "files"}:
+            tags = append_files_tags(obj, tags=tags, count=files_counts.get(obj.pk, 0))
+
+        # remarks
+        if type in {"all", "remarks"}:
+            tags = append_remarks_tags(obj, tags=tags, count=remarks_counts.get(obj.pk, 0))
+
+        internships_tags[obj.pk] = list(set(tags))
+
+    return internships_tags
 
 
 def get_remaining_discipline_constraints(obj: "Internship") -> list[dict]:
@@ -210,14 +286,16 @@ def get_remaining_discipline_constraints(obj: "Internship") -> list[dict]:
     # check internship contraints
 
     if obj.track:
-        for constraint in obj.track.constraints.all():
-            constraint_discipline_ids = list(constraint.disciplines.values_list("id", flat=True))
-            remaining_min_count = constraint.min_count
-            remaining_max_count = constraint.max_count or math.inf
-            remaining_max_repeat = constraint.max_repeat or math.inf
+        compiled = obj.track.get_compiled_constraints()
+
+        for index, mask in enumerate(compiled.masks):
+            constraint_discipline_ids = compiled.get_discipline_ids(index)
+            remaining_min_count = compiled.min_counts[index] or 0
+            remaining_max_count = compiled.max_counts[index] or math.inf
+            remaining_max_repeat = compiled.max_repeats[index] or math.inf
 
             for discipline_id, count in covered_counts.items():
-                if discipline_id in constraint_discipline_ids:
+                if discipline_id in compiled.bits and mask >> compiled.bits[discipline_id] & 1:
                     remaining_min_count = remaining_min_count - count
                     remaining_max_count = remaining_max_count - count
                     remaining_max_repeat = remaining_max_repeat - 1
@@ -226,7 +304,7 @@ def get_remaining_discipline_constraints(obj: "Internship") -> list[dict]:
                 "min_count": max(0, remaining_min_count),
                 "max_count": max(0, remaining_max_count),
                 "max_repeat": max(0, remaining_max_repeat),
-                "disciplines": constraint.disciplines.all(),
+                "disciplines": Discipline.objects.filter(id__in=constraint_discipline_ids),
             }
 
             remaining_constraints.append(remaining_constraint)
@@ -253,19 +331,34 @@ def validate_discipline_choice(obj: "Internship") -> None:
         )
 
     if obj.track:
-        max_repeat = obj.track.constraints.first().max_repeat
+        max_repeat = next(iter(obj.track.get_compiled_constraints().max_repeats), None)
         if max_repeat and obj.get_counter_for_disciplines()[obj.discipline_id] >= max_repeat:
             raise ValidationError(
                 "Chosen discipline does not meet the remaining constraints for this internship: "
                 f"{obj.track}, {obj.student}"
             )
 
+        # only a new or changed discipline is checked, so the internships that were saved before stay valid
+        previous_discipline_id = (
+            None
+            if obj._state.adding
+            else type(obj).objects.filter(pk=obj.pk).values_list("discipline_id", flat=True).first()
+        )
+        if (
+            obj.discipline_id != previous_discipline_id
+            and not obj.get_feasible_disciplines().filter(id=obj.discipline_id).exists()
+        ):
+            raise ValidationError(
+                "Chosen discipline leaves no valid choice for the other internships of the track: "
+                f"{obj.track}, {obj.student}"
+            )
+
     for constraint in get_remaining_discipline_constraints(obj):
         if constraint["max_count"] == 0:
             raise ValidationError("Chosen discipline does not meet the remaining constraints for this internship.")
 
 
-class Internship(FilesMixin, RemarksMixin, TagsMixin, BaseModel):
+class Internship(FilesMixin, RemarksMixin, ComputedTagsMixin, BaseModel):
     """An internship for a student."""
 
     PREPLANNING = "preplanning"
@@ -298,6 +391,10 @@ class Internship(FilesMixin, RemarksMixin, TagsMixin, BaseModel):
 
     uuid = models.UUIDField(default=uuid4, editable=False, unique=True)
 
+    # the minutes of the timesheets, saved with the hours tags (see `get_tags_fields`)
+    total_minutes = models.PositiveIntegerField(default=0, editable=False)
+    approved_minutes = models.PositiveIntegerField(default=0, editable=False)
+
     # evaluation_deadline = models.DateField()  # this can be used for cases > reviews
     # reviewers (beoordelaars)
 
@@ -365,10 +462,21 @@ class Internship(FilesMixin, RemarksMixin, TagsMixin, BaseModel):
             cls.objects.filter(id=internship.id).update(is_approved=True)  # type: ignore
 
     @classmethod
-    def update_tags(cls, internship: "Internship", *, type: str = "all") -> None:
-        """Update tags for an internship, without calling clean() on the model."""
-        tags = get_internship_tags(internship, type=type)
-        cls.objects.filter(id=internship.id).update(tags=tags)
+    def get_tags_in_bulk(cls, objects: list["Internship"], *, type: str = "all") -> dict[int, list[str]]:
+        """Process the tags of several internships (see `get_internships_tags`)."""
+        return get_internships_tags(objects, type=type)
+
+    @classmethod
+    def get_tags_fields(cls, *, type: str = "all") -> list[str]:
+        """Get the fields that are set with the tags: the hours tags come with the minutes of the timesheets."""
+        return ["tags", "total_minutes", "approved_minutes"] if type in {"all", "hours"} else ["tags"]
+
+    @classmethod
+    def refresh_tags(cls, queryset: models.QuerySet, *, type: str = "all", batch_size: int = 1000) -> int:
+        """Recompute the tags of all the internships of a queryset, loading only the fields the tags depend on."""
+        return super().refresh_tags(
+            queryset.only("id", "tags", "project_id", "period_id", "discipline_id"), type=type, batch_size=batch_size
+        )
 
     def can_be_managed_by(self, user) -> bool:
         """Check if the user can manage this internship."""
@@ -458,6 +566,40 @@ class Internship(FilesMixin, RemarksMixin, TagsMixin, BaseModel):
 
         return self.track.get_available_disciplines() if self.track else Discipline.objects.none()
 
+    def get_feasible_disciplines(self) -> models.QuerySet:
+        """Return the available disciplines that still leave a valid choice for the other internships of the track.
+
+        All the other internships of the student in the track with a discipline count, the past and the planned ones.
+        The disciplines that are not part of the track constraints are not restricted, and neither are any disciplines
+        once the other internships fill all the program internships of the track with constrained disciplines.
+
+        :returns: A QuerySet of Discipline objects.
+        """
+        available_disciplines = self.get_available_disciplines()
+
+        if not self.track:
+            return available_disciplines
+
+        compiled = self.track.get_compiled_constraints()
+        covered_counts = Counter()
+        if self.student is not None:
+            other_internships = (
+                self.student.internships.exclude(pk=self.pk)
+                .exclude(status__in=[self.CANCELLED, self.UNSUCCESSFUL])
+                .filter(track=self.track, discipline__isnull=False)
+            )
+            covered_counts.update(other_internships.values_list("discipline_id", flat=True))
+
+        # the program internships that are not filled with a constrained discipline yet, this one included
+        constrained = sum(count for discipline_id, count in covered_counts.items() if discipline_id in compiled.bits)
+        remaining = max(0, self.track.program_internships.count() - constrained)
+        if remaining == 0:
+            return available_disciplines
+
+        feasible_ids = self.track.get_feasible_disciplines(covered_counts, remaining)
+
+        return available_disciplines.exclude(id__in=set(compiled.bits) - feasible_ids)
+
     def get_covered_disciplines(self) -> models.QuerySet:
         """If a track exists, it returns a list of disciplines that have already been covered by this student.
 
@@ -486,15 +628,11 @@ class Internship(FilesMixin, RemarksMixin, TagsMixin, BaseModel):
 
     def get_evaluation_periods(self, evaluation_form: "EvaluationForm") -> list[EvaluationPeriod]:
         """Get the evaluation periods for the internship."""
-        return get_evaluation_periods(
-            self.start_date, self.end_date, evaluation_form.definition["intermediate_evaluations"]
-        )
+        return get_evaluation_periods(self.start_date, self.end_date, evaluation_form.compiled.intermediate_evaluations)
 
     def get_total_hours(self, *, approved_only: bool = False) -> tuple[int, int]:
-        """Get the total amount of (hours, minutes) worked during the internship."""
-        if approved_only:
-            return sum_times([timesheet.duration for timesheet in self.timesheets.filter(is_approved=True)])
-        return sum_times([timesheet.duration for timesheet in self.timesheets.all()])
+        """Get the total amount of (hours, minutes) worked during the internship, as saved with the tags."""
+        return divmod(self.approved_minutes if approved_only else self.total_minutes, 60)
 
     def get_secret_generated_file_url(self, template_code: str) -> str:
         """Get the secret URL for the internship."""
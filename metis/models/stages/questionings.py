@@ -7,6 +7,7 @@ from metis.services.form_builder.custom_forms import validate_form_definition, v
 from metis.services.form_builder.tops import validate_tops_form_definition, validate_tops_form_response
 
 from ..base import BaseModel
+from ..rel.files import FilesMixin
 from ..rel.remarks import RemarksMixin
 from .internships import Internship
 from .project_places import ProjectPlace
@@ -18,7 +19,7 @@ class QuestioningManager(models.Manager):
         return self.filter(start_at__lte=timezone.now(), end_at__gte=timezone.now())
 
 
-class Questioning(RemarksMixin, BaseModel):
+class Questioning(FilesMixin, RemarksMixin, BaseModel):
     """In a Project, questionings define the moments when students / places have to fill in a form.
 
     The questioning can be assigned to the whole project or to a Period (and thus to a specific Block).
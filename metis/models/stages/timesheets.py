@@ -1,20 +1,24 @@
+from collections.abc import Iterable
 from datetime import time
 from typing import TYPE_CHECKING
 
+from django.contrib.contenttypes.models import ContentType
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Q, Sum
+from django.db.models.functions import Coalesce, ExtractHour, ExtractMinute
 from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
-from metis.models.base import BaseModel
+from metis.models.base import BaseModel, sync_tags
 from metis.models.rel.files import FilesMixin
 from metis.models.rel.remarks import RemarksMixin
-from metis.models.rel.signatures import SignaturesMixin
+from metis.models.rel.signatures import Signature, SignaturesMixin
 from metis.utils.dates import get_minutes_difference, get_time_difference, sum_times
 
 
 if TYPE_CHECKING:
-    from ..rel.signatures import Signature
+    from ..users import User
 
 
 class Absence(FilesMixin, RemarksMixin, BaseModel):
@@ -105,7 +109,35 @@ class Timesheet(SignaturesMixin, BaseModel):
             from metis.models.stages.internships import Internship
 
             cls.objects.filter(id=timesheet.id).update(is_approved=True)  # type: ignore
-            Internship.update_tags(timesheet.internship, type="hours")
+            sync_tags(Internship, timesheet.internship_id, type="hours")
+
+    @classmethod
+    def approve_in_bulk(cls, timesheets: models.QuerySet, *, user: "User", signed_text: str) -> int:
+        """Approve several timesheets in one transaction, without calling clean() on the models.
+
+        A signature is created for every timesheet that was not approved yet, and the hours tags of the internships
+        are updated once, when the transaction is committed.
+
+        :returns: The number of approved timesheets.
+        """
+        from metis.models.stages.internships import Internship
+
+        with transaction.atomic():
+            timesheets = list(timesheets.filter(is_approved=False).select_for_update().only("id", "internship_id"))
+            content_type = ContentType.objects.get_for_model(cls)
+
+            Signature.objects.bulk_create(
+                [
+                    Signature(content_type=content_type, object_id=timesheet.id, user=user, signed_text=signed_text)
+                    for timesheet in timesheets
+                ]
+            )
+            cls.objects.filter(id__in=[timesheet.id for timesheet in timesheets]).update(is_approved=True)
+
+            for internship_id in {timesheet.internship_id for timesheet in timesheets}:
+                sync_tags(Internship, internship_id, type="hours")
+
+        return len(timesheets)
 
     @property
     def duration(self) -> time:
@@ -123,6 +155,34 @@ class Timesheet(SignaturesMixin, BaseModel):
         return time(hours, minutes)
 
 
+def _get_minutes(field: str) -> models.Expression:
+    return ExtractHour(field) * 60 + ExtractMinute(field)
+
+
+def get_timesheet_minutes() -> models.Expression:
+    """Get the duration of a timesheet in minutes, as a database expression (see `Timesheet.duration`)."""
+    return Coalesce(_get_minutes("end_time_am") - _get_minutes("start_time_am"), 0) + Coalesce(
+        _get_minutes("end_time_pm") - _get_minutes("start_time_pm"), 0
+    )
+
+
+def get_timesheets_minutes(internship_ids: Iterable[int] | models.QuerySet) -> dict[int, tuple[int, int]]:
+    """Sum the durations of the timesheets of several internships, with one GROUP BY query.
+
+    :param internship_ids: The ids of the internships, or a queryset of ids.
+    :returns: The sums, as internship_id: (total minutes, approved minutes) (internships without timesheets are left
+        out).
+    """
+    minutes = get_timesheet_minutes()
+    rows = (
+        Timesheet.objects.filter(internship_id__in=internship_ids)
+        .values("internship_id")
+        .annotate(total=Sum(minutes), approved=Sum(minutes, filter=Q(is_approved=True), default=0))
+        .values_list("internship_id", "total", "approved")
+    )
+    return {internship_id: (total, approved) for internship_id, total, approved in rows}
+
+
 @receiver(post_save, sender=Timesheet)
 def post_save_timesheet(sender, instance, **kwargs):
     """Update the timesheet tags of the associated internship when a timesheet is saved."""
@@ -139,4 +199,4 @@ def sync_timesheet_tags(instance):
     """Sync the timesheet tags of the associated internship."""
     from metis.models.stages.internships import Internship
 
-    Internship.update_tags(instance.internship, type="hours")
+    sync_tags(Internship, instance.internship_id, type="hours")
@@ -0,0 +1,186 @@
+from collections import Counter
+from datetime import datetime
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+from django.core.cache import cache
+
+from metis.models import Evaluation, EvaluationForm, Internship, Mentor, Project
+
+
+EVALUATION_CUBE_TIMEOUT = 60 * 60 * 24 * 7  # seconds
+EVALUATION_AGGREGATES_TIMEOUT = 60 * 15  # seconds
+
+EVALUATION_CUBE_COLUMNS = ("evaluation_id", "internship_id", "intermediate", "section", "item", "score", "points")
+EVALUATION_CUBE_DIMENSIONS = {
+    "place": "project_place__place_id",
+    "discipline": "discipline_id",
+    "period": "period_id",
+    "mentor": None,  # from the mentors of the internships
+}
+
+
+class EvaluationCube(NamedTuple):
+    """The scores of the approved evaluations of a project (self-evaluations excepted), as a columnar table.
+
+    The table has a row for every score of an evaluation, with the columns:
+
+    - evaluation_id, internship_id, intermediate
+    - section: the code of the section ("" for the global score)
+    - item: the value of the item ("" for the score of a section, or the global score)
+    - score: the value of the score
+    - points: the points of the score (NaN for scores without points)
+
+    - updated_at: the most recent update of the evaluations in the table (None if it is empty)
+    - count: the number of evaluations in the table
+    """
+
+    table: pd.DataFrame
+    updated_at: datetime | None
+    count: int
+
+    @property
+    def version(self) -> str:
+        """The version of the table, that changes whenever evaluations are added or removed."""
+        checksum = int(self.table["evaluation_id"].unique().sum())
+        return f"{self.updated_at.timestamp() if self.updated_at else 0}_{self.count}_{checksum}"
+
+
+def _evaluation_cube_key(project_id: int) -> str:
+    return f"evaluation_cube_{project_id}"
+
+
+def invalidate_evaluation_cube(project_id: int) -> None:
+    """Remove the cached evaluation cube of a project, so it is built again from scratch."""
+    cache.delete(_evaluation_cube_key(project_id))
+
+
+def get_evaluation_cube(project: Project) -> EvaluationCube:
+    """Get the evaluation cube of a project, brought up to date.
+
+    The cube is kept in the cache. Only the evaluations that were updated (or approved) since the last build are
+    added to it, and the evaluations that were removed (or are no longer approved) are dropped from it, by comparing
+    its evaluation ids with those in the database.
+
+    :param project: The project.
+    :returns: The evaluation cube.
+    """
+    evaluations = Evaluation.objects.filter(internship__project=project, is_approved=True, is_self_evaluation=False)
+    cube = cache.get(_evaluation_cube_key(project.id))
+
+    if cube is not None and cube.updated_at is not None:
+        delta = evaluations.filter(updated_at__gte=cube.updated_at)  # an evaluation can be in the table already
+        cube = _update_evaluation_cube(cube, delta)
+
+        # the ids are compared, since a count can stay the same when evaluations are both removed and added
+        removed_ids = set(cube.table["evaluation_id"].unique()) - set(evaluations.values_list("id", flat=True))
+        if removed_ids:
+            table = cube.table[~cube.table["evaluation_id"].isin(removed_ids)]
+            cube = cube._replace(table=table, count=table["evaluation_id"].nunique())
+
+    if cube is None or cube.updated_at is None:
+        cube = _update_evaluation_cube(
+            EvaluationCube(table=_get_scores_table([]), updated_at=None, count=0), evaluations
+        )
+
+    cache.set(_evaluation_cube_key(project.id), cube, EVALUATION_CUBE_TIMEOUT)
+    return cube
+
+
+def _update_evaluation_cube(cube: EvaluationCube, evaluations) -> EvaluationCube:
+    """Replace the rows of the given evaluations in a cube."""
+    evaluations = list(
+        evaluations.values_list("id", "internship_id", "intermediate", "form_id", "data", "updated_at").order_by("id")
+    )
+    if not evaluations:
+        return cube
+
+    forms = {form.id: form.compiled for form in EvaluationForm.objects.filter(id__in={row[3] for row in evaluations})}
+    table = cube.table[~cube.table["evaluation_id"].isin([row[0] for row in evaluations])]
+    new_table = _get_scores_table(evaluations, forms)
+    table = pd.concat([table, new_table], ignore_index=True) if len(table) else new_table
+    updated_at = max([row[5] for row in evaluations] + ([cube.updated_at] if cube.updated_at else []))
+
+    return EvaluationCube(table=table, updated_at=updated_at, count=table["evaluation_id"].nunique())
+
+
+def _get_scores_table(evaluations: list[tuple], forms: dict | None = None) -> pd.DataFrame:
+    """Flatten the scores of evaluations to a table, see `EvaluationCube`."""
+    rows = []
+
+    for evaluation_id, internship_id, intermediate, form_id, data, _ in evaluations:
+        points = forms[form_id].points
+        key = (evaluation_id, internship_id, intermediate)
+
+        if "global_score" in data:
+            rows.append((*key, "", "", data["global_score"], points.get(data["global_score"])))
+
+        for section_code, section_data in data.get("sections", {}).items():
+            if "score" in section_data:
+                rows.append((*key, section_code, "", section_data["score"], points.get(section_data["score"])))
+            for item_value, (score, *_) in section_data.get("scores", {}).items():
+                rows.append((*key, section_code, item_value, score, points.get(score)))
+
+    table = pd.DataFrame(rows, columns=EVALUATION_CUBE_COLUMNS)
+    return table.astype({"evaluation_id": int, "internship_id": int, "intermediate": int, "points": float})
+
+
+def get_evaluation_aggregates(project: Project, *, by: str, intermediate: int = 0) -> list[dict]:
+    """Get the aggregates of the scores of the evaluations of a project, by place, mentor, discipline or period.
+
+    The aggregates are cached for the version of the evaluation cube (see `get_evaluation_cube`).
+
+    :param project: The project.
+    :param by: The dimension, one of `EVALUATION_CUBE_DIMENSIONS`.
+    :param intermediate: The intermediate evaluation (0 is the final evaluation).
+    :returns: For each value of the dimension, section and item (see `EvaluationCube`): the number of responses, the
+        mean of the points (None if no score has points), and the histogram of the scores as score: count.
+    :raises ValueError: If the dimension is not valid.
+    """
+    if by not in EVALUATION_CUBE_DIMENSIONS:
+        raise ValueError(f"Invalid dimension `{by}`, should be one of: {', '.join(EVALUATION_CUBE_DIMENSIONS)}")
+
+    cube = get_evaluation_cube(project)
+    key = f"evaluation_aggregates_{project.id}_{cube.version}_{by}_{intermediate}"
+
+    if (aggregates := cache.get(key)) is None:
+        aggregates = _get_aggregates(project, cube.table[cube.table["intermediate"] == intermediate], by=by)
+        cache.set(key, aggregates, EVALUATION_AGGREGATES_TIMEOUT)
+
+    return aggregates
+
+
+def _get_aggregates(project: Project, table: pd.DataFrame, *, by: str) -> list[dict]:
+    """Aggregate the rows of an evaluation cube by a dimension of the internships."""
+    if by == "mentor":
+        dimension = pd.DataFrame(
+            Mentor.objects.filter(internship__project=project).values_list("internship_id", "user_id"),
+            columns=["internship_id", by],
+        )
+    else:
+        dimension = pd.DataFrame(
+            Internship.objects.filter(project=project).values_list("id", EVALUATION_CUBE_DIMENSIONS[by]),
+            columns=["internship_id", by],
+        )
+
+    table = table.merge(dimension.dropna(), on="internship_id")
+    if table.empty:
+        return []
+
+    table[by] = table[by].astype(int)
+    aggregates = []
+    for (value, section, item), group in table.groupby([by, "section", "item"], sort=True):
+        mean = group["points"].mean()
+        aggregates.append(
+            {
+                by: int(value),
+                "section": section,
+                "item": item,
+                "count": len(group),
+                "mean": None if np.isnan(mean) else round(float(mean), 2),
+                "histogram": dict(Counter(None if pd.isna(score) else score for score in group["score"])),
+            }
+        )
+
+    return aggregates
@@ -0,0 +1,122 @@
+from collections import Counter
+from itertools import groupby
+from typing import NamedTuple
+
+from django.contrib.contenttypes.models import ContentType
+
+from metis.models import Discipline, Internship, ProgramInternship, Project, Student, Track, TrackInternship
+from metis.models.stages.constraints import CompiledConstraints, get_compiled_constraints_for_objects
+
+
+class DisciplineViolation(NamedTuple):
+    """A violation of the discipline rules of a track, by the internships of a student.
+
+    - code: `not_in_track`, `not_available`, `max_repeat`, `max_count` or `min_count`
+    - internship_id: the internship that breaks the rule, or None if the rule can no longer be met by the student
+    """
+
+    student_id: int
+    student: str
+    track: str
+    internship_id: int | None
+    code: str
+    message: str
+
+
+def audit_discipline_constraints(project: Project) -> list[DisciplineViolation]:
+    """Check the internships of all the students of a project against the discipline rules of their track.
+
+    All the data is loaded up front in a few queries, and every student's sequence of disciplines (in the order of
+    the internships) is checked in memory against the compiled constraints of the track:
+
+    - the program internship of each internship is part of the track
+    - the discipline of each internship is available for its program internship (or else for the track)
+    - no discipline is repeated more than the max_repeat of a constraint
+    - no constraint counts more disciplines than its max_count
+    - every min_count can still be met with the internships of the track that are not planned yet
+
+    :param project: The project.
+    :returns: The violations, ordered by student and internship.
+    """
+    internships = list(
+        Internship.objects.filter(project=project, track__isnull=False)
+        .exclude(status__in=[Internship.CANCELLED, Internship.UNSUCCESSFUL])
+        .order_by("student_id", "track_id", "start_date", "id")
+        .values_list("id", "student_id", "track_id", "period__program_internship_id", "discipline_id")
+    )
+    track_ids = {track_id for _, _, track_id, _, _ in internships}
+
+    track_program_internships = {track_id: set() for track_id in track_ids}
+    for track_id, program_internship_id in TrackInternship.objects.filter(track_id__in=track_ids).values_list(
+        "track_id", "program_internship_id"
+    ):
+        track_program_internships[track_id].add(program_internship_id)
+
+    track_constraints = get_compiled_constraints_for_objects(ContentType.objects.get_for_model(Track).id, track_ids)
+    program_constraints = get_compiled_constraints_for_objects(
+        ContentType.objects.get_for_model(ProgramInternship).id,
+        {program_internship_id for _, _, _, program_internship_id, _ in internships if program_internship_id},
+    )
+    students = Student.objects.select_related("user").in_bulk({student_id for _, student_id, _, _, _ in internships})
+    tracks = Track.objects.in_bulk(track_ids)
+    disciplines = Discipline.objects.in_bulk(
+        {discipline_id for *_, discipline_id in internships if discipline_id}
+        | {discipline_id for compiled in track_constraints.values() for discipline_id in compiled.bits}
+    )
+
+    violations = []
+
+    for (student_id, track_id), rows in groupby(internships, key=lambda row: (row[1], row[2])):
+        rows = list(rows)
+        compiled = track_constraints[track_id]
+        issues = []  # (internship_id, code, message)
+        counts = Counter()
+        constraint_counts = [0] * len(compiled.masks)
+
+        for internship_id, _, _, program_internship_id, discipline_id in rows:
+            if program_internship_id not in track_program_internships[track_id]:
+                issues.append((internship_id, "not_in_track", "The internship is not part of the track."))
+
+            if discipline_id is None:
+                continue
+
+            name = disciplines[discipline_id].name
+            available = program_constraints.get(program_internship_id)
+            if not (available and available.bits):
+                available = compiled
+            if discipline_id not in available.bits:
+                issues.append((internship_id, "not_available", f"{name} is not available."))
+
+            counts[discipline_id] += 1
+            bit = 1 << compiled.bits[discipline_id] if discipline_id in compiled.bits else 0
+
+            for index, mask in enumerate(compiled.masks):
+                if not mask & bit:
+                    continue
+
+                constraint_counts[index] += 1
+                max_repeat, max_count = compiled.max_repeats[index], compiled.max_counts[index]
+
+                if max_repeat is not None and counts[discipline_id] == max_repeat + 1:
+                    message = f"{name} is repeated more than {max_repeat} time(s)."
+                    issues.append((internship_id, "max_repeat", message))
+                if max_count is not None and constraint_counts[index] == max_count + 1:
+                    message = f"More than {max_count} internship(s) in {_get_names(compiled, index, disciplines)}."
+                    issues.append((internship_id, "max_count", message))
+
+        # the internships of the track without a discipline (yet) can still count for the min_count
+        remaining = max(0, len(track_program_internships[track_id]) - sum(counts.values()))
+
+        for index, min_count in enumerate(compiled.min_counts):
+            if min_count is not None and constraint_counts[index] + remaining < min_count:
+                message = f"Less than {min_count} internship(s) in {_get_names(compiled, index, disciplines)}."
+                issues.append((None, "min_count", message))
+
+        student_name, track_name = students[student_id].name, tracks[track_id].name
+        violations += [DisciplineViolation(student_id, student_name, track_name, *issue) for issue in issues]
+
+    return violations
+
+
+def _get_names(compiled: CompiledConstraints, index: int, disciplines: dict[int, Discipline]) -> str:
+    return ", ".join(disciplines[discipline_id].name for discipline_id in compiled.get_discipline_ids(index))
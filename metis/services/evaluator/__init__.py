@@ -1,4 +1,5 @@
 from .base import get_evaluator
+from .batch import evaluate_internships
 
 
-__all__ = ["get_evaluator"]
+__all__ = ["evaluate_internships", "get_evaluator"]
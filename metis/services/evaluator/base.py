@@ -30,8 +30,7 @@ class Evaluator:
         if not self.evaluation_form or not self.evaluation:
             return None
 
-        scores = {score["value"]: score for score in self.evaluation_form.definition["scores"]}
-        return scores[self.evaluation.data["global_score"]]["points"]
+        return self.evaluation_form.compiled.points[self.evaluation.data["global_score"]]
 
 
 def get_evaluator(internship: Internship) -> Evaluator:
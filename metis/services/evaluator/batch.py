@@ -0,0 +1,124 @@
+from collections import defaultdict
+
+import numpy as np
+from django.db.models import QuerySet
+
+from metis.models.stages import Evaluation, Internship
+from metis.models.stages.internships import get_evaluation_forms
+
+from ..form_builder.evaluations import CompiledEvaluationForm, FinalScoreStrategy
+from .gezbev import GezbevEvaluator
+
+
+def evaluate_internships(internships: QuerySet[Internship]) -> dict[int, float | None]:
+    """Evaluate many internships at once, with the same results as their evaluator (see `get_evaluator`).
+
+    The approved final evaluations are fetched in one query, and the evaluation forms of the projects in one query
+    per project (at most). The scores of all the evaluations with the same form are then computed at once.
+
+    :param internships: The internships to evaluate.
+    :returns: The final scores, as internship_id: score. Internships without an approved final evaluation are left out.
+    """
+    evaluations = list(
+        Evaluation.objects.filter(
+            internship__in=internships, intermediate=0, is_approved=True, is_self_evaluation=False
+        ).values_list(
+            "internship_id",
+            "internship__project_id",
+            "internship__period_id",
+            "internship__discipline_id",
+            "internship__project__education__code",
+            "data",
+        )
+    )
+    evaluation_forms = get_evaluation_forms({tuple(evaluation[1:4]) for evaluation in evaluations})
+
+    scores = {}
+    groups = defaultdict(list)  # (form_id, is_gezbev): [(internship_id, data)]
+
+    for internship_id, project_id, period_id, discipline_id, education_code, data in evaluations:
+        evaluation_form = evaluation_forms[(project_id, period_id, discipline_id)]
+        if evaluation_form is None:
+            scores[internship_id] = None
+        elif education_code == GezbevEvaluator.education_code:
+            groups[(evaluation_form.id, True)].append((internship_id, data))
+        else:
+            groups[(evaluation_form.id, False)].append((internship_id, data))
+
+    compiled_forms = {form.id: form.compiled for form in evaluation_forms.values() if form is not None}
+
+    for (form_id, is_gezbev), rows in groups.items():
+        compiled = compiled_forms[form_id]
+        internship_ids = [internship_id for internship_id, _ in rows]
+
+        if is_gezbev:
+            values = evaluate_gezbev(compiled, [data for _, data in rows], scale=GezbevEvaluator.default_scale)
+        else:
+            values = [compiled.points[data["global_score"]] for _, data in rows]
+
+        scores.update(zip(internship_ids, values, strict=True))
+
+    return scores
+
+
+def evaluate_gezbev(compiled: CompiledEvaluationForm, responses: list[dict], *, scale: int) -> list[float | None]:
+    """Compute the final scores of many responses to the same form, the way `GezbevEvaluator` does.
+
+    The points of the responses are collected in an array of (responses, items), and summed per row (or per section)
+    with `np.cumsum`, that adds them in the same order as the evaluator does, so the results are exactly the same.
+    The rounding is done by Python, since `np.round` can round differently.
+
+    :param compiled: The compiled evaluation form.
+    :param responses: The data of the evaluations.
+    :param scale: The scale of the final score.
+    :returns: The final scores, in the order of the responses (None if a score could not be calculated).
+    """
+    if not compiled.max_points or not responses:
+        return [None] * len(responses)
+
+    item_indexes = defaultdict(list)
+    for index, key in enumerate(compiled.items):
+        item_indexes[key].append(index)
+
+    points = np.zeros((len(responses), len(compiled.items)))
+    max_points = np.zeros(points.shape)
+
+    for row, data in enumerate(responses):
+        for section_code, section_data in data["sections"].items():
+            for item_code, item_data in section_data["scores"].items():
+                p = compiled.points[item_data[0]]
+
+                if p is not None:  # ignore 'nvt' scores
+                    for index in item_indexes.get((section_code, item_code), []):
+                        points[row, index] = p
+                        max_points[row, index] = compiled.max_points
+
+    if compiled.final_score_strategy == FinalScoreStrategy.AVERAGE_ITEMS:
+        totals = np.cumsum(points, axis=1)[:, -1]
+        max_totals = np.cumsum(max_points, axis=1)[:, -1]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ratios = (totals / max_totals) * scale
+
+        return [
+            round(float(ratio), 2) if max_total else None for ratio, max_total in zip(ratios, max_totals, strict=True)
+        ]
+
+    if compiled.final_score_strategy != FinalScoreStrategy.AVERAGE_SECTIONS_FIRST:
+        return [None] * len(responses)
+
+    item_sections = np.array(compiled.item_sections)
+    section_scores = np.zeros((len(responses), len(compiled.sections)))
+    is_valid = np.ones(len(responses), dtype=bool)
+
+    for section_index in range(len(compiled.sections)):
+        columns = item_sections == section_index
+        totals = np.cumsum(points[:, columns], axis=1)[:, -1]
+        max_totals = np.cumsum(max_points[:, columns], axis=1)[:, -1]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ratios = (totals / max_totals) * 20
+
+        section_scores[:, section_index] = [round(float(ratio), 2) for ratio in ratios]
+        is_valid &= max_totals > 0
+
+    ratios = (np.cumsum(section_scores, axis=1)[:, -1] / (len(compiled.sections) * 20)) * scale
+    return [round(float(ratio), 2) if valid else None for ratio, valid in zip(ratios, is_valid, strict=True)]
@@ -20,60 +20,67 @@ class GezbevEvaluator(Evaluator):
         if not self.evaluation_form or not self.evaluation:
             return None
 
-        scores = {score["value"]: score for score in self.evaluation_form.definition["scores"]}
-        max_score = max([score["points"] for score in self.evaluation_form.definition["scores"] if score["points"]])
+        compiled = self.evaluation_form.compiled
+        max_score = compiled.max_points
+        if not max_score:
+            return None
 
         # make a dict of the scores for easier access
         evaluation_scores = {}
 
         for section_code, section_data in self.evaluation.data["sections"].items():
             for item_code, item_data in section_data["scores"].items():
-                evaluation_scores[(section_code, item_code)] = scores[item_data[0]]["points"]
+                evaluation_scores[(section_code, item_code)] = compiled.points[item_data[0]]
 
         # go through the evaluation form and calculate the score
         # based on the final score strategy
 
         # FinalScoreStrategy.AVERAGE_ITEMS
 
-        if self.evaluation_form.definition["final_score_strategy"] == FinalScoreStrategy.AVERAGE_ITEMS:
+        if compiled.final_score_strategy == FinalScoreStrategy.AVERAGE_ITEMS:
             # we calculate the score by summing the points and dividing by the maximum points possible
             # we then normalize the final result to the desired scale
 
             max_points = 0
             points = 0
 
-            for section in self.evaluation_form.definition["sections"]:
-                for item in section["items"]:
-                    p = evaluation_scores.get((section["code"], item["value"]), None)
+            for key in compiled.items:
+                p = evaluation_scores.get(key)
+
+                if p is not None:  # ignore 'nvt' scores
+                    max_points += max_score
+                    points += p
 
-                    if p is not None:  # ignore 'nvt' scores
-                        max_points += max_score
-                        points += p
+            if not max_points:  # only 'nvt' scores
+                return None
 
             return round((points / max_points) * self.get_scale(), 2)
 
         # FinalScoreStrategy.AVERAGE_SECTIONS_FIRST
 
-        if self.evaluation_form.definition["final_score_strategy"] == FinalScoreStrategy.AVERAGE_SECTIONS_FIRST:
+        if compiled.final_score_strategy == FinalScoreStrategy.AVERAGE_SECTIONS_FIRST:
             # per section we sum the points, dividing by the maximum points and normalize to a 20 point scale
             # we then sum the section scores and normalize the final result to the desired scale
 
-            section_scores = {}
+            section_max_points = [0] * len(compiled.sections)
+            section_points = [0] * len(compiled.sections)
 
-            for section in self.evaluation_form.definition["sections"]:
-                section_max_points = 0
-                section_points = 0
+            for key, index in zip(compiled.items, compiled.item_sections, strict=True):
+                p = evaluation_scores.get(key)
 
-                for item in section["items"]:
-                    p = evaluation_scores.get((section["code"], item["value"]), None)
+                if p is not None:  # ignore 'nvt' scores
+                    section_max_points[index] += max_score
+                    section_points[index] += p
 
-                    if p is not None:  # ignore 'nvt' scores
-                        section_max_points += max_score
-                        section_points += p
+            if not all(section_max_points):  # only 'nvt' scores in a section
+                return None
 
-                section_scores[section["code"]] = round((section_points / section_max_points) * 20, 2)
+            section_scores = [
+                round((points / max_points) * 20, 2)
+                for points, max_points in zip(section_points, section_max_points, strict=True)
+            ]
 
-            return round((sum(section_scores.values()) / (len(section_scores) * 20)) * self.get_scale(), 2)
+            return round((sum(section_scores) / (len(section_scores) * 20)) * self.get_scale(), 2)
 
         # default to None if the strategy is not implemented
 
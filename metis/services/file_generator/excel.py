@@ -34,8 +34,8 @@ class Excel:
         """Get the sheets of the Excel file."""
         raise NotImplementedError
 
-    def get_response(self) -> ExcelResponse:
-        """Generate an Excel file with all the sheets."""
+    def get_content(self) -> bytes:
+        """Generate the content of an Excel file with all the sheets."""
         buffer = BytesIO()
 
         with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
@@ -44,4 +44,8 @@ class Excel:
 
         buffer.seek(0)  # rewind the buffer
 
-        return ExcelResponse(buffer.read(), filename=f"{self.get_filename()}.xlsx")
+        return buffer.read()
+
+    def get_response(self) -> ExcelResponse:
+        """Generate an Excel file with all the sheets."""
+        return ExcelResponse(self.get_content(), filename=f"{self.get_filename()}.xlsx")
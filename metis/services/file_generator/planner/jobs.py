@@ -0,0 +1,217 @@
+import logging
+from collections.abc import Callable
+from hashlib import sha1
+from typing import NamedTuple
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+
+from metis.models import File, Project, Questioning, Track
+
+from ..excel import Excel
+from .planning import PlanningExcel, PlanningExcelOptions, get_planning_inputs_fingerprint
+from .track_planning import TrackPlanningExcel, get_track_planning_inputs_fingerprint
+
+
+PLANNING_JOB_STATES = ("queued", "loading", "solving", "writing", "done", "failed")
+PLANNING_JOB_RUNNING_STATES = ("queued", "loading", "solving", "writing")
+PLANNING_JOB_TIMEOUT = 60 * 60  # seconds
+
+logger = logging.getLogger(__name__)
+
+
+class PlanningJob(NamedTuple):
+    """The state of a planning job, and its result file when it is done."""
+
+    job_id: str
+    state: str
+    file: File | None = None
+    error: str = ""
+
+    @property
+    def is_running(self) -> bool:
+        """A boolean indicating whether the job is still running."""
+        return self.state in PLANNING_JOB_RUNNING_STATES
+
+
+def get_planning_job_id(questioning: Questioning, options: PlanningExcelOptions, *, fingerprint: str = "") -> str:
+    """Get the id of the planning job for a questioning and options, so identical jobs share the same id.
+
+    The id ends with the fingerprint of the inputs, so a finished job is reused until the inputs change.
+    """
+    fingerprint = fingerprint or get_planning_inputs_fingerprint(questioning)
+    return sha1(f"{questioning.id}:{options.model_dump_json()}".encode()).hexdigest()[:8] + fingerprint
+
+
+def get_track_planning_job_id(project: Project, track: Track, *, fingerprint: str = "") -> str:
+    """Get the id of the planning job for a track of a project, that ends with the fingerprint of the inputs."""
+    fingerprint = fingerprint or get_track_planning_inputs_fingerprint(project, track)
+    return sha1(f"{project.id}:track:{track.id}".encode()).hexdigest()[:8] + fingerprint
+
+
+def get_planning_file_code(job_id: str) -> str:
+    """Get the code of the File with the result of a planning job."""
+    return f"planning:{job_id}"
+
+
+def _state_key(job_id: str) -> str:
+    return f"planning_job_{job_id}"
+
+
+def _lock_key(job_id: str) -> str:
+    return f"planning_job_{job_id}_lock"
+
+
+def set_planning_job_state(job_id: str, state: str, *, error: str = "") -> None:
+    """Store the state of a planning job.
+
+    :param job_id: The id of the job.
+    :param state: One of `PLANNING_JOB_STATES`.
+    :param error: The reason why a failed job could not make the planning, to show to the user.
+    :raises ValueError: If the state is not valid.
+    """
+    if state not in PLANNING_JOB_STATES:
+        raise ValueError(f"Invalid planning job state: {state}")
+
+    cache.set(_state_key(job_id), {"state": state, "error": error}, PLANNING_JOB_TIMEOUT)
+
+
+def get_planning_job(obj: Questioning | Project, job_id: str) -> PlanningJob | None:
+    """Get the state of a planning job.
+
+    The state is kept in the cache while the job runs; a stored result file always means the job is done.
+
+    :param obj: The object the result file is stored on: the questioning, or the project for a track planning.
+    :returns: The planning job, or None if the job is unknown (or expired).
+    """
+    data = cache.get(_state_key(job_id)) or {}
+    file = obj.files.filter(code=get_planning_file_code(job_id)).order_by("-version").first()
+    state = data.get("state") or ("done" if file else None)
+
+    if state is None:
+        return None
+
+    if state == "done" and file is None:
+        state = "failed"
+
+    return PlanningJob(job_id=job_id, state=state, file=file if state == "done" else None, error=data.get("error", ""))
+
+
+def start_planning_job(questioning: Questioning, options: PlanningExcelOptions) -> PlanningJob:
+    """Start a planning job in the background, unless an identical job is already running or done.
+
+    A job is done when the file with its result is stored, so the planning is only recomputed when the options or
+    the inputs change. Planning files of outdated inputs are deleted when a new job starts.
+
+    :param questioning: The student tops questioning to plan.
+    :param options: The planning options.
+    :returns: The (new or running) planning job.
+    """
+    from metis.tasks.planning import generate_planning_file
+
+    fingerprint = get_planning_inputs_fingerprint(questioning)
+    job_id = get_planning_job_id(questioning, options, fingerprint=fingerprint)
+
+    return _start_job(
+        questioning,
+        job_id,
+        fingerprint,
+        prefix=get_planning_file_code(""),
+        enqueue=lambda: generate_planning_file(questioning.id, options.model_dump(), job_id),
+    )
+
+
+def start_track_planning_job(project: Project, track: Track) -> PlanningJob:
+    """Start a job in the background that plans all the periods of a track (see `TrackPlanningExcel`).
+
+    As in `start_planning_job`, the result file (stored on the project) is reused until the inputs change.
+
+    :param project: The project.
+    :param track: The track to plan.
+    :returns: The (new or running) planning job.
+    """
+    from metis.tasks.planning import generate_track_planning_file
+
+    fingerprint = get_track_planning_inputs_fingerprint(project, track)
+    job_id = get_track_planning_job_id(project, track, fingerprint=fingerprint)
+
+    return _start_job(
+        project,
+        job_id,
+        fingerprint,
+        prefix=get_planning_file_code(job_id[:8]),
+        enqueue=lambda: generate_track_planning_file(project.id, track.id, job_id),
+    )
+
+
+def _start_job(
+    obj: Questioning | Project, job_id: str, fingerprint: str, *, prefix: str, enqueue: Callable[[], None]
+) -> PlanningJob:
+    if (job := get_planning_job(obj, job_id)) is not None and job.state == "done":
+        return job
+
+    # the lock is only released when the job ends, so double clicks don't start a second solve
+    if not cache.add(_lock_key(job_id), True, PLANNING_JOB_TIMEOUT):
+        return get_planning_job(obj, job_id) or PlanningJob(job_id=job_id, state="queued")
+
+    for file in obj.files.filter(code__startswith=prefix):
+        if file.code == get_planning_file_code(job_id) or not file.code.endswith(fingerprint):
+            file.delete()
+    set_planning_job_state(job_id, "queued")
+    enqueue()
+
+    return get_planning_job(obj, job_id) or PlanningJob(job_id=job_id, state="queued")
+
+
+def run_planning_job(questioning_id: int, options: dict, job_id: str) -> None:
+    """Generate a planning file and store it as a File on the questioning, keeping track of the progress.
+
+    :param questioning_id: The id of the questioning.
+    :param options: The planning options.
+    :param job_id: The id of the job.
+    """
+
+    def get_excel(on_progress: Callable[[str], None]) -> tuple[Questioning, Excel]:
+        questioning = Questioning.objects.get(id=questioning_id)
+        return questioning, PlanningExcel(questioning, options=options, on_progress=on_progress)
+
+    _run_job(job_id, get_excel)
+
+
+def run_track_planning_job(project_id: int, track_id: int, job_id: str) -> None:
+    """Generate the planning file of a track and store it as a File on the project, keeping track of the progress.
+
+    :param project_id: The id of the project.
+    :param track_id: The id of the track.
+    :param job_id: The id of the job.
+    """
+
+    def get_excel(on_progress: Callable[[str], None]) -> tuple[Project, Excel]:
+        project = Project.objects.get(id=project_id)
+        track = Track.objects.get(id=track_id, program_id=project.program_id)
+        return project, TrackPlanningExcel(project, track, on_progress=on_progress)
+
+    _run_job(job_id, get_excel)
+
+
+def _run_job(job_id: str, get_excel: Callable[[Callable[[str], None]], tuple[Questioning | Project, Excel]]) -> None:
+    try:
+        obj, excel = get_excel(lambda state: set_planning_job_state(job_id, state))
+        set_planning_job_state(job_id, "writing")
+        File.objects.create(
+            content_object=obj,
+            code=get_planning_file_code(job_id),
+            file=ContentFile(excel.get_content(), name=f"{excel.get_filename()}.xlsx"),
+            description="Planning",
+        )
+        set_planning_job_state(job_id, "done")
+    except ValueError as exc:
+        # the planning can't be made with these inputs and options, e.g. more pinned students than seats
+        set_planning_job_state(job_id, "failed", error=str(exc))
+    except Exception:
+        # an unexpected error is only logged, since it can reveal internals to the users
+        logger.exception("Planning job %s failed", job_id)
+        set_planning_job_state(job_id, "failed")
+        raise
+    finally:
+        cache.delete(_lock_key(job_id))
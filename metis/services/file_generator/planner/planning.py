@@ -1,16 +1,33 @@
+from collections import Counter
+from collections.abc import Callable
 from datetime import datetime
+from functools import partial
+from hashlib import sha1
+from typing import Literal, NamedTuple, get_args
 
 import pandas as pd
+from django.core.cache import cache
+from django.db.models import Count, Max, Min
 from django.utils.text import slugify
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
-from metis.models import ProjectPlaceAvailability, Questioning
+from metis.models import Place, ProjectPlace, ProjectPlaceAvailability, Questioning, Student, User
+from metis.models.rel.addresses import get_coordinates
+from metis.models.rel.forms import FormResponse
+from metis.services.planner.distance import DistanceTerm
+from metis.services.planner.flow import min_cost_flow_optimizer
 from metis.services.planner.hungarian import hungarian_optimizer
-from metis.services.planner.utils import find_students_for_places
+from metis.services.planner.sweep import SweepResult, sweep_optimizer
+from metis.services.planner.utils import TopsIndex, find_students_for_places, get_tops_index
 
 from ..excel import Excel, ExcelSheet
 
 
+Solver = Literal["auto", "dense", "sparse", "flow"]
+SOLVERS = get_args(Solver)
+PLANNING_INPUTS_TIMEOUT = 10 * 60  # seconds
+
+
 class PlanningExcelOptions(BaseModel):
     """Options for the PlanningExcel class."""
 
@@ -18,96 +35,284 @@ class PlanningExcelOptions(BaseModel):
     students_to_skip: list[int] | None = None
     places_with_students: list[int] | None = None
     places_to_skip: list[int] | None = None
+    solver: Solver = "auto"
+    sweep: int | None = Field(default=None, ge=1, le=500)
+    sweep_objective: Literal["sum_of_ranks", "first_choices", "worst_rank"] = "sum_of_ranks"
+    distance_weight: float = Field(default=0.0, ge=0)
+    max_distance: float | None = Field(default=None, gt=0)
+
+
+class PlanningInputs(NamedTuple):
+    """The inputs of the planning of a student tops questioning, as loaded from the database.
+
+    - student_tops: the tops of all the responses, as (student_id, top_choices), in the order of the responses
+    - target_student_ids: the students of the target group of the questioning
+    - project_place_availability: the max availability of the project places with a min availability, in the period
+    - project_place_minimum: the min availability of the project places, in the period
+    - tops_index: the inverted index of the tops (see `get_tops_index`)
+    - seed: the random seed of the questioning (see `Questioning.random_seed`)
+    """
+
+    student_tops: list[tuple[int, list[int] | None]]
+    target_student_ids: frozenset[int]
+    project_place_availability: dict[int, int]
+    project_place_minimum: dict[int, int]
+    tops_index: TopsIndex
+    seed: int | None
+
+
+class PlanningResult(NamedTuple):
+    """The outcome of a planning, with the seed it was made with and the results of the sweep (if any)."""
+
+    planning: list[tuple[int, int, int, bool]]
+    seed: int | None
+    sweep_results: list[SweepResult]
+
+
+def get_planning_inputs_fingerprint(questioning: Questioning) -> str:
+    """Get a fingerprint of the inputs of the planning of a questioning, that changes whenever an input changes.
+
+    The inputs are the responses (the tops, and the seed of their first creation), the availability of the period
+    and the target group. Instead of loading and hashing the rows, each of them is summarised by its row count and
+    latest `updated_at`, in one aggregate query per table: an added, changed or deleted row changes the fingerprint.
+    """
+    responses = questioning.responses.aggregate(count=Count("id"), updated_at=Max("updated_at"), seed=Min("created_at"))
+    availability = ProjectPlaceAvailability.objects.filter(period=questioning.period).aggregate(
+        count=Count("id"), updated_at=Max("updated_at")
+    )
+    students = questioning.get_target_group().aggregate(count=Count("id"), updated_at=Max("updated_at"))
+    inputs = [questioning.id, *responses.values(), *availability.values(), *students.values()]
+
+    return sha1(":".join(str(value) for value in inputs).encode()).hexdigest()[:12]
+
+
+def load_planning_inputs(questioning: Questioning, *, responses: list[FormResponse] | None = None) -> PlanningInputs:
+    """Load the inputs of the planning of a student tops questioning.
+
+    :param questioning: The student tops questioning.
+    :param responses: The responses of the questioning, ordered by id, if they were already loaded.
+    :returns: The planning inputs.
+    """
+    if responses is None:
+        responses = list(questioning.responses.order_by("id"))
+
+    project_place_ids = questioning.project.project_places.filter(
+        availability_set__period=questioning.period, availability_set__min__gt=0
+    ).values_list("id", flat=True)
+    availability_set = list(ProjectPlaceAvailability.objects.filter(period=questioning.period))
+    availabilities = {a.project_place_id: a.max for a in availability_set}  # type: ignore
+    student_tops = [(response.object_id, response.data["tops"]) for response in responses]
+
+    return PlanningInputs(
+        student_tops=student_tops,
+        target_student_ids=frozenset(questioning.get_target_group().values_list("id", flat=True)),
+        project_place_availability={
+            project_place_id: availabilities[project_place_id] for project_place_id in project_place_ids
+        },
+        project_place_minimum={a.project_place_id: a.min for a in availability_set},  # type: ignore
+        tops_index=get_tops_index(student_tops),
+        # the same seed as `questioning.random_seed`, without a query
+        seed=int(min(response.created_at for response in responses).timestamp()) if responses else None,
+    )
+
+
+def get_cached_planning_inputs(questioning: Questioning) -> PlanningInputs:
+    """Load the inputs of the planning of a questioning, or get them from the cache if they did not change since.
+
+    The cache key ends with the fingerprint of the inputs, so a change to the inputs is never served from the cache.
+    """
+    key = f"planning_inputs_{questioning.id}_{get_planning_inputs_fingerprint(questioning)}"
+    inputs = cache.get(key)
+
+    if inputs is None:
+        inputs = load_planning_inputs(questioning)
+        cache.set(key, inputs, PLANNING_INPUTS_TIMEOUT)
+
+    return inputs
+
+
+def get_distance_term(
+    options: PlanningExcelOptions, student_tops: list[tuple[int, list[int]]], project_place_availability: dict[int, int]
+) -> DistanceTerm | None:
+    """Load the stored coordinates of the students and places, if the planning takes the distance into account."""
+    if not options.distance_weight and not options.max_distance:
+        return None
+
+    student_users = dict(Student.objects.filter(id__in=[s for s, _ in student_tops]).values_list("id", "user_id"))
+    project_place_places = dict(
+        ProjectPlace.objects.filter(id__in=project_place_availability).values_list("id", "place_id")
+    )
+    user_coordinates = get_coordinates(User, student_users.values())
+    place_coordinates = get_coordinates(Place, project_place_places.values())
+
+    return DistanceTerm(
+        student_coordinates={s: user_coordinates[u] for s, u in student_users.items() if u in user_coordinates},
+        place_coordinates={p: place_coordinates[q] for p, q in project_place_places.items() if q in place_coordinates},
+        weight=options.distance_weight,
+        max_distance=options.max_distance,
+    )
+
+
+def validate_planning_options(questioning: Questioning, options: PlanningExcelOptions) -> None:
+    """Check that the students and project places of the options are part of the planning of a questioning.
+
+    :param questioning: The student tops questioning.
+    :param options: The planning options.
+    :raises ValueError: If a student is not in the target group (or has no tops, to get the first choice), or a
+        project place is not part of the project.
+    """
+    target_student_ids = set(questioning.get_target_group().values_list("id", flat=True))
+    for student_id in options.students_to_skip or []:
+        if student_id not in target_student_ids:
+            raise ValueError(f"Student with id {student_id} not found in tops")
+
+    if options.students_with_first_choice:
+        student_ids = {
+            response.object_id
+            for response in questioning.responses.only("object_id", "data")
+            if response.data.get("tops") and response.object_id in target_student_ids
+        }
+        for student_id in options.students_with_first_choice:
+            if student_id not in student_ids or student_id in (options.students_to_skip or []):
+                raise ValueError(f"Student with id {student_id} not found in tops")
+
+    if options.places_with_students or options.places_to_skip:
+        project_place_ids = set(questioning.project.project_places.values_list("id", flat=True))
+        for project_place_id in (options.places_with_students or []) + (options.places_to_skip or []):
+            if project_place_id not in project_place_ids:
+                raise ValueError(f"Project place with id {project_place_id} not found in project")
+
+
+def solve_planning(inputs: PlanningInputs, options: PlanningExcelOptions) -> PlanningResult:
+    """Make a planning from the planning inputs, with the options.
+
+    :param inputs: The planning inputs.
+    :param options: The planning options.
+    :returns: The planning result, with tuples (student_id, project_place_id, rank, preassigned).
+    :raises ValueError: If a student in the options has no tops.
+    """
+    target_student_ids = set(inputs.target_student_ids)
+
+    # check if there are students to skip, based on options
+    if options.students_to_skip is not None:
+        for student_id in options.students_to_skip:
+            if student_id not in target_student_ids:
+                raise ValueError(f"Student with id {student_id} not found in tops")
+            target_student_ids.remove(student_id)
+
+    student_tops = [
+        (student_id, tops)
+        for student_id, tops in inputs.student_tops
+        if tops is not None and student_id in target_student_ids
+    ]
+    project_place_availability = dict(inputs.project_place_availability)
+    student_tops_dict = {student_id: tops for student_id, tops in student_tops}
+
+    # check if there are preassigned pairs, based on options
+    preassigned_pairs = []
+    preassigned_students = set()
+
+    if options.students_with_first_choice is not None:
+        for student_id in options.students_with_first_choice:
+            student_id = int(student_id)
+            if student_id not in student_tops_dict:
+                raise ValueError(f"Student with id {student_id} not found in tops")
+            preassigned_pairs.append((student_id, student_tops_dict[student_id][0]))
+            preassigned_students.add(student_id)
+
+    if options.places_with_students is not None:
+        top_students_for_places = find_students_for_places(
+            student_tops, options.places_with_students, tops_index=inputs.tops_index
+        )
+        for place_id, student_ids in top_students_for_places.items():
+            for student_id in student_ids:
+                if student_id in preassigned_students:
+                    continue
+                preassigned_pairs.append((student_id, place_id))
+                preassigned_students.add(student_id)
+                break
+
+    distance = get_distance_term(options, student_tops, project_place_availability)
+
+    if options.solver == "flow":
+        optimizer = partial(
+            min_cost_flow_optimizer, project_place_minimum=inputs.project_place_minimum, distance=distance
+        )
+    else:
+        optimizer = partial(hungarian_optimizer, solver=options.solver, tops_index=inputs.tops_index, distance=distance)
+
+    # with a sweep, the planning is made for several seeds and the best one is kept
+    if options.sweep:
+        sweep_results, best = sweep_optimizer(
+            student_tops,
+            project_place_availability,
+            preassigned_pairs,
+            [(inputs.seed or 0) + i for i in range(options.sweep)],
+            optimizer=optimizer,
+            objective=options.sweep_objective,
+        )
+        return PlanningResult(planning=list(best.planning), seed=best.seed, sweep_results=sweep_results)  # type: ignore
+
+    planning = optimizer(student_tops, project_place_availability, preassigned_pairs, inputs.seed)
+    return PlanningResult(planning=planning, seed=inputs.seed, sweep_results=[])
 
 
 class PlanningExcel(Excel):
     """Generate an Excel file with a planning proposal."""
 
-    def __init__(self, questioning: Questioning, *, options: dict | None = None):
+    def __init__(
+        self,
+        questioning: Questioning,
+        *,
+        options: dict | None = None,
+        on_progress: Callable[[str], None] | None = None,
+    ):
         self.questioning = questioning
         self.options = PlanningExcelOptions(**options or {})
+        self.on_progress = on_progress
         self._process_data()
 
+    def _progress(self, state: str) -> None:
+        if self.on_progress is not None:
+            self.on_progress(state)
+
     def _process_data(self):
         questioning = self.questioning
-        project_places_with_availability = questioning.project.project_places.filter(
-            availability_set__period=questioning.period, availability_set__min__gt=0
+        self._progress("loading")
+        # the tops are indexed once, and the index is shared by the planner and the tops sheet
+        self.responses = list(questioning.responses.order_by("id"))
+        inputs = load_planning_inputs(questioning, responses=self.responses)
+        self.tops_index = inputs.tops_index
+        self.random_seed = inputs.seed
+
+        self._progress("solving")
+        result = solve_planning(inputs, self.options)
+        self.seed, self.sweep_results = result.seed, result.sweep_results
+        planning = list(result.planning)
+
+        # massage the data, with real project place names and student names, loaded once for the whole planning
+        students = questioning.get_target_group().select_related("user").in_bulk({s for s, _, _, _ in planning})
+        project_places = questioning.project.project_places.select_related("place").in_bulk(
+            {p for _, p, _, _ in planning}
         )
-        target_places = project_places_with_availability.exclude(id__in=self.options.places_to_skip or [])
-        target_student_ids = set(questioning.get_target_group().values_list("id", flat=True))
-
-        # check if there are places of students to skip, based on options
-        # places were already filtered on `target_places`
-        if self.options.students_to_skip is not None:
-            for student_id in self.options.students_to_skip:
-                if student_id not in target_student_ids:
-                    raise ValueError(f"Student with id {student_id} not found in tops")
-                target_student_ids.remove(student_id)
-
-        # work the data
-        availabilities = {
-            a.project_place_id: a.max  # type: ignore
-            for a in ProjectPlaceAvailability.objects.filter(period=questioning.period)
-        }
-        student_tops = [
-            (response.object_id, response.data["tops"])
-            for response in questioning.responses.all()
-            if response.data["tops"] is not None and response.object_id in target_student_ids
-        ]
-        project_place_availability = {
-            project_place.id: availabilities[project_place.id] for project_place in project_places_with_availability
-        }
-        student_tops_dict = {student_id: tops for student_id, tops in student_tops}
-
-        # check if there are preassigned pairs, based on options
-        preassigned_pairs = []
-        preassigned_students = set()
-
-        if self.options.students_with_first_choice is not None:
-            for student_id in self.options.students_with_first_choice:
-                student_id = int(student_id)
-                if student_id not in student_tops_dict:
-                    raise ValueError(f"Student with id {student_id} not found in tops")
-                preassigned_pairs.append((student_id, student_tops_dict[student_id][0]))
-                preassigned_students.add(student_id)
-
-        if self.options.places_with_students is not None:
-            top_students_for_places = find_students_for_places(student_tops, self.options.places_with_students)
-            for place_id, student_ids in top_students_for_places.items():
-                for student_id in student_ids:
-                    if student_id in preassigned_students:
-                        continue
-                    preassigned_pairs.append((student_id, place_id))
-                    preassigned_students.add(student_id)
-                    break
-
-        planning = hungarian_optimizer(
-            student_tops, project_place_availability, preassigned_pairs, self.questioning.random_seed
-        )
-
-        # massage the data, with real project place names and student names
-        for idx, (student_id, project_place_id, rank, preassigned) in enumerate(planning):
-            planning[idx] = (
-                questioning.get_target_group().get(id=student_id),
-                questioning.project.project_places.get(id=project_place_id),
-                rank,
-                preassigned,
-            )
+        planning = [(students[s], project_places[p], rank, preassigned) for s, p, rank, preassigned in planning]
 
         # sort the planning by student name
         self.planning = sorted(planning, key=lambda x: x[0].reverse_name)
 
-        # make a list of all places, with the assigned students
-        places_with_students = {}
-        for student, place, _, _ in planning:
-            places_with_students.setdefault(place, []).append(student)
+        # count the assigned students per place
+        num_students = Counter(project_place.id for _, project_place, _, _ in planning)
 
         # make a full list of places
-        self.list_of_places = []
-        for target_place in target_places:
-            self.list_of_places.append(
-                (target_place, len(places_with_students.get(target_place, [])), availabilities[target_place.id])
-            )
+        target_places = (
+            questioning.project.project_places.filter(id__in=inputs.project_place_availability)
+            .exclude(id__in=self.options.places_to_skip or [])
+            .select_related("place")
+        )
+        self.list_of_places = [
+            (target_place, num_students[target_place.id], inputs.project_place_availability[target_place.id])
+            for target_place in target_places
+        ]
 
         # sort the full list of places by name
         self.list_of_places = sorted(self.list_of_places, key=lambda x: x[0].place.name)
@@ -130,7 +335,7 @@ class PlanningExcel(Excel):
                 self.questioning.project.name,
                 self.questioning.period.full_name if self.questioning.period else "",
                 "planning",
-                str(self.questioning.random_seed or ""),
+                str(self.seed or ""),
             ]
         )
         return slugify(filename)
@@ -139,13 +344,18 @@ class PlanningExcel(Excel):
         """Generate an Excel file with all the responses of a questioning, based on type."""
         from ..questionings.student_tops import get_student_tops_sheets
 
-        return [
+        sheets = [
             self.get_planning_sheet(),
             self.get_place_distribution_sheet(),
-            get_student_tops_sheets(self.questioning)[0],
+            get_student_tops_sheets(self.questioning, form_responses=self.responses, tops_index=self.tops_index)[0],
             self.get_configuration_sheet(),
         ]
 
+        if self.sweep_results:
+            sheets.insert(2, self.get_sweep_sheet())
+
+        return sheets
+
     def get_configuration_sheet(self) -> ExcelSheet:
         """Generate an Excel sheet with the configuration of the questioning."""
         df = pd.DataFrame(
@@ -154,11 +364,17 @@ class PlanningExcel(Excel):
                 ["period", self.questioning.period.full_name if self.questioning.period else ""],
                 ["questioning", self.questioning.title],
                 ["type", self.questioning.type],
-                ["random_seed", str(self.questioning.random_seed)],
+                ["random_seed", str(self.random_seed)],
+                ["seed", str(self.seed)],
                 ["s_first", ",".join([str(id) for id in self.options.students_with_first_choice or ["-"]])],
                 ["s_skip", ",".join([str(id) for id in self.options.students_to_skip or ["-"]])],
                 ["p_force", ",".join([str(id) for id in self.options.places_with_students or ["-"]])],
                 ["p_skip", ",".join([str(id) for id in self.options.places_to_skip or ["-"]])],
+                ["solver", self.options.solver],
+                ["sweep", str(self.options.sweep or "-")],
+                ["sweep_objective", self.options.sweep_objective if self.options.sweep else "-"],
+                ["distance_weight", str(self.options.distance_weight)],
+                ["max_distance", str(self.options.max_distance or "-")],
             ],
             columns=["key", "value"],
         )
@@ -191,3 +407,27 @@ class PlanningExcel(Excel):
         df = df.set_index(["place_id"])
 
         return ExcelSheet(name="Places", df=df)
+
+    def get_sweep_sheet(self) -> ExcelSheet:
+        """Generate an Excel sheet with the outcome of each seed of the sweep."""
+        ranks = sorted({rank for result in self.sweep_results for rank in result.histogram})
+        columns = ["seed", "best", "sum_of_ranks", "first_choices", "worst_rank"] + [f"top_{rank}" for rank in ranks]
+        rows = []
+
+        for result in self.sweep_results:
+            histogram = result.histogram
+            rows.append(
+                [
+                    result.seed,
+                    result.seed == self.seed,
+                    result.sum_of_ranks,
+                    result.first_choices,
+                    result.worst_rank,
+                    *[histogram.get(rank, 0) for rank in ranks],
+                ]
+            )
+
+        df = pd.DataFrame(rows, columns=columns)
+        df = df.set_index(["seed"])
+
+        return ExcelSheet(name="Sweep", df=df)
@@ -0,0 +1,232 @@
+from collections import Counter
+from collections.abc import Callable
+from datetime import datetime
+from hashlib import sha1
+
+import pandas as pd
+from django.db.models import Count, Max, Min
+from django.utils.text import slugify
+
+from metis.models import Discipline, Internship, Project, ProjectPlace, ProjectPlaceAvailability, Questioning, Track
+from metis.models.rel.forms import FormResponse
+from metis.services.planner.track import TrackConstraint, track_optimizer
+
+from ..excel import Excel, ExcelSheet
+
+
+def get_track_planning_inputs_fingerprint(project: Project, track: Track) -> str:
+    """Get a fingerprint of the inputs of the planning of a track, that changes whenever an input changes.
+
+    The inputs are the responses of the student tops questionings of the periods of the track, the availability of
+    these periods, the students of the track and their internships, and the constraints of the track. As in
+    `get_planning_inputs_fingerprint`, the rows of each table are summarised by their count and latest `updated_at`.
+    """
+    periods = project.periods.filter(program_internship__tracks__track=track)
+    responses = FormResponse.objects.filter(
+        questioning__project=project, questioning__period__in=periods, questioning__type=Questioning.STUDENT_TOPS
+    ).aggregate(count=Count("id"), updated_at=Max("updated_at"), seed=Min("created_at"))
+    availability = ProjectPlaceAvailability.objects.filter(period__in=periods).aggregate(
+        count=Count("id"), updated_at=Max("updated_at")
+    )
+    students = project.students.filter(track=track).aggregate(count=Count("id"), updated_at=Max("updated_at"))
+    internships = Internship.objects.filter(student__project=project, track=track).aggregate(
+        count=Count("id"), updated_at=Max("updated_at")
+    )
+    inputs = [
+        project.id,
+        track.id,
+        *responses.values(),
+        *availability.values(),
+        *students.values(),
+        *internships.values(),
+        *track.get_compiled_constraints(),
+    ]
+
+    return sha1(":".join(str(value) for value in inputs).encode()).hexdigest()[:12]
+
+
+class TrackPlanningExcel(Excel):
+    """Generate an Excel file with a planning proposal for all the periods of a track, in one solve.
+
+    The tops of each period come from the (first) student tops questioning of the period, for the students of the
+    track. The planning honours the discipline constraints of the track, including the disciplines the students
+    already covered in other periods. A project place without disciplines can cover any discipline.
+    """
+
+    def __init__(self, project: Project, track: Track, *, on_progress: Callable[[str], None] | None = None):
+        self.project = project
+        self.track = track
+        self.on_progress = on_progress
+        self._process_data()
+
+    def _progress(self, state: str) -> None:
+        if self.on_progress is not None:
+            self.on_progress(state)
+
+    def _process_data(self):
+        project, track = self.project, self.track
+        self._progress("loading")
+        self.periods = list(
+            project.periods.filter(program_internship__tracks__track=track)
+            .select_related("program_internship__block")
+            .order_by("start_date")
+        )
+        period_ids = [period.id for period in self.periods]
+        student_ids = set(project.students.filter(track=track, is_active=True).values_list("id", flat=True))
+
+        # tops of the students of the track, per period
+        period_tops = {}
+        questionings = Questioning.objects.filter(
+            project=project, period_id__in=period_ids, type=Questioning.STUDENT_TOPS
+        ).order_by("id")
+        for questioning in questionings:
+            if questioning.period_id in period_tops:
+                continue
+            period_tops[questioning.period_id] = [
+                (response.object_id, response.data["tops"])
+                for response in questioning.responses.order_by("id")
+                if response.data["tops"] is not None and response.object_id in student_ids
+            ]
+
+        period_availability = {}
+        for availability in ProjectPlaceAvailability.objects.filter(period_id__in=period_ids, max__gt=0):
+            period_availability.setdefault(availability.period_id, {})[availability.project_place_id] = availability.max
+
+        # a project place without disciplines can cover any discipline of the education
+        education_disciplines = list(
+            Discipline.objects.filter(education_id=project.education_id).values_list("id", flat=True)
+        )
+        place_disciplines = {}
+        for project_place in project.place_set.prefetch_related("disciplines"):
+            disciplines = [discipline.id for discipline in project_place.disciplines.all()]
+            place_disciplines[project_place.id] = disciplines or education_disciplines
+
+        # the disciplines of a period are those of its program internship, or else those of the track
+        track_disciplines = list(track.get_available_disciplines().values_list("id", flat=True))
+        period_disciplines = {}
+        for period in self.periods:
+            disciplines = list(period.program_internship.get_available_disciplines().values_list("id", flat=True))
+            if disciplines or track_disciplines:
+                period_disciplines[period.id] = disciplines or track_disciplines
+
+        compiled = track.get_compiled_constraints()
+        constraints = [
+            TrackConstraint(
+                disciplines=frozenset(compiled.get_discipline_ids(index)),
+                min_count=compiled.min_counts[index],
+                max_count=compiled.max_counts[index],
+                max_repeat=compiled.max_repeats[index],
+            )
+            for index in range(len(compiled.masks))
+        ]
+
+        # disciplines covered by the students in the other periods of the track
+        covered_disciplines = {}
+        filled_positions = Counter()
+        other_internships = (
+            Internship.objects.filter(student_id__in=student_ids, track=track)
+            .exclude(status__in=[Internship.CANCELLED, Internship.UNSUCCESSFUL])
+            .exclude(period_id__in=period_tops.keys())
+        )
+        for student_id, discipline_id in other_internships.values_list("student_id", "discipline_id"):
+            filled_positions[student_id] += 1
+            if discipline_id is not None:
+                covered_disciplines.setdefault(student_id, Counter())[discipline_id] += 1
+
+        # the positions of the track that are neither planned now nor filled yet, e.g. in periods without tops
+        num_positions = track.program_internships.count()
+        planned_positions = Counter(
+            student_id for student_tops in period_tops.values() for student_id, _ in student_tops
+        )
+        remaining_positions = {
+            student_id: max(0, num_positions - planned_positions[student_id] - filled_positions[student_id])
+            for student_id in student_ids
+        }
+
+        self.seed = min(
+            (seed for seed in (questioning.random_seed for questioning in questionings) if seed is not None),
+            default=None,
+        )
+        self._progress("solving")
+        planning = track_optimizer(
+            period_tops,
+            period_availability,
+            place_disciplines,
+            constraints,
+            period_disciplines=period_disciplines,
+            covered_disciplines=covered_disciplines,
+            remaining_positions=remaining_positions,
+            seed=self.seed,
+        )
+
+        # massage the data, with real names
+        periods = {period.id: period for period in self.periods}
+        students = project.students.select_related("user").in_bulk({student_id for _, student_id, *_ in planning})
+        project_places = ProjectPlace.objects.select_related("place").in_bulk({p for _, _, p, _, _ in planning})
+        disciplines = Discipline.objects.in_bulk({d for _, _, _, d, _ in planning if d is not None})
+
+        self.planning = sorted(
+            [
+                (students[s], periods[period_id], project_places[p], disciplines.get(d), rank)
+                for period_id, s, p, d, rank in planning
+            ],
+            key=lambda x: (x[0].reverse_name, x[1].start_date),
+        )
+        self.num_students = {period_id: len(student_tops) for period_id, student_tops in period_tops.items()}
+        self.created_at = datetime.now()
+
+    def get_filename(self) -> str:
+        """Get the filename of the Excel file, without extension."""
+        filename = "_".join(
+            ["metis", self.project.education.code, self.project.name, self.track.name, "planning", str(self.seed or "")]
+        )
+        return slugify(filename)
+
+    def get_sheets(self) -> list[ExcelSheet]:
+        """Get the sheets of the Excel file."""
+        return [self.get_planning_sheet(), self.get_periods_sheet(), self.get_configuration_sheet()]
+
+    def get_planning_sheet(self) -> ExcelSheet:
+        """Generate an Excel sheet with the planning proposal."""
+        columns = ["student_id", "student", "period", "place", "discipline", "top"]
+        rows = []
+
+        for student, period, project_place, discipline, top in self.planning:
+            rows.append(
+                [student.id, student.reverse_name, period.full_name, project_place.name, str(discipline or "-"), top]
+            )
+
+        df = pd.DataFrame(rows, columns=columns)
+        df = df.set_index(["student_id"])
+
+        return ExcelSheet(name="Planning", df=df)
+
+    def get_periods_sheet(self) -> ExcelSheet:
+        """Generate an Excel sheet with the number of planned students per period."""
+        columns = ["period_id", "period", "tops", "students"]
+        planned = Counter(period.id for _, period, _, _, _ in self.planning)
+        rows = [
+            [period.id, period.full_name, self.num_students.get(period.id, 0), planned[period.id]]
+            for period in self.periods
+        ]
+
+        df = pd.DataFrame(rows, columns=columns)
+        df = df.set_index(["period_id"])
+
+        return ExcelSheet(name="Periods", df=df)
+
+    def get_configuration_sheet(self) -> ExcelSheet:
+        """Generate an Excel sheet with the configuration of the planning."""
+        df = pd.DataFrame(
+            [
+                ["created_at", str(self.created_at)],
+                ["project", self.project.name],
+                ["track", self.track.name],
+                ["periods", ",".join(str(period.id) for period in self.periods) or "-"],
+                ["seed", str(self.seed)],
+            ],
+            columns=["key", "value"],
+        )
+        df = df.set_index(["key"])
+
+        return ExcelSheet(name="Configuration", df=df)
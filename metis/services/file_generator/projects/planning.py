@@ -2,6 +2,7 @@ import pandas as pd
 from django.utils.text import slugify
 
 from metis.models import Period, Project
+from metis.services.evaluator import evaluate_internships
 
 from ..excel import Excel, ExcelSheet
 
@@ -27,15 +28,24 @@ class ProjectPlanningExcel(Excel):
     def get_sheets(self) -> list[ExcelSheet]:
         """Generate an Excel file with all periods of a project."""
         sheets = []
+        scores = evaluate_internships(self.project.internships.all())
 
         for period in self.project.periods.all():
-            sheets += get_period_sheet(period)
+            sheets += get_period_sheet(period, scores=scores)
 
         return sheets
 
 
-def get_period_sheet(period: "Period") -> list["ExcelSheet"]:
-    """Generate an Excel sheet with all the internships of a period."""
+def get_period_sheet(
+    period: "Period",
+    *,
+    scores: dict[int, float | None] | None = None,
+) -> list["ExcelSheet"]:
+    """Generate an Excel sheet with all the internships of a period.
+
+    :param period: The period.
+    :param scores: The final scores of the internships (see `evaluate_internships`), if already known.
+    """
     columns = [
         "student_number",
         "student_name",
@@ -57,13 +67,14 @@ def get_period_sheet(period: "Period") -> list["ExcelSheet"]:
     rows = []
 
     internships = (
-        period.internships.prefetch_related(
-            "discipline", "track", "place__contacts", "mentors", "student__user", "timesheets"
-        )
+        period.internships.prefetch_related("discipline", "track", "place__contacts", "mentors", "student__user")
         .order_by("student__user__last_name", "student__user__first_name")
         .all()
     )
 
+    if scores is None:
+        scores = evaluate_internships(internships)
+
     for internship in internships:
         admin = internship.place.contacts.filter(is_admin=True).first() if internship.place else None
         mentors = internship.mentors.all()
@@ -82,7 +93,7 @@ def get_period_sheet(period: "Period") -> list["ExcelSheet"]:
             "end_date": internship.end_date,
             "place_name": internship.place.name if internship.place else "-",
             "total_hours": formatted_hours,
-            "final_score": internship.final_score or "-",
+            "final_score": scores.get(internship.id) or "-",
             "place_admin": admin.user.name if admin else "",
             "admin_email": admin.user.email if admin else "",
             "mentors": ", ".join([mentor.user.name for mentor in mentors]),
@@ -1,37 +1,70 @@
+from collections.abc import Iterable
 from typing import TYPE_CHECKING
 
 import pandas as pd
+from django.contrib.contenttypes.models import ContentType
 
-from .base import ExcelSheet
+from metis.services.planner.utils import TopsIndex, get_tops_index
+
+from ..excel import ExcelSheet
 
 
 if TYPE_CHECKING:
+    from metis.models.rel.forms import FormResponse
     from metis.models.stages import Questioning
 
 
-def get_student_tops_sheets(questioning: "Questioning") -> list["ExcelSheet"]:
-    """Generate an Excel file with responses from student tops questionings."""
+def get_student_tops_sheets(
+    questioning: "Questioning",
+    *,
+    form_responses: Iterable["FormResponse"] | None = None,
+    tops_index: TopsIndex | None = None,
+) -> list["ExcelSheet"]:
+    """Generate an Excel file with responses from student tops questionings.
+
+    :param questioning: The questioning.
+    :param form_responses: The tops responses of the students, if they were already loaded.
+        By default, the (first) response of each student to a tops questioning of the period is used.
+    :param tops_index: An inverted index of the tops in `form_responses` (see `get_tops_index`), if it was
+        already built.
+    """
+    from metis.models import Student
+    from metis.models.rel.forms import FormResponse
+
     period = questioning.period
-    project_places = period.project_places.order_by("place__name")
-    students = period.students.order_by("user__last_name", "user__first_name")
-    updated_at = {}
-    tops = {}
-
-    for student in students:
-        form_response = student.form_responses.filter(
-            questioning__type="student_tops", questioning__period_id=period.id
-        ).first()
-        student_tops = form_response.data["tops"] if form_response else []
-        updated_at[student.id] = str(form_response.updated_at) if form_response else None
-        tops[student.id] = {}
-
-        for index, project_place_id in enumerate(student_tops):
-            tops[student.id][project_place_id] = index + 1
+    project_places = period.project_places.select_related("place").order_by("place__name")
+    students = period.students.select_related("user").order_by("user__last_name", "user__first_name")
+
+    if form_responses is None:
+        form_responses = FormResponse.objects.filter(
+            content_type=ContentType.objects.get_for_model(Student),
+            questioning__type="student_tops",
+            questioning__period_id=period.id,
+        ).order_by("id")
+
+    responses = {}
+    for form_response in form_responses:
+        responses.setdefault(form_response.object_id, form_response)
+
+    if tops_index is None:
+        tops_index = get_tops_index([(student_id, r.data["tops"]) for student_id, r in responses.items()])
+
+    # fill the ranks per student from the index, one pass over all the tops
+    tops = {student_id: {} for student_id in responses}
+    for project_place_id, choices in tops_index.items():
+        for rank, student_id in choices:
+            if student_id in tops:
+                tops[student_id][project_place_id] = rank + 1
+
+    updated_at = {student_id: str(r.updated_at) for student_id, r in responses.items()}
 
     df = pd.DataFrame(
-        [[tops[student.id].get(project_place.id, "-") for project_place in project_places] for student in students],
+        [
+            [tops.get(student.id, {}).get(project_place.id, "-") for project_place in project_places]
+            for student in students
+        ],
         columns=[project_place.place.name for project_place in project_places],
-        index=pd.MultiIndex.from_tuples([(updated_at[student.id], student.reverse_name) for student in students]),
+        index=pd.MultiIndex.from_tuples([(updated_at.get(student.id), student.reverse_name) for student in students]),
     )
 
     return [ExcelSheet(name="Tops", df=df)]
@@ -48,4 +48,9 @@ def check_file_access(file: "models.File", user: "models.User") -> bool:
 
         return any(visible)
 
+    if isinstance(file.content_object, models.Questioning):
+        # the files of a questioning (e.g. planning proposals) are only for the office members
+        questioning: models.Questioning = file.content_object
+        return questioning.project.can_be_managed_by(user)
+
     raise NotImplementedError("No access control implemented yet for this object type.")
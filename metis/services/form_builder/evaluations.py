@@ -1,4 +1,9 @@
+import hashlib
+import json
+from collections import OrderedDict
 from enum import Enum
+from threading import Lock
+from typing import NamedTuple
 
 from pydantic import BaseModel, ConfigDict, ValidationError, field_validator
 from pydantic.types import conlist
@@ -117,6 +122,82 @@ def validate_evaluation_form_definition(definition: dict) -> EvaluationForm:
         raise ValueError(exc) from exc
 
 
+class CompiledEvaluationForm(NamedTuple):
+    """An evaluation form definition, validated once and compiled for the evaluation of responses.
+
+    - form: the validated form
+    - definition: the form definition with default values filled in (shared, see `EvaluationForm.definition` for a copy)
+    - points: the points of each score, as value: points
+    - max_points: the highest points of the scores (None if no score has points)
+    - sections: the code of each section
+    - items: the items of all the sections as (section_code, item_value), in the order of the form
+    - item_sections: the index of the section of each item
+    """
+
+    form: EvaluationForm
+    definition: dict
+    points: dict[str | None, int | float | None]
+    max_points: int | float | None
+    sections: tuple[str, ...]
+    items: tuple[tuple[str, str], ...]
+    item_sections: tuple[int, ...]
+
+    @property
+    def intermediate_evaluations(self) -> int:
+        """The number of intermediate evaluations."""
+        return self.form.intermediate_evaluations
+
+    @property
+    def final_score_strategy(self) -> FinalScoreStrategy:
+        """The final score strategy."""
+        return self.form.final_score_strategy
+
+
+# the number of compiled form definitions that are kept by each process
+COMPILED_EVALUATION_FORMS_SIZE = 256
+
+_compiled_evaluation_forms: OrderedDict[str, CompiledEvaluationForm] = OrderedDict()
+_compiled_evaluation_forms_lock = Lock()
+
+
+def compile_evaluation_form(definition: dict) -> CompiledEvaluationForm:
+    """Validate and compile an evaluation form definition.
+
+    The compiled forms are kept in a bounded LRU cache of the process, by a hash of the definition, so that identical
+    definitions are only validated once.
+
+    :param definition: The evaluation form definition.
+    :returns: The compiled form.
+    :raises ValueError: If the definition is invalid.
+    """
+    key = hashlib.sha1(json.dumps(definition, sort_keys=True).encode(), usedforsecurity=False).hexdigest()
+
+    with _compiled_evaluation_forms_lock:
+        if (compiled := _compiled_evaluation_forms.get(key)) is not None:
+            _compiled_evaluation_forms.move_to_end(key)
+            return compiled
+
+    form = validate_evaluation_form_definition(definition)
+    points = {score.value: score.points for score in form.scores}
+    items = [(index, section.code, item.value) for index, section in enumerate(form.sections) for item in section.items]
+    compiled = CompiledEvaluationForm(
+        form=form,
+        definition=form.model_dump(),
+        points=points,
+        max_points=max((p for p in points.values() if p), default=None),
+        sections=tuple(section.code for section in form.sections),
+        items=tuple((section_code, item_value) for _, section_code, item_value in items),
+        item_sections=tuple(index for index, _, _ in items),
+    )
+
+    with _compiled_evaluation_forms_lock:
+        _compiled_evaluation_forms[key] = compiled
+        while len(_compiled_evaluation_forms) > COMPILED_EVALUATION_FORMS_SIZE:
+            _compiled_evaluation_forms.popitem(last=False)
+
+    return compiled
+
+
 def validate_evaluation_form_response(form_definition: dict, data: dict) -> dict:
     """Validate evaluation data against an evaluation form definition.
 
@@ -135,7 +216,7 @@ def validate_evaluation_form_response(form_definition: dict, data: dict) -> dict
         },
     }
     """
-    form = validate_evaluation_form_definition(form_definition)
+    form = compile_evaluation_form(form_definition).form
     valid_section_scores = form.get_valid_scores(section_only=True)
     valid_scores = form.get_valid_scores()
 
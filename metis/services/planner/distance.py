@@ -0,0 +1,90 @@
+from typing import NamedTuple
+
+import numpy as np
+
+
+EARTH_RADIUS = 6371.0088  # mean radius, in km
+
+Coordinates = dict[int, tuple[float, float]]
+
+
+class DistanceTerm(NamedTuple):
+    """A travel distance term for the planning cost.
+
+    - student_coordinates: the (latitude, longitude) of the students, as student_id: coordinates
+    - place_coordinates: the (latitude, longitude) of the project places, as project_place_id: coordinates
+    - weight: the cost of one km, in the same units as the rank penalty exp(rank - 1)
+    - max_distance: the max distance (in km) between a student and a project place, for all students or per
+      student_id (students without a max distance are not limited)
+
+    Students or project places without coordinates add no distance cost and are never pruned.
+    """
+
+    student_coordinates: Coordinates
+    place_coordinates: Coordinates
+    weight: float = 0.0
+    max_distance: float | dict[int, float] | None = None
+
+
+def haversine(
+    latitude1: np.ndarray, longitude1: np.ndarray, latitude2: np.ndarray, longitude2: np.ndarray
+) -> np.ndarray:
+    """Great-circle distance (in km) between coordinates in degrees, element-wise (with numpy broadcasting).
+
+    Pass column and row vectors, e.g. `haversine(lat1[:, None], lon1[:, None], lat2, lon2)`, for a distance matrix.
+    """
+    latitude1, longitude1, latitude2, longitude2 = map(np.radians, (latitude1, longitude1, latitude2, longitude2))
+    a = (
+        np.sin((latitude2 - latitude1) / 2) ** 2
+        + np.cos(latitude1) * np.cos(latitude2) * np.sin((longitude2 - longitude1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(a))
+
+
+def _lookup(values: dict, ids: np.ndarray, default) -> np.ndarray:
+    """Look up the value of each id, once per unique id, with a default for unknown ids."""
+    unique_ids, inverse = np.unique(ids, return_inverse=True)
+    lookup = np.array([values.get(int(i), default) for i in unique_ids], dtype=float)
+    return lookup[inverse] if len(unique_ids) else np.zeros((0, *np.shape(default)))
+
+
+def get_edge_distances(distance: DistanceTerm, student_ids: np.ndarray, project_place_ids: np.ndarray) -> np.ndarray:
+    """Compute the distance (in km) of each (student, project place) edge, with NaN for unknown coordinates.
+
+    Only the ranked edges are computed, as one vectorized haversine over the edge arrays.
+
+    :param distance: The distance term.
+    :param student_ids: The student_id of each edge.
+    :param project_place_ids: The project_place_id of each edge.
+    :returns: The distance of each edge.
+    """
+    students = _lookup(distance.student_coordinates, student_ids, (np.nan, np.nan))
+    places = _lookup(distance.place_coordinates, project_place_ids, (np.nan, np.nan))
+    return haversine(students[:, 0], students[:, 1], places[:, 0], places[:, 1])
+
+
+def apply_distance_term(
+    distance: DistanceTerm, student_ids: np.ndarray, project_place_ids: np.ndarray, costs: np.ndarray
+) -> tuple[np.ndarray, np.ndarray]:
+    """Add the distance cost to the rank costs of the edges, and prune the edges beyond the max distance.
+
+    :param distance: The distance term.
+    :param student_ids: The student_id of each edge.
+    :param project_place_ids: The project_place_id of each edge.
+    :param costs: The rank cost of each edge.
+    :returns: A tuple with a boolean mask of the edges to keep, and the cost of each edge.
+    """
+    distances = get_edge_distances(distance, student_ids, project_place_ids)
+    known = ~np.isnan(distances)
+    costs = costs + distance.weight * np.where(known, distances, 0.0)
+
+    if isinstance(distance.max_distance, dict):
+        max_distances = _lookup(distance.max_distance, student_ids, np.inf)
+    elif distance.max_distance is not None:
+        max_distances = np.full(len(student_ids), float(distance.max_distance))
+    else:
+        max_distances = np.full(len(student_ids), np.inf)
+
+    keep = ~known | (distances <= max_distances)
+
+    return keep, costs
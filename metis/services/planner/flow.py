@@ -0,0 +1,191 @@
+from random import Random
+
+import numpy as np
+from scipy.optimize import linprog
+from scipy.sparse import csr_array, vstack
+
+from .distance import DistanceTerm, apply_distance_term
+
+
+def min_cost_flow_optimizer(
+    student_tops: list[tuple[int, list[int]]],
+    project_place_availability: dict[int, int],
+    preassigned_pairs: list[tuple[int, int]] | None = None,
+    seed: int | None = None,
+    *,
+    project_place_minimum: dict[int, int] | None = None,
+    distance: DistanceTerm | None = None,
+) -> list[tuple[int, int, int, bool]]:
+    """Min-cost-flow algorithm for optimizing the matching of students and project places.
+
+    The planning is modelled as a flow network (source -> students -> project places -> sink), where each project
+    place arc has its availability as capacity, instead of duplicating the project place once per seat.
+    The network is solved as a linear program with HiGHS, without integrality constraints (see `solve_flow`).
+
+    Every student can also flow to an "unmatched" arc, and every minimum can be left partially unfilled, both with a
+    cost higher than any rearrangement of the students, so the problem is always feasible: as many students as
+    possible are matched and as many minimums as possible are filled before the rank penalties are considered.
+
+    :param student_tops: A list of tuples (student_id, top_choices) where top_choices is a list of project_place_ids
+    :param project_place_availability: A dictionary of project_place_id: availability pairs, where availability is the
+        max number of students that can be matched to the project place.
+    :param preassigned_pairs: A list of tuples (student_id, project_place_id) that must be included in the result.
+    :param seed: A seed for the randomizer.
+    :param project_place_minimum: A dictionary of project_place_id: minimum pairs, where minimum is the number of
+        students that should be matched to the project place (preassigned students included).
+    :param distance: A travel distance term, added to the rank penalty. Arcs beyond the max distance are pruned
+        before solving.
+    :returns: An optimized list of tuples (student_id, project_place_id, rank, preassigned) where rank is the rank
+        of the project place (top) in the student's top choices.
+    """
+    student_tops = list(student_tops)
+    capacity = {project_place_id: max(0, a) for project_place_id, a in project_place_availability.items()}
+    minimum = dict(project_place_minimum or {})
+
+    if seed:
+        randomizer = Random(seed)
+        randomizer.shuffle(student_tops)
+
+    # Create a list of students
+    student_ids = [student_id for student_id, choices in student_tops if choices is not None]
+
+    # If there are preassigned pairs, decrease the availability and minimum of the project place and remove the student
+    if preassigned_pairs is not None:
+        for student_id, project_place_id in preassigned_pairs:
+            student_ids.remove(student_id)
+            capacity[project_place_id] -= 1
+            minimum[project_place_id] = minimum.get(project_place_id, 0) - 1
+
+    # Map ids to network nodes
+    student_rows = {student_id: i for i, student_id in enumerate(student_ids)}
+    project_place_ids = [project_place_id for project_place_id, c in capacity.items() if c > 0]
+    place_index = {project_place_id: k for k, project_place_id in enumerate(project_place_ids)}
+
+    # Flatten the tops into (student, place, rank) arcs; a repeated choice keeps its last rank
+    edges = {}
+    for student_id, choices in student_tops:
+        if choices is None or student_id not in student_rows:
+            continue
+        i = student_rows[student_id]
+        for rank, project_place_id in enumerate(choices):
+            if project_place_id in place_index:
+                edges[(i, place_index[project_place_id])] = rank
+
+    pairs = []
+
+    if edges:
+        edge_rows = np.fromiter((i for i, _ in edges), dtype=np.intp, count=len(edges))
+        edge_places = np.fromiter((k for _, k in edges), dtype=np.intp, count=len(edges))
+        edge_ranks = np.fromiter(edges.values(), dtype=np.intp, count=len(edges))
+        edge_costs = np.exp(edge_ranks)  # add a penalty for the rank
+
+        if distance is not None:
+            keep, edge_costs = apply_distance_term(
+                distance,
+                np.array(student_ids, dtype=np.int64)[edge_rows],
+                np.array(project_place_ids, dtype=np.int64)[edge_places],
+                edge_costs,
+            )
+            edge_rows, edge_places, edge_ranks, edge_costs = (
+                a[keep] for a in (edge_rows, edge_places, edge_ranks, edge_costs)
+            )
+
+        flow = solve_flow(
+            edge_rows,
+            edge_places,
+            edge_ranks,
+            num_students=len(student_ids),
+            capacity=np.array([capacity[p] for p in project_place_ids]),
+            minimum=np.array([min(max(0, minimum.get(p, 0)), capacity[p]) for p in project_place_ids]),
+            costs=edge_costs,
+        )
+        pairs = [
+            (int(student_ids[i]), int(project_place_ids[k]), int(rank) + 1, False)
+            for i, k, rank in zip(edge_rows[flow], edge_places[flow], edge_ranks[flow], strict=True)
+        ]
+
+    # Add the preassigned pairs to the list of pairs
+    if preassigned_pairs is not None:
+        student_tops_dict = {}
+        for student_id, choices in student_tops:
+            if choices is None:
+                continue
+            for rank, project_place_id in enumerate(choices):
+                student_tops_dict[(student_id, project_place_id)] = int(rank + 1)
+
+        for i, j in preassigned_pairs:
+            pairs.append((i, j, student_tops_dict[(i, j)], True))
+
+    return pairs
+
+
+def solve_flow(
+    edge_rows: np.ndarray,
+    edge_places: np.ndarray,
+    edge_ranks: np.ndarray,
+    *,
+    num_students: int,
+    capacity: np.ndarray,
+    minimum: np.ndarray,
+    costs: np.ndarray | None = None,
+) -> np.ndarray:
+    """Solve a flow network of students and project places as a linear program.
+
+    The students are the rows `0..num_students`, and the places the indexes of `capacity` and `minimum`.
+    Variables are the (student, place) arcs, followed by one "unmatched" arc per student, and two arcs from each place
+    to the sink: one for the seats up to its minimum (with a reward for filling them), and one for the other seats.
+    The constraints are the flow conservation of each student and place node, and the bounds are the arc capacities.
+    The cost of an arc is the rank penalty, unless other `costs` are given.
+
+    The constraint matrix is the incidence matrix of a network, which is totally unimodular, so every vertex of the
+    linear program is integral: the simplex method gives an integral flow without integrality constraints.
+
+    :returns: A boolean mask of the (student, place) arcs that carry flow.
+    """
+    num_edges = len(edge_rows)
+    num_places = len(capacity)
+    students = np.arange(num_students)
+    places = np.arange(num_places)
+
+    if costs is None:
+        costs = np.exp(edge_ranks)  # add a penalty for the rank
+    dummy_cost = (num_students + 1) * (costs.max() if len(costs) else 1.0)
+    c = np.concatenate(
+        (costs, np.full(num_students, dummy_cost), np.full(num_places, -dummy_cost), np.zeros(num_places))
+    )
+
+    # each student sends exactly one unit: sum(arcs) + unmatched == 1
+    student_flow = csr_array(
+        (
+            np.ones(num_edges + num_students),
+            (np.concatenate((edge_rows, students)), np.arange(num_edges + num_students)),
+        ),
+        shape=(num_students, len(c)),
+    )
+    # each place sends what it receives to the sink: sum(arcs) - minimum seats - other seats == 0
+    sink_arcs = num_edges + num_students + np.arange(2 * num_places)
+    place_flow = csr_array(
+        (
+            np.concatenate((np.ones(num_edges), -np.ones(2 * num_places))),
+            (np.concatenate((edge_places, places, places)), np.concatenate((np.arange(num_edges), sink_arcs))),
+        ),
+        shape=(num_places, len(c)),
+    )
+
+    result = linprog(
+        c,
+        A_eq=vstack((student_flow, place_flow)),
+        b_eq=np.concatenate((np.ones(num_students), np.zeros(num_places))),
+        bounds=np.column_stack(
+            (
+                np.zeros(len(c)),
+                np.concatenate((np.ones(num_edges + num_students), minimum, capacity - minimum)),
+            )
+        ),
+        method="highs-ds",  # the dual simplex ends on a vertex
+    )
+
+    if not result.success:  # pragma: no cover
+        raise ValueError(f"The planning could not be solved: {result.message}")
+
+    return result.x[:num_edges] > 0.5
@@ -2,6 +2,15 @@ from random import Random
 
 import numpy as np
 from scipy.optimize import linear_sum_assignment
+from scipy.sparse import csr_array
+from scipy.sparse.csgraph import min_weight_full_bipartite_matching
+
+from .distance import DistanceTerm, apply_distance_term
+from .utils import TopsIndex
+
+
+SOLVERS = ("auto", "dense", "sparse")
+SPARSE_SOLVER_THRESHOLD = 1_000_000  # students x seats
 
 
 def hungarian_optimizer(
@@ -9,6 +18,10 @@ def hungarian_optimizer(
     project_place_availability: dict[int, int],
     preassigned_pairs: list[tuple[int, int]] | None = None,
     seed: int | None = None,
+    *,
+    solver: str = "auto",
+    tops_index: TopsIndex | None = None,
+    distance: DistanceTerm | None = None,
 ) -> list[tuple[int, int, int, bool]]:
     """Hungarian algorithm for optimizing the matching of students and project places.
 
@@ -17,10 +30,21 @@ def hungarian_optimizer(
         max number of students that can be matched to the project place.
     :param preassigned_pairs: A list of tuples (student_id, project_place_id) that must be included in the result.
     :param seed: A seed for the randomizer.
+    :param solver: The solver to use: `dense` (full cost matrix), `sparse` (only the ranked edges) or `auto`, which
+        switches to `sparse` when the dense matrix would have more than `SPARSE_SOLVER_THRESHOLD` cells.
+        Students without any available top are left out of the result. With the sparse solver, the students that
+        cannot be matched to any of their tops are left out as well, where the dense solver fails.
+    :param tops_index: An inverted index of the tops (see `get_tops_index`), if it was already built, to fill the cost
+        matrix from. Only the students in `student_tops` are planned.
+    :param distance: A travel distance term, added to the rank penalty. Edges beyond the max distance are pruned
+        before solving, and students without any reachable top are left unplanned.
     :returns: An optimized list of tuples (student_id, project_place_id, rank, preassigned) where rank is the rank
         of the project place (top) in the student's top choices, or -1 if the student was preassigned
         to the project place.
     """
+    if solver not in SOLVERS:
+        raise ValueError(f"Invalid solver: {solver}")
+
     pairs = []
 
     if seed:
@@ -45,31 +69,69 @@ def hungarian_optimizer(
         for _ in range(availability)
     ]
 
-    # Create a cost matrix with a high default value
-    cost_matrix = np.full((len(student_ids), len(project_place_ids)), np.inf)
-    rank_matrix = np.full((len(student_ids), len(project_place_ids)), np.inf)
+    # Map ids to matrix rows and to the first column (and width) of each project place
+    student_rows = {student_id: i for i, student_id in enumerate(student_ids)}
+    place_index = {project_place_id: k for k, project_place_id in enumerate(project_place_availability)}
+    place_widths = np.array([max(0, a) for a in project_place_availability.values()], dtype=np.intp)
+    place_offsets = np.cumsum(place_widths) - place_widths
 
-    # Fill in the cost matrix and rank matrix based on the students' top choices
-    for student_id, choices in student_tops:
-        if choices is None:
-            continue
-        if student_id in student_ids:
+    # Flatten the tops into (row, place, rank) edges, sorted by row and place; a repeated choice keeps its last rank
+    edges = {}
+    if tops_index is not None:
+        for project_place_id, choices in tops_index.items():
+            if project_place_id not in place_index:
+                continue
+            for rank, student_id in choices:
+                if student_id in student_rows:
+                    edges[(student_rows[student_id], place_index[project_place_id])] = rank
+    else:
+        for student_id, choices in student_tops:
+            if choices is None or student_id not in student_rows:
+                continue
+            i = student_rows[student_id]
             for rank, project_place_id in enumerate(choices):
-                if project_place_id not in project_place_availability:
-                    continue
-                i = student_ids.index(student_id)
-                for j in range(project_place_availability[project_place_id]):
-                    k = project_place_ids.index(project_place_id) + j
-                    cost_matrix[i][k] = np.exp(rank)  # add a penalty for the rank
-                    rank_matrix[i][k] = rank
+                if project_place_id in place_index:
+                    edges[(i, place_index[project_place_id])] = rank
 
-    # Use the linear_sum_assignment function to find the optimal pairs
-    row_idx, col_idx = linear_sum_assignment(cost_matrix)
+    edge_rows = np.fromiter((i for i, _ in edges), dtype=np.intp, count=len(edges))
+    edge_places = np.fromiter((k for _, k in edges), dtype=np.intp, count=len(edges))
+    edge_ranks = np.fromiter(edges.values(), dtype=np.intp, count=len(edges))
+    order = np.lexsort((edge_places, edge_rows))
+    edge_rows, edge_places, edge_ranks = edge_rows[order], edge_places[order], edge_ranks[order]
+    edge_costs = np.exp(edge_ranks)  # add a penalty for the rank
+
+    if distance is not None:
+        keep, edge_costs = apply_distance_term(
+            distance,
+            np.array(student_ids, dtype=np.int64)[edge_rows],
+            np.array(list(place_index), dtype=np.int64)[edge_places],
+            edge_costs,
+        )
+        edge_rows, edge_places, edge_ranks, edge_costs = (
+            a[keep] for a in (edge_rows, edge_places, edge_ranks, edge_costs)
+        )
+
+    # Expand each edge over all the columns (seats) of its project place
+    widths = place_widths[edge_places]
+    rows = np.repeat(edge_rows, widths)
+    ranks = np.repeat(edge_ranks, widths)
+    costs = np.repeat(edge_costs, widths)
+    seats = np.arange(len(rows), dtype=np.intp) - np.repeat(np.cumsum(widths) - widths, widths)
+    cols = np.repeat(place_offsets[edge_places], widths) + seats
+
+    # Find the optimal pairs, with the full cost matrix or with a sparse graph for big problems
+    shape = (len(student_ids), len(project_place_ids))
+
+    if solver == "auto":
+        solver = "sparse" if shape[0] * shape[1] > SPARSE_SOLVER_THRESHOLD else "dense"
+
+    solve = _solve_sparse if solver == "sparse" else _solve_dense
+    row_idx, col_idx, pair_ranks = solve(rows, cols, ranks, shape, costs=costs)
 
     # Pair up the row and column indices into a list of tuples, and add the rank
     pairs = [
-        (int(student_ids[i]), int(project_place_ids[j]), int(rank_matrix[i][j]) + 1, bool(0))  # type hack
-        for i, j in zip(row_idx, col_idx, strict=True)
+        (int(student_ids[i]), int(project_place_ids[j]), int(rank) + 1, bool(0))  # type hack
+        for i, j, rank in zip(row_idx, col_idx, pair_ranks, strict=True)
     ]
 
     # Add the preassigned pairs to the list of pairs
@@ -85,3 +147,72 @@ def hungarian_optimizer(
             pairs.append((i, j, student_tops_dict[(i, j)], True))
 
     return pairs
+
+
+def _solve_dense(
+    rows: np.ndarray, cols: np.ndarray, ranks: np.ndarray, shape: tuple[int, int], *, costs: np.ndarray | None = None
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Solve the assignment on a full (students x seats) cost matrix, with infinite costs for unranked seats.
+
+    Students without any ranked seat (e.g. when all their tops are beyond the max distance) are left out of the
+    matrix, and of the result, since they would make the assignment infeasible.
+    The cost of an edge is the rank penalty, unless other `costs` are given.
+
+    :returns: The matched rows, columns and ranks.
+    """
+    # Only keep the rows (students) with at least one ranked seat
+    planned_rows = np.unique(rows)
+    rows = np.searchsorted(planned_rows, rows)
+    shape = (len(planned_rows), shape[1])
+
+    # Create a cost matrix with a high default value, and fill it based on the students' top choices
+    cost_matrix = np.full(shape, np.inf)
+    rank_matrix = np.full(shape, np.inf)
+    cost_matrix[rows, cols] = np.exp(ranks) if costs is None else costs  # add a penalty for the rank
+    rank_matrix[rows, cols] = ranks
+
+    # Use the linear_sum_assignment function to find the optimal pairs
+    row_idx, col_idx = linear_sum_assignment(cost_matrix)
+
+    return planned_rows[row_idx], col_idx, rank_matrix[row_idx, col_idx]
+
+
+def _solve_sparse(
+    rows: np.ndarray, cols: np.ndarray, ranks: np.ndarray, shape: tuple[int, int], *, costs: np.ndarray | None = None
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Solve the assignment on a sparse graph that only contains the ranked (student, seat) edges.
+
+    Every student gets an extra dummy seat, so a full matching always exists. The dummy cost is higher than any
+    rearrangement of real edges, so the number of matched students is maximized before the rank penalties.
+    The cost of an edge is the rank penalty, unless other `costs` are given.
+
+    :returns: The matched rows, columns and ranks (students matched to their dummy seat are left out).
+    """
+    num_students, num_seats = shape
+
+    if not num_students or not num_seats:
+        return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp), np.zeros(0)
+
+    if costs is None:
+        costs = np.exp(ranks)  # add a penalty for the rank
+    dummy_cost = (num_students + 1) * (costs.max() if len(costs) else 1.0)
+    students = np.arange(num_students, dtype=np.intp)
+
+    graph = csr_array(
+        (
+            np.concatenate((costs, np.full(num_students, dummy_cost))),
+            (np.concatenate((rows, students)), np.concatenate((cols, num_seats + students))),
+        ),
+        shape=(num_students, num_seats + num_students),
+    )
+    row_idx, col_idx = min_weight_full_bipartite_matching(graph)
+
+    matched = col_idx < num_seats
+    row_idx, col_idx = row_idx[matched], col_idx[matched]
+
+    # look up the rank of each matched edge
+    edge_keys = rows * num_seats + cols
+    order = np.argsort(edge_keys)
+    positions = order[np.searchsorted(edge_keys, row_idx * num_seats + col_idx, sorter=order)]
+
+    return row_idx, col_idx, ranks[positions]
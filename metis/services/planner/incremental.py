@@ -0,0 +1,167 @@
+from collections import Counter
+from typing import NamedTuple
+
+import numpy as np
+
+from .flow import solve_flow
+
+
+Planning = list[tuple[int, int, int, bool]]
+
+
+class PlanningDelta(NamedTuple):
+    """A small change to the data of a planning.
+
+    - student_tops: the new tops of some students (None if the student no longer takes part in the planning)
+    - seats: the change in availability of some project places (positive for added seats, negative for removed ones)
+    - pinned_pairs: (student_id, project_place_id) pairs that must be part of the new planning
+    """
+
+    student_tops: dict[int, list[int] | None] | None = None
+    seats: dict[int, int] | None = None
+    pinned_pairs: list[tuple[int, int]] | None = None
+
+
+def incremental_optimizer(
+    previous: Planning,
+    student_tops: list[tuple[int, list[int]]],
+    project_place_availability: dict[int, int],
+    delta: PlanningDelta,
+    *,
+    radius: int | None = 1,
+    churn_penalty: float = 1.0,
+) -> Planning:
+    """Re-optimize a previous planning after a small change, moving as few students as possible.
+
+    Only the students affected by the change are re-planned: students with new tops or pins, students in places
+    that lost seats, and (for places with new seats or freed seats) the students that chose those places.
+    From there, the re-planned group grows `radius` times with all the students that chose one of the places chosen
+    by the group, which are the students on the alternating paths that could improve the planning.
+    All the other students keep their place, and the group is solved with the remaining seats only.
+
+    :param previous: The previous planning, a list of tuples (student_id, project_place_id, rank, preassigned).
+    :param student_tops: The tops of the previous planning, as a list of tuples (student_id, top_choices).
+    :param project_place_availability: The availability of the previous planning, as project_place_id: availability.
+    :param delta: The changes since the previous planning.
+    :param radius: How many times the re-planned group grows. With None, the whole connected group is re-planned.
+        A smaller group is solved faster, but students in it can be left without a place when seats are removed.
+    :param churn_penalty: The penalty for placing a student somewhere else than in the previous planning (including
+        students that had no place), in the same units as the rank penalty exp(rank - 1).
+    :returns: The new planning, as a list of tuples (student_id, project_place_id, rank, preassigned).
+        Students that keep their place come first, in the order of the previous planning.
+    :raises ValueError: If more students are pinned to a project place than it has seats.
+    """
+    tops = {student_id: choices for student_id, choices in student_tops if choices is not None}
+    for student_id, choices in (delta.student_tops or {}).items():
+        if choices is None:
+            tops.pop(student_id, None)
+        else:
+            tops[student_id] = list(choices)
+
+    capacity = dict(project_place_availability)
+    for project_place_id, seats in (delta.seats or {}).items():
+        capacity[project_place_id] = max(0, capacity.get(project_place_id, 0) + seats)
+
+    # the new pins replace the previous ones of the same students
+    pinned = {student_id: place_id for student_id, place_id, _, preassigned in previous if preassigned}
+    pinned.update(delta.pinned_pairs or [])
+
+    for place_id, count in Counter(pinned.values()).items():
+        if count > capacity.get(place_id, 0):
+            raise ValueError(f"Project place with id {place_id} has no free seat for all its pinned students")
+
+    previous_places = {student_id: place_id for student_id, place_id, _, _ in previous}
+
+    students_by_place: dict[int, set[int]] = {}
+    for student_id, choices in tops.items():
+        for project_place_id in choices:
+            students_by_place.setdefault(project_place_id, set()).add(student_id)
+
+    # find the students and places that are directly affected by the change
+    affected_students = set(delta.student_tops or {}) | set(pinned)
+    affected_places = {place_id for place_id, seats in (delta.seats or {}).items() if seats > 0}
+    occupancy: dict[int, list[int]] = {}
+
+    for student_id, place_id in previous_places.items():
+        if student_id not in tops or place_id not in tops[student_id]:
+            affected_students.add(student_id)
+        else:
+            occupancy.setdefault(place_id, []).append(student_id)
+
+    for place_id, student_ids in occupancy.items():
+        if len(student_ids) > capacity.get(place_id, 0):
+            affected_students.update(student_ids)
+
+    affected_places |= {previous_places[s] for s in affected_students if s in previous_places}
+    affected_places |= set(pinned.values())
+
+    # grow the group of students to re-plan along their choices
+    released = {student_id for student_id in affected_students if student_id in tops}
+    released |= {s for place_id in affected_places for s in students_by_place.get(place_id, ())}
+    places = {place_id for student_id in released for place_id in tops[student_id]}
+    steps = 0
+
+    while radius is None or steps < radius:
+        new_students = {s for place_id in places for s in students_by_place.get(place_id, ())} - released
+        if not new_students:
+            break
+        released |= new_students
+        places |= {place_id for student_id in new_students for place_id in tops[student_id]}
+        steps += 1
+
+    # keep the other students, and the pinned ones, in their place
+    ranks = {(s, p): rank for s, choices in tops.items() for rank, p in enumerate(choices, start=1)}
+    pairs = [
+        (student_id, place_id, ranks[(student_id, place_id)], False)
+        for student_id, place_id, _, _ in previous
+        if student_id not in released and student_id not in pinned and student_id in tops
+    ]
+    pairs += [
+        (student_id, place_id, ranks.get((student_id, place_id), -1), True) for student_id, place_id in pinned.items()
+    ]
+
+    free = dict(capacity)
+    for _, place_id, _, _ in pairs:
+        free[place_id] = free.get(place_id, 0) - 1
+
+    # solve the released students with the free seats, with a penalty for moving away from the previous place
+    student_ids = [student_id for student_id in tops if student_id in released and student_id not in pinned]
+    project_place_ids = [place_id for place_id, seats in free.items() if seats > 0]
+    place_index = {place_id: k for k, place_id in enumerate(project_place_ids)}
+    edges = [
+        (i, place_index[place_id], rank)
+        for i, student_id in enumerate(student_ids)
+        for rank, place_id in enumerate(tops[student_id])
+        if place_id in place_index
+    ]
+
+    if edges:
+        edge_rows, edge_places, edge_ranks = (np.array(column, dtype=np.intp) for column in zip(*edges, strict=True))
+        moved = np.array([previous_places.get(student_ids[i]) != project_place_ids[k] for i, k, _ in edges])
+        flow = solve_flow(
+            edge_rows,
+            edge_places,
+            edge_ranks,
+            num_students=len(student_ids),
+            capacity=np.array([free[place_id] for place_id in project_place_ids]),
+            minimum=np.zeros(len(project_place_ids), dtype=np.intp),
+            costs=np.exp(edge_ranks) + churn_penalty * moved,
+        )
+        pairs += [
+            (student_ids[i], project_place_ids[k], int(rank) + 1, False)
+            for i, k, rank in zip(edge_rows[flow], edge_places[flow], edge_ranks[flow], strict=True)
+        ]
+
+    return pairs
+
+
+def get_moved_students(previous: Planning, planning: Planning) -> set[int]:
+    """Return the students whose place changed between two plannings (including students added or removed).
+
+    :param previous: The previous planning, a list of tuples (student_id, project_place_id, rank, preassigned).
+    :param planning: The new planning, a list of tuples (student_id, project_place_id, rank, preassigned).
+    :returns: A set of student_ids.
+    """
+    previous_places = {student_id: place_id for student_id, place_id, _, _ in previous}
+    places = {student_id: place_id for student_id, place_id, _, _ in planning}
+    return {s for s in previous_places.keys() | places.keys() if previous_places.get(s) != places.get(s)}
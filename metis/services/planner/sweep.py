@@ -0,0 +1,114 @@
+import os
+from collections import Counter
+from collections.abc import Callable, Iterable
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple
+
+from .hungarian import hungarian_optimizer
+
+
+Planning = list[tuple[int, int, int, bool]]
+
+
+class SweepResult(NamedTuple):
+    """The outcome of a planning for one seed."""
+
+    seed: int
+    planning: Planning
+
+    @property
+    def histogram(self) -> dict[int, int]:
+        """Number of students per rank (top)."""
+        return dict(sorted(Counter(rank for _, _, rank, _ in self.planning).items()))
+
+    @property
+    def sum_of_ranks(self) -> int:
+        """Sum of the ranks of all the students. Lower is better."""
+        return sum(rank for _, _, rank, _ in self.planning)
+
+    @property
+    def first_choices(self) -> int:
+        """Number of students that got their first choice. Higher is better."""
+        return sum(1 for _, _, rank, _ in self.planning if rank == 1)
+
+    @property
+    def worst_rank(self) -> int:
+        """The worst rank any student got. Lower is better."""
+        return max((rank for _, _, rank, _ in self.planning), default=0)
+
+
+OBJECTIVES: dict[str, Callable[[SweepResult], tuple]] = {
+    "sum_of_ranks": lambda r: (r.sum_of_ranks, -r.first_choices, r.worst_rank),
+    "first_choices": lambda r: (-r.first_choices, r.sum_of_ranks, r.worst_rank),
+    "worst_rank": lambda r: (r.worst_rank, r.sum_of_ranks, -r.first_choices),
+}
+
+# read-only planning data, shared with each worker process once (instead of once per seed)
+_shared: dict = {}
+
+
+def _init_worker(optimizer: Callable, student_tops: list, project_place_availability: dict, preassigned_pairs) -> None:
+    _shared.update(
+        optimizer=optimizer,
+        student_tops=student_tops,
+        project_place_availability=project_place_availability,
+        preassigned_pairs=preassigned_pairs,
+    )
+
+
+def _run_seed(seed: int) -> SweepResult:
+    preassigned_pairs = _shared["preassigned_pairs"]
+    planning = _shared["optimizer"](
+        list(_shared["student_tops"]),
+        dict(_shared["project_place_availability"]),
+        list(preassigned_pairs) if preassigned_pairs is not None else None,
+        seed,
+    )
+    return SweepResult(seed=seed, planning=planning)
+
+
+def sweep_optimizer(
+    student_tops: list[tuple[int, list[int]]],
+    project_place_availability: dict[int, int],
+    preassigned_pairs: list[tuple[int, int]] | None = None,
+    seeds: Iterable[int] = (),
+    *,
+    optimizer: Callable[..., Planning] = hungarian_optimizer,
+    objective: str = "sum_of_ranks",
+    max_workers: int | None = None,
+) -> tuple[list[SweepResult], SweepResult | None]:
+    """Run a planning optimizer for several seeds, in parallel, and find the best outcome.
+
+    The planning data is sent to each worker process once, when the process starts, and every seed only
+    returns its planning. The optimizer must be picklable (a module level function or a `functools.partial`).
+
+    :param student_tops: A list of tuples (student_id, top_choices) where top_choices is a list of project_place_ids
+    :param project_place_availability: A dictionary of project_place_id: availability pairs.
+    :param preassigned_pairs: A list of tuples (student_id, project_place_id) that must be included in the result.
+    :param seeds: The seeds for the randomizer.
+    :param optimizer: The planning optimizer, with the signature of `hungarian_optimizer`.
+    :param objective: The objective used to choose the best seed: `sum_of_ranks`, `first_choices` or `worst_rank`.
+        Ties are broken by the other objectives, and then by the order of the seeds.
+    :param max_workers: The number of worker processes. With one worker, the seeds are run in this process.
+    :returns: A tuple with the results for each seed (in the order of the seeds) and the best result.
+    """
+    if objective not in OBJECTIVES:
+        raise ValueError(f"Invalid objective: {objective}")
+
+    seeds = list(seeds)
+    initargs = (optimizer, student_tops, project_place_availability, preassigned_pairs)
+
+    if max_workers == 1 or len(seeds) <= 1:
+        try:
+            _init_worker(*initargs)
+            results = [_run_seed(seed) for seed in seeds]
+        finally:
+            _shared.clear()
+    else:
+        chunksize = max(1, len(seeds) // (4 * (max_workers or os.cpu_count() or 1)))
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=initargs) as executor:
+            results = list(executor.map(_run_seed, seeds, chunksize=chunksize))
+
+    best = min(results, key=OBJECTIVES[objective], default=None)
+
+    return results, best
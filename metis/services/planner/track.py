@@ -0,0 +1,176 @@
+from collections import Counter
+from random import Random
+from typing import NamedTuple
+
+import numpy as np
+from scipy.optimize import Bounds, LinearConstraint, milp
+from scipy.sparse import csr_array
+
+
+class TrackConstraint(NamedTuple):
+    """The bounds of a discipline constraint of a track (see `DisciplineConstraint`)."""
+
+    disciplines: frozenset[int]
+    min_count: int | None = None
+    max_count: int | None = None
+    max_repeat: int | None = 1
+
+
+def track_optimizer(
+    period_tops: dict[int, list[tuple[int, list[int]]]],
+    period_availability: dict[int, dict[int, int]],
+    place_disciplines: dict[int, list[int]],
+    constraints: list[TrackConstraint],
+    *,
+    period_disciplines: dict[int, list[int]] | None = None,
+    covered_disciplines: dict[int, Counter] | None = None,
+    remaining_positions: dict[int, int] | None = None,
+    seed: int | None = None,
+) -> list[tuple[int, int, int, int | None, int]]:
+    """Plan all the periods of a track in one solve, honouring the discipline constraints of the track.
+
+    Every (student, period, project place, discipline) choice is a binary variable of an integer linear program,
+    solved with HiGHS. Besides the assignment and availability constraints of a single period, the constraints of the
+    track are linear constraints over the periods of each student:
+
+    - min_count <= (number of internships with a discipline of the constraint) <= max_count
+    - (number of internships with the same discipline of the constraint) <= max_repeat
+
+    The disciplines a student already covered in the track (in periods that are not planned) count for the bounds.
+    Students can be left without a place in a period, and minimums can be left unfilled, both with a cost higher than
+    any rearrangement of the tops, so the problem is always feasible and the maximums are never exceeded. A minimum
+    that the remaining positions of a student (in periods that are not planned) can still fill is not enforced.
+
+    :param period_tops: A dictionary of period_id: student_tops, where student_tops is a list of tuples
+        (student_id, top_choices) and top_choices is a list of project_place_ids.
+    :param period_availability: A dictionary of period_id: availability, where availability is a dictionary of
+        project_place_id: number of students.
+    :param place_disciplines: A dictionary of project_place_id: discipline_ids. An internship at the project place
+        covers one of these disciplines, or no discipline if the project place has none.
+    :param constraints: The discipline constraints of the track.
+    :param period_disciplines: A dictionary of period_id: discipline_ids, the disciplines available in the period
+        (from the constraints of the program internship). Periods that are not in the dictionary allow all disciplines.
+    :param covered_disciplines: A dictionary of student_id: Counter(discipline_id), the disciplines already covered.
+    :param remaining_positions: A dictionary of student_id: number of internships of the track that the student still
+        has to do in periods that are not planned.
+    :param seed: A seed for the randomizer, that shuffles the order of the students (and thus breaks ties).
+    :returns: A list of tuples (period_id, student_id, project_place_id, discipline_id, rank) where rank is the rank
+        of the project place (top) in the student's top choices for that period.
+    """
+    period_disciplines = period_disciplines or {}
+    covered_disciplines = covered_disciplines or {}
+    remaining_positions = remaining_positions or {}
+    randomizer = Random(seed) if seed else None
+
+    # Flatten the tops into (student, period, place, discipline) choices, and one row per (student, period)
+    choices = []
+    slots = []
+
+    for period_id, student_tops in period_tops.items():
+        student_tops = list(student_tops)
+        if randomizer:
+            randomizer.shuffle(student_tops)
+
+        availability = period_availability.get(period_id, {})
+        allowed = set(period_disciplines[period_id]) if period_id in period_disciplines else None
+
+        for student_id, top_choices in student_tops:
+            if top_choices is None:
+                continue
+            slot = len(slots)
+            slots.append((period_id, student_id))
+
+            for rank, project_place_id in enumerate(top_choices):
+                if availability.get(project_place_id, 0) <= 0:
+                    continue
+                disciplines = place_disciplines.get(project_place_id) or [None]
+                for discipline_id in disciplines:
+                    if allowed is None or discipline_id in allowed:
+                        choices.append((slot, period_id, student_id, project_place_id, discipline_id, rank))
+
+    if not choices:
+        return []
+
+    num_choices = len(choices)
+    num_slots = len(slots)
+    choice_slots = np.array([choice[0] for choice in choices], dtype=np.intp)
+    choice_ranks = np.array([choice[5] for choice in choices], dtype=np.intp)
+    costs = np.exp(choice_ranks)  # add a penalty for the rank
+    dummy_cost = (num_slots + 1) * costs.max()
+
+    # index the choices per student and discipline, and per period and place
+    by_student_discipline = {}
+    by_period_place = {}
+    for k, (_, period_id, student_id, project_place_id, discipline_id, _) in enumerate(choices):
+        by_student_discipline.setdefault((student_id, discipline_id), []).append(k)
+        by_period_place.setdefault((period_id, project_place_id), []).append(k)
+
+    student_ids = list(dict.fromkeys(student_id for _, student_id in slots))
+    rows, cols, lower, upper = [], [], [], []
+
+    def add_row(columns: list[int], lo: float, hi: float) -> None:
+        row = len(lower)
+        rows.extend([row] * len(columns))
+        cols.extend(columns)
+        lower.append(lo)
+        upper.append(hi)
+
+    # each (student, period) gets one place, or is left unmatched
+    slot_choices = [[] for _ in range(num_slots)]
+    for k, slot in enumerate(choice_slots):
+        slot_choices[slot].append(k)
+    for slot, columns in enumerate(slot_choices):
+        add_row([*columns, num_choices + slot], 1, 1)
+
+    # each place receives at most its availability, per period
+    for (period_id, project_place_id), columns in by_period_place.items():
+        add_row(columns, 0, period_availability[period_id][project_place_id])
+
+    # the constraints of the track, per student
+    shortfalls = []
+    for student_id in student_ids:
+        covered = covered_disciplines.get(student_id, Counter())
+        later_positions = remaining_positions.get(student_id, 0)
+
+        for constraint in constraints:
+            columns = [k for d in constraint.disciplines for k in by_student_discipline.get((student_id, d), [])]
+            covered_count = sum(covered[d] for d in constraint.disciplines)
+            # the positions in the periods that are not planned can still fill the minimum
+            min_count = max(0, (constraint.min_count or 0) - covered_count - later_positions)
+            max_count = np.inf if constraint.max_count is None else max(0, constraint.max_count - covered_count)
+
+            if min_count > 0:
+                shortfalls.append(min_count)
+                columns = [*columns, num_choices + num_slots + len(shortfalls) - 1]
+            if columns and (min_count > 0 or max_count < len(columns)):
+                add_row(columns, min_count, max_count)
+
+            if constraint.max_repeat is None:
+                continue
+            for discipline_id in constraint.disciplines:
+                repeat_columns = by_student_discipline.get((student_id, discipline_id), [])
+                max_repeat = max(0, constraint.max_repeat - covered[discipline_id])
+                if max_repeat < len(repeat_columns):
+                    add_row(repeat_columns, 0, max_repeat)
+
+    num_variables = num_choices + num_slots + len(shortfalls)
+    c = np.concatenate((costs, np.full(num_slots + len(shortfalls), dummy_cost)))
+    matrix = csr_array((np.ones(len(rows)), (rows, cols)), shape=(len(lower), num_variables))
+
+    result = milp(
+        c,
+        constraints=[LinearConstraint(matrix, lower, upper)],
+        integrality=np.ones(num_variables),
+        bounds=Bounds(0, np.concatenate((np.ones(num_choices + num_slots), shortfalls))),
+    )
+
+    if not result.success:  # pragma: no cover
+        raise ValueError(f"The track planning could not be solved: {result.message}")
+
+    return [
+        (period_id, student_id, project_place_id, discipline_id, rank + 1)
+        for (_, period_id, student_id, project_place_id, discipline_id, rank), x in zip(
+            choices, result.x[:num_choices], strict=True
+        )
+        if x > 0.5
+    ]
@@ -1,27 +1,50 @@
+from operator import itemgetter
+
+
+TopsIndex = dict[int, list[tuple[int, int]]]
+
+
+def get_tops_index(student_tops: list[tuple[int, list[int]]]) -> TopsIndex:
+    """Build an inverted index of student tops, in one pass over all the tops.
+
+    :param student_tops: A list of tuples (student_id, top_choices) where top_choices is a list of (unique)
+        project_place_ids, as validated by the tops form.
+    :returns: A dictionary of project_place_id: list((rank, student_id)), sorted by rank (zero-based).
+        Students with the same rank keep the order of `student_tops`.
+    """
+    tops_index = {}
+
+    for student_id, top_choices in student_tops:
+        if top_choices is None:
+            continue
+        for rank, project_place_id in enumerate(top_choices):
+            tops_index.setdefault(project_place_id, []).append((rank, student_id))
+
+    for choices in tops_index.values():
+        choices.sort(key=itemgetter(0))
+
+    return tops_index
+
+
 def find_students_for_places(
     student_tops: list[tuple[int, list[int]]],
     project_places: list[int],
+    *,
+    tops_index: TopsIndex | None = None,
 ) -> dict[int, list[int]]:
     """Given some student tops, return, per project_place_id, a list of students ordered by rank (or empty list).
 
     :param student_tops: A list of tuples (student_id, top_choices) where top_choices is a list of project_place_ids.
     :param project_places: A list of project_place_ids.
+    :param tops_index: An inverted index of the tops (see `get_tops_index`), if it was already built.
+        It can contain more students than `student_tops`; only the students in `student_tops` are returned.
     :returns: A dictionary of project_place_id: list(student_id).
     """
-    choices = {}
-
-    for project_place_id in project_places:
-        choices.setdefault(project_place_id, [])
-
-        for student_id, top_choices in student_tops:
-            if top_choices is None:
-                continue
-            if project_place_id in top_choices:
-                choices[project_place_id].append((student_id, top_choices.index(project_place_id)))
-
-    # sort by rank and get rid of the rank
-    for project_place_id in project_places:
-        choices[project_place_id] = sorted(choices[project_place_id], key=lambda x: x[1])
-        choices[project_place_id] = [x[0] for x in choices[project_place_id]]
+    if tops_index is None:
+        tops_index = get_tops_index(student_tops)
 
-    return choices
+    student_ids = {student_id for student_id, top_choices in student_tops if top_choices is not None}
+    return {
+        project_place_id: [s for _, s in tops_index.get(project_place_id, []) if s in student_ids]
+        for project_place_id in project_places
+    }
@@ -28,8 +28,14 @@ urlpatterns = [
     path("dashboard/", views.DashboardView.as_view(), name="dashboard"),
     # files  # TODO: refactor
     path("files/p/proj_<int:project_id>_<slug:file_code>.xlsx", views.ProjectExcelView.as_view(), name="project_excel"),
+    path(
+        "files/p/planning/<int:project_id>/<slug:job_id>/",
+        views.TrackPlanningJobView.as_view(),
+        name="track_planning_job",
+    ),
     path("files/q/<int:questioning_id>.<slug:file_type>", views.QuestioningFileView.as_view(), name="questioning_file"),
     path("files/q/planning/<int:questioning_id>.xlsx", views.PlanningFileView.as_view(), name="planning_file"),
+    path("files/q/planning/<int:questioning_id>/<slug:job_id>/", views.PlanningJobView.as_view(), name="planning_job"),
     path("files/e/<uuid:uuid>.pdf", views.EvaluationPdfView.as_view(), name="evaluation_pdf"),
     path("files/i/<uuid:uuid>_<slug:template_code>.pdf", views.InternshipPdfView.as_view(), name="internship_pdf"),
     path("files/s/<uuid:uuid>.pdf", views.SignaturePdfView.as_view(), name="signature_pdf"),
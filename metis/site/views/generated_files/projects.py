@@ -1,12 +1,16 @@
 from django.contrib.auth.decorators import login_required
-from django.core.exceptions import PermissionDenied
-from django.shortcuts import get_object_or_404
+from django.core.exceptions import BadRequest, PermissionDenied
+from django.shortcuts import get_object_or_404, redirect
 from django.utils.decorators import method_decorator
 from django.views import View
+from django.views.decorators.cache import never_cache
 
-from metis.models import Project
+from metis.models import Project, Track
+from metis.services.file_generator.planner.jobs import get_planning_job, start_track_planning_job
 from metis.services.file_generator.projects import ProjectContactsExcel, ProjectPlacesExcel, ProjectPlanningExcel
 
+from .questionings import get_planning_job_response
+
 
 class ProjectExcelView(View):
     """Generate an Excel file for a project."""
@@ -33,5 +37,22 @@ class ProjectExcelView(View):
             return ProjectContactsExcel(self.get_object()).get_response()
         elif code == "places":
             return ProjectPlacesExcel(self.get_object()).get_response()
+        elif code == "track_planning":
+            if not request.GET.get("track", "").isdigit():
+                raise BadRequest("Invalid track")
+            track = get_object_or_404(Track, id=request.GET["track"], program_id=self.get_object().program_id)
+            # the planning of all the periods of a track is solved in a background job
+            job = start_track_planning_job(self.get_object(), track)
+            return redirect("track_planning_job", project_id=self.get_object().id, job_id=job.job_id)
         else:
             raise NotImplementedError
+
+
+class TrackPlanningJobView(ProjectExcelView):
+    """Show the progress of a track planning job, and download the planning file when it is done."""
+
+    @method_decorator(never_cache)
+    def get(self, request, *args, **kwargs):
+        """Get the planning file, or a page that refreshes until the job is done (or failed)."""
+        job = get_planning_job(self.get_object(), self.kwargs["job_id"])
+        return get_planning_job_response(request, job, title=self.get_object().name)
@@ -1,12 +1,16 @@
 from django.contrib.auth.decorators import login_required
 from django.core.exceptions import BadRequest, PermissionDenied
-from django.shortcuts import get_object_or_404
+from django.http import FileResponse, Http404
+from django.shortcuts import get_object_or_404, redirect, render
 from django.utils.decorators import method_decorator
 from django.views import View
+from django.views.decorators.cache import never_cache
+from pydantic import ValidationError
 
 from metis.models import Questioning
 from metis.services.file_generator.pdf import render_pdf_template
-from metis.services.file_generator.planner.planning import PlanningExcel
+from metis.services.file_generator.planner.jobs import PlanningJob, get_planning_job, start_planning_job
+from metis.services.file_generator.planner.planning import SOLVERS, PlanningExcelOptions, validate_planning_options
 from metis.services.file_generator.questionings.base import QuestioningExcel
 
 
@@ -37,22 +41,63 @@ class QuestioningFileView(View):
 
 
 class PlanningFileView(QuestioningFileView):
-    """Generate an Excel file with the planning for a tops questioning."""
+    """Start a background job that generates an Excel file with the planning for a tops questioning."""
 
     def get(self, request, *args, **kwargs):
-        """Get response for the planning file."""
+        """Start (or join) the planning job, and redirect to its status page."""
         if not self.get_object().type == Questioning.STUDENT_TOPS:
             raise BadRequest("Invalid questioning type")
+        if request.GET.get("solver", "auto") not in SOLVERS:
+            raise BadRequest("Invalid solver")
 
         def int_list(s: str | None) -> list[int] | None:
             return [int(id) for id in s.split(",") if id] if s else None
 
-        return PlanningExcel(
-            self.get_object(),
-            options={
-                "students_with_first_choice": int_list(request.GET.get("s_first")),
-                "students_to_skip": int_list(request.GET.get("s_skip")),
-                "places_with_students": int_list(request.GET.get("p_force")),
-                "places_to_skip": int_list(request.GET.get("p_skip")),
-            },
-        ).get_response()
+        try:
+            options = PlanningExcelOptions.model_validate(
+                {
+                    "students_with_first_choice": int_list(request.GET.get("s_first")),
+                    "students_to_skip": int_list(request.GET.get("s_skip")),
+                    "places_with_students": int_list(request.GET.get("p_force")),
+                    "places_to_skip": int_list(request.GET.get("p_skip")),
+                    "solver": request.GET.get("solver", "auto"),
+                    "sweep": request.GET.get("sweep") or None,
+                    "sweep_objective": request.GET.get("objective", "sum_of_ranks"),
+                    "distance_weight": request.GET.get("distance_weight") or 0.0,
+                    "max_distance": request.GET.get("max_distance") or None,
+                }
+            )
+        except ValidationError as exc:
+            raise BadRequest("Invalid planning options") from exc
+
+        try:
+            validate_planning_options(self.get_object(), options)
+        except ValueError as exc:
+            raise BadRequest(str(exc)) from exc
+
+        job = start_planning_job(self.get_object(), options)
+
+        return redirect("planning_job", questioning_id=self.get_object().id, job_id=job.job_id)
+
+
+class PlanningJobView(QuestioningFileView):
+    """Show the progress of a planning job, and download the planning file when it is done."""
+
+    @method_decorator(never_cache)
+    def get(self, request, *args, **kwargs):
+        """Get the planning file, or a page that refreshes until the job is done (or failed)."""
+        job = get_planning_job(self.get_object(), self.kwargs["job_id"])
+
+        return get_planning_job_response(request, job, title=self.get_object().title)
+
+
+def get_planning_job_response(request, job: PlanningJob | None, *, title: str):
+    """Get the file of a planning job, or the page with its progress (see `planning_job.html`)."""
+    if job is None:
+        raise Http404("Planning job not found")
+    if job.file is not None:
+        filename = job.file.file.name.split("/")[-1]
+        return FileResponse(job.file.file.open("rb"), as_attachment=True, filename=filename)
+
+    context = {"title": title, "job": job}
+    return render(request, "planning_job.html", context, status=200 if job.state == "failed" else 202)
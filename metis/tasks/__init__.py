@@ -4,3 +4,4 @@ from .custom import *
 from .cleanup import *
 from .emails import *
 from .evaluations import *
+from .planning import *
@@ -1,9 +1,20 @@
+from datetime import timedelta
+
 from django.core.management import call_command
+from django.utils import timezone
 from huey import crontab
 from huey.contrib.djhuey import db_periodic_task
 
+from metis.models.stages.internships import Internship
+
 
 @db_periodic_task(crontab(hour="*/4", minute="0"))
 def clear_expired_sessions() -> None:
     """Clear Django expired sessions."""
     call_command("clearsessions")
+
+
+@db_periodic_task(crontab(hour="3", minute="0"))
+def refresh_internship_tags() -> None:
+    """Recompute the tags of the internships that did not end more than a month ago, to repair missed updates."""
+    Internship.refresh_tags(Internship.objects.filter(end_date__gte=timezone.now().date() - timedelta(days=30)))
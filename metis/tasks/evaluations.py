@@ -4,27 +4,41 @@ from django.utils import timezone
 from huey import crontab
 from huey.contrib.djhuey import db_periodic_task
 
-from metis.models.stages.internships import Internship
+from metis.models.stages.evaluations import Evaluation
+from metis.models.stages.internships import Internship, get_internships_evaluation_periods
 from metis.services.mailer.evaluations import schedule_evaluation_reminder
 from metis.utils.dates import remind_deadline
 
 
 @db_periodic_task(crontab(hour="8", minute="0"))
 def schedule_evaluation_emails() -> None:
-    """Check which evaluations need to happen and schedule the emails to mentors."""
+    """Check which evaluations need to happen and schedule the emails to mentors.
+
+    The open evaluation periods of all the active internships are computed at once, and only the internships that
+    have an open period without an evaluation are loaded.
+    """
     now = timezone.now()
-    active_internships = Internship.objects.filter(
-        status=Internship.DEFINITIVE, start_date__lte=now, end_date__gte=now
-    ).prefetch_related("project__education")
+    active_internships = Internship.objects.filter(status=Internship.DEFINITIVE, start_date__lte=now, end_date__gte=now)
+    open_periods = get_internships_evaluation_periods(active_internships, at=now)
+
+    existing_evaluations = set(
+        Evaluation.objects.filter(internship_id__in=list(open_periods)).values_list("internship_id", "intermediate")
+    )
+    pending_periods = {}
+
+    for internship_id, periods in open_periods.items():
+        periods = [period for period in periods if (internship_id, period.intermediate) not in existing_evaluations]
+        if periods:
+            pending_periods[internship_id] = periods
+
+    internships = Internship.objects.select_related("project__education").in_bulk(list(pending_periods))
 
-    for internship in active_internships:
+    for internship_id, evaluation_periods in pending_periods.items():
+        internship = internships[internship_id]
         education = internship.education
         remind_before = education.configuration["email_remind_before"] if education.configuration else [0, 3, 7]
 
-        for evaluation_period in internship.evaluation_periods:
-            if not (evaluation_period.start_at <= now <= evaluation_period.end_at):
-                continue
-
+        for evaluation_period in evaluation_periods:
             if not remind_deadline(
                 now,
                 datetime.fromisoformat(evaluation_period.official_deadline.isoformat()),
@@ -32,7 +46,4 @@ def schedule_evaluation_emails() -> None:
             ):
                 continue
 
-            if internship.evaluations.filter(intermediate=evaluation_period.intermediate).exists():  # type: ignore
-                continue
-
             schedule_evaluation_reminder(internship, evaluation_period)
@@ -0,0 +1,15 @@
+from huey.contrib.djhuey import db_task
+
+from metis.services.file_generator.planner.jobs import run_planning_job, run_track_planning_job
+
+
+@db_task()
+def generate_planning_file(questioning_id: int, options: dict, job_id: str) -> None:
+    """Generate a planning file in the background, and store it on the questioning."""
+    run_planning_job(questioning_id, options, job_id)
+
+
+@db_task()
+def generate_track_planning_file(project_id: int, track_id: int, job_id: str) -> None:
+    """Generate the planning file of a track in the background, and store it on the project."""
+    run_track_planning_job(project_id, track_id, job_id)
@@ -0,0 +1,112 @@
+from random import Random
+
+from django.contrib.contenttypes.models import ContentType
+from django.utils import timezone
+
+from metis.models import Period, Place, ProjectPlace, ProjectPlaceAvailability, Questioning, Student, User
+from metis.models.rel.forms import FormResponse
+
+
+def synthetic_cohort(
+    num_students: int,
+    num_places: int,
+    *,
+    num_tops: int = 10,
+    skew: float = 0.8,
+    capacity: tuple[int, int] = (1, 6),
+    triage: float = 0.0,
+    seed: int = 0,
+) -> tuple[list[tuple[int, list[int] | None]], dict[int, int]]:
+    """Generate realistic student tops for a planning.
+
+    :param num_students: The number of students, with ids 1..num_students.
+    :param num_places: The number of project places, with ids 1..num_places.
+    :param num_tops: The number of tops of each student.
+    :param skew: The popularity skew of the places: the n-th place is chosen with a weight of 1 / n ** skew.
+    :param capacity: The (min, max) range of the availability of each place.
+    :param triage: The share of students with `None` tops, i.e. students that are planned by hand.
+    :param seed: The seed for the randomizer.
+    :returns: A tuple with the tops as (student_id, top_choices), and the availability as project_place_id: max.
+    """
+    randomizer = Random(seed)
+    project_place_ids = list(range(1, num_places + 1))
+    popularity = [1 / (rank + 1) ** skew for rank in range(num_places)]
+    student_tops = []
+
+    for student_id in range(1, num_students + 1):
+        if triage and randomizer.random() < triage:
+            student_tops.append((student_id, None))
+            continue
+
+        choices = set()
+        while len(choices) < min(num_tops, num_places):
+            choices.add(randomizer.choices(project_place_ids, popularity)[0])
+        choices = list(choices)
+        randomizer.shuffle(choices)
+        student_tops.append((student_id, choices))
+
+    availability = {project_place_id: randomizer.randint(*capacity) for project_place_id in project_place_ids}
+    return student_tops, availability
+
+
+def create_planning_cohort(period: Period, num_students: int, num_places: int, **kwargs) -> Questioning:
+    """Create a student tops questioning for a synthetic cohort (see `synthetic_cohort`), with bulk inserts.
+
+    The students, places, project places, availability and responses are added to the project of the period.
+
+    :param period: The period to plan, with a program internship.
+    :param num_students: The number of students.
+    :param num_places: The number of project places.
+    :param kwargs: The other arguments of `synthetic_cohort`.
+    :returns: The student tops questioning.
+    """
+    project = period.project
+    student_tops, availability = synthetic_cohort(num_students, num_places, **kwargs)
+    prefix = f"cohort-{period.id}-{Student.objects.count()}"
+
+    users = User.objects.bulk_create(
+        [
+            User(username=f"{prefix}-{i}", first_name=f"Student {i}", last_name=prefix, email=f"{prefix}-{i}@metis")
+            for i, _ in student_tops
+        ]
+    )
+    students = Student.objects.bulk_create(
+        [Student(user=user, project=project, block=period.program_internship.block) for user in users]
+    )
+    places = Place.objects.bulk_create(
+        [Place(education=project.education, name=f"Place {prefix}-{i}", code=f"{prefix}-{i}") for i in availability]
+    )
+    project_places = ProjectPlace.objects.bulk_create([ProjectPlace(project=project, place=place) for place in places])
+    ProjectPlaceAvailability.objects.bulk_create(
+        [
+            ProjectPlaceAvailability(project_place=project_place, period=period, min=1, max=max_students)
+            for project_place, max_students in zip(project_places, availability.values(), strict=True)
+        ]
+    )
+
+    # map the synthetic ids to the new rows
+    student_ids = {i: student.id for (i, _), student in zip(student_tops, students, strict=True)}
+    project_place_ids = {i: project_place.id for i, project_place in zip(availability, project_places, strict=True)}
+
+    questioning = Questioning.objects.create(
+        type=Questioning.STUDENT_TOPS,
+        target_group="students",
+        project=project,
+        period=period,
+        start_at=timezone.now(),
+        end_at=timezone.now(),
+    )
+    content_type = ContentType.objects.get_for_model(Student)
+    FormResponse.objects.bulk_create(
+        [
+            FormResponse(
+                content_type=content_type,
+                object_id=student_ids[i],
+                questioning=questioning,
+                data={"tops": [project_place_ids[p] for p in tops] if tops is not None else None},
+            )
+            for i, tops in student_tops
+        ]
+    )
+
+    return questioning
@@ -1,8 +1,10 @@
+from datetime import timedelta
 from http import HTTPStatus as status
 
 import pytest
 from django.urls import reverse
 
+from metis.models import Signature
 from metis.utils.factories import ContactFactory, InternshipFactory, MentorFactory, StudentFactory, TimesheetFactory
 
 
@@ -197,3 +199,40 @@ class TestForOfficeMember(TestForAuthenticated):
     @pytest.fixture(autouse=True)
     def setup(self, api_client, t_office_member):  # noqa: D102
         api_client.force_authenticate(user=t_office_member)
+
+
+@pytest.mark.api
+@pytest.mark.parametrize("num_timesheets", [2, 20])
+def test_approve_timesheets_in_bulk(
+    api_client,
+    t_education,
+    internship,
+    num_timesheets,
+    django_assert_max_num_queries,
+    django_capture_on_commit_callbacks,
+):
+    """Test that many timesheets are approved in a constant number of queries, with one update of the hours tags."""
+    with django_capture_on_commit_callbacks(execute=True):
+        timesheets = [
+            TimesheetFactory.create(
+                internship=internship,
+                date=internship.start_date + timedelta(days=day),
+                start_time_am="8:00",
+                end_time_am="12:00",
+            )
+            for day in range(num_timesheets)
+        ]
+    url = reverse(
+        "v1:project-internship-timesheet-approve", args=[t_education.id, internship.project_id, internship.id]
+    )
+    api_client.force_authenticate(user=internship.mentors.first().user)
+
+    with django_capture_on_commit_callbacks(execute=True) as callbacks, django_assert_max_num_queries(10):
+        response = api_client.post(url, {"ids": [timesheet.id for timesheet in timesheets], "signed_text": "signature"})
+
+    assert response.status_code == status.NO_CONTENT
+    assert len(callbacks) == 1
+    assert not internship.timesheets.filter(is_approved=False).exists()
+    assert Signature.objects.filter(object_id__in=[timesheet.id for timesheet in timesheets]).count() == num_timesheets
+    internship.refresh_from_db()
+    assert f'hours.approved:"{num_timesheets * 4}:00"' in internship.tags
@@ -1,8 +1,12 @@
+from datetime import date
 from http import HTTPStatus as status
 
 import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
+from metis.models import Discipline, Internship, Track
 from metis.utils.factories import ContactFactory, InternshipFactory, MentorFactory, StudentFactory
 
 
@@ -190,3 +194,83 @@ class TestForPlaceAdmin(TestForAuthenticated):
     @pytest.fixture(autouse=True)
     def setup(self, api_client, place_admin):  # noqa: D102
         api_client.force_authenticate(user=place_admin)
+
+
+@pytest.mark.parametrize("start_date", [date(2024, 6, 1), date(2023, 6, 1)])
+@pytest.mark.api
+def test_internship_feasible_disciplines(api_client, t_office_member, t_project, start_date):
+    """Test that only the disciplines that keep the track completable are returned for an internship.
+
+    The other internships of the student in the track count, whether they are before or after the internship.
+    """
+    track = Track.objects.get(program__education=t_project.education, name="Track A")
+    klinisch, prothetisch = Discipline.objects.get(name="Klinisch"), Discipline.objects.get(name="Prothetisch")
+    periods = [t_project.periods.get(program_internship=pi) for pi in track.program_internships.all()]
+    student = StudentFactory.create(project=t_project)
+
+    for i, period in enumerate(periods[:2]):
+        InternshipFactory.create(
+            project=t_project,
+            student=student,
+            track=track,
+            period=period,
+            discipline=klinisch,
+            start_date=date(2024, 1 + i, 1),
+        )
+    internship = InternshipFactory.create(
+        project=t_project, student=student, track=track, period=periods[2], start_date=start_date
+    )
+
+    api_client.force_authenticate(user=t_office_member)
+    url = reverse("v1:project-internship-disciplines", args=[t_project.education_id, t_project.id, internship.id])
+    response = api_client.get(url)
+    assert response.status_code == status.OK
+    assert [discipline["id"] for discipline in response.data] == [prothetisch.id]
+    assert klinisch in internship.get_available_disciplines()
+
+
+@pytest.mark.api
+def test_internship_feasible_disciplines_extra_internship(api_client, t_office_member, t_project):
+    """Test that the disciplines are not restricted for an internship beyond the program internships of the track.
+
+    The constrained positions are already filled by the other internships, so any available discipline can be chosen.
+    """
+    track = Track.objects.get(program__education=t_project.education, name="Track A")
+    klinisch, prothetisch = Discipline.objects.get(name="Klinisch"), Discipline.objects.get(name="Prothetisch")
+    periods = [t_project.periods.get(program_internship=pi) for pi in track.program_internships.all()]
+    student = StudentFactory.create(project=t_project)
+
+    for i, (period, discipline) in enumerate(zip(periods, [klinisch, klinisch, prothetisch, prothetisch], strict=True)):
+        InternshipFactory.create(
+            project=t_project,
+            student=student,
+            track=track,
+            period=period,
+            discipline=discipline,
+            start_date=date(2024, 1 + i, 1),
+        )
+    internship = InternshipFactory.create(
+        project=t_project, student=student, track=track, period=periods[0], start_date=date(2024, 6, 1)
+    )
+
+    api_client.force_authenticate(user=t_office_member)
+    url = reverse("v1:project-internship-disciplines", args=[t_project.education_id, t_project.id, internship.id])
+    response = api_client.get(url)
+    assert response.status_code == status.OK
+    assert {discipline["id"] for discipline in response.data} == set(
+        internship.get_available_disciplines().values_list("id", flat=True)
+    )
+
+
+@pytest.mark.api
+def test_evaluation_forms_per_request(api_client, t_office_member, t_project):
+    """Test that the forms are loaded once per request when listing internships, without a cross-request cache."""
+    api_client.force_authenticate(user=t_office_member)
+    url = reverse("v1:project-internship-list", args=[t_project.education_id, t_project.id])
+
+    with CaptureQueriesContext(connection) as context:
+        response = api_client.get(url)
+
+    assert response.status_code == status.OK
+    assert len(response.data) == Internship.objects.filter(project=t_project).count()
+    assert len([query for query in context.captured_queries if "metis_project_evaluation_forms" in query["sql"]]) == 1
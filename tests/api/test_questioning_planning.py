@@ -0,0 +1,80 @@
+from http import HTTPStatus as status
+from unittest import mock
+
+import pytest
+from django.urls import reverse
+
+from metis.models import ProjectPlaceAvailability
+from metis.services.file_generator.planner import planning
+
+
+def _planning_url(questioning) -> str:
+    return reverse(
+        "v1:project-questioning-planning",
+        args=[questioning.project.education_id, questioning.project_id, questioning.id],
+    )
+
+
+@pytest.mark.api
+def test_planning_for_random_user(api_client, t_random_user, t_tops_questioning):
+    """Test that only office members can make a planning."""
+    api_client.force_authenticate(user=t_random_user)
+
+    response = api_client.post(_planning_url(t_tops_questioning), {}, format="json")
+    assert response.status_code in {status.FORBIDDEN, status.NOT_FOUND}
+
+
+@pytest.mark.api
+def test_planning(api_client, t_office_member, t_tops_questioning):
+    """Test the planning pairs, the rank histogram and the unfilled places."""
+    api_client.force_authenticate(user=t_office_member)
+    num_students = t_tops_questioning.responses.count()
+
+    response = api_client.post(_planning_url(t_tops_questioning), {"solver": "sparse"}, format="json")
+    assert response.status_code == status.OK
+    assert len(response.data["pairs"]) == num_students
+    assert sum(response.data["ranks"].values()) == num_students
+    assert response.data["unplanned_students"] == []
+    assert response.data["seed"] == t_tops_questioning.random_seed
+
+    student_id = response.data["pairs"][0]["student"]
+    response = api_client.post(_planning_url(t_tops_questioning), {"students_to_skip": [student_id]}, format="json")
+    assert response.status_code == status.OK
+    assert student_id not in {pair["student"] for pair in response.data["pairs"]}
+    assert student_id not in response.data["unplanned_students"]
+
+    ProjectPlaceAvailability.objects.filter(period=t_tops_questioning.period).update(min=num_students + 1)
+    response = api_client.post(_planning_url(t_tops_questioning), {}, format="json")
+    assert response.status_code == status.OK
+    assert len(response.data["unfilled_places"]) == len(t_tops_questioning.project.place_set.all())
+
+
+@pytest.mark.api
+@pytest.mark.parametrize(
+    "data",
+    [{"solver": "unknown"}, {"sweep": 1000}, {"sweep": 2}, {"students_with_first_choice": [0]}],
+)
+def test_planning_invalid_options(api_client, t_office_member, t_tops_questioning, data):
+    """Test that invalid options (or students without tops) are rejected, as well as a sweep."""
+    api_client.force_authenticate(user=t_office_member)
+
+    response = api_client.post(_planning_url(t_tops_questioning), data, format="json")
+    assert response.status_code == status.BAD_REQUEST
+
+
+@pytest.mark.api
+def test_planning_inputs_are_cached(api_client, t_office_member, t_tops_questioning, locmem_cache):
+    """Test that the planning inputs are loaded once, until a response changes."""
+    api_client.force_authenticate(user=t_office_member)
+
+    with mock.patch.object(planning, "load_planning_inputs", wraps=planning.load_planning_inputs) as load:
+        api_client.post(_planning_url(t_tops_questioning), {"solver": "dense"}, format="json")
+        api_client.post(_planning_url(t_tops_questioning), {"solver": "flow"}, format="json")
+        assert load.call_count == 1
+
+        response = t_tops_questioning.responses.first()
+        response.data = {"tops": list(reversed(response.data["tops"]))}
+        response.save()
+
+        api_client.post(_planning_url(t_tops_questioning), {"solver": "dense"}, format="json")
+        assert load.call_count == 2
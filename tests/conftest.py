@@ -1,8 +1,20 @@
 import arrow
 import pytest
+from django.contrib.contenttypes.models import ContentType
+from django.utils import timezone
 from rest_framework.test import APIClient
 
-from metis.models import Education, Place, Project, ProjectPlace, User
+from metis.models import (
+    Education,
+    Place,
+    Project,
+    ProjectPlace,
+    ProjectPlaceAvailability,
+    Questioning,
+    Student,
+    User,
+)
+from metis.models.rel.forms import FormResponse
 from metis.utils.factories import (
     ContactFactory,
     EducationFactory,
@@ -25,6 +37,18 @@ def api_client():
     return APIClient(enforce_csrf_checks=True)
 
 
+@pytest.fixture()
+def locmem_cache(settings, request):
+    """Use a local memory cache of its own for the test, and clear it afterwards."""
+    from django.core.cache import cache
+
+    settings.CACHES = {
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": request.node.nodeid}
+    }
+    yield cache
+    cache.clear()
+
+
 @pytest.fixture()
 def now():
     """Return an Arrow UTC instance."""
@@ -132,3 +156,35 @@ def t_random_office_member(db) -> User:
 def t_contact(t_place) -> User:
     """Return a sample Contact instance."""
     return t_place.contacts.first()
+
+
+@pytest.fixture()
+def t_tops_questioning(t_project) -> Questioning:
+    """Return a student tops Questioning, with a response of each student and availability for each place."""
+    period = t_project.periods.first()
+    project_places = list(t_project.place_set.order_by("id"))
+    t_project.students.update(block=period.program_internship.block)
+
+    for project_place in project_places:
+        ProjectPlaceAvailability.objects.create(project_place=project_place, period=period, min=1, max=4)
+
+    questioning = Questioning.objects.create(
+        type=Questioning.STUDENT_TOPS,
+        target_group="students",
+        project=t_project,
+        period=period,
+        start_at=timezone.now(),
+        end_at=timezone.now(),
+    )
+    content_type = ContentType.objects.get_for_model(Student)
+
+    for i, student in enumerate(period.students):
+        tops = project_places[i % 3 :] + project_places[: i % 3]
+        FormResponse.objects.create(
+            content_type=content_type,
+            object_id=student.id,
+            questioning=questioning,
+            data={"tops": [project_place.id for project_place in tops]},
+        )
+
+    return questioning
@@ -1,8 +1,11 @@
 import pytest
+from django.core.exceptions import ValidationError
+from django.db import transaction
 from django.db.models import QuerySet
 
 from metis.models.stages.constraints import (
     DisciplineConstraint,
+    compile_discipline_constraints,
     get_disciplines_from_constraints,
     validate_discipline_constraints,
 )
@@ -132,3 +135,113 @@ def test_get_disciplines_from_constraints_no_constraints():  # noqa: D103
 
     assert isinstance(disciplines, QuerySet)
     assert disciplines.count() == 0
+
+
+@pytest.mark.django_db
+def test_compiled_constraints(track_with_constraints, django_assert_num_queries):
+    """Test that the constraints are compiled in one query, and validated without queries."""
+    with django_assert_num_queries(1):
+        compiled = compile_discipline_constraints(track_with_constraints.constraints.all())
+
+    assert compiled.min_counts == (2, 5)
+    assert compiled.max_repeats == (2, None)
+    assert sorted(compiled.get_discipline_ids(1)) == [2, 3, 4, 5, 6]
+    assert not compiled.masks[0] & compiled.masks[1]
+
+    with django_assert_num_queries(0):
+        assert compiled.is_compatible()
+        assert validate_discipline_constraints([1, 1, 2, 3, 4, 5, 6], compiled)
+        assert not validate_discipline_constraints([1, 1, 2, 3, 4, 5, 7], compiled)
+
+
+@pytest.mark.django_db
+def test_compiled_constraints_are_invalidated(track_with_constraints, disciplines, locmem_cache):
+    """Test that the cached compiled constraints follow the changes to the constraints and their disciplines."""
+    assert track_with_constraints.validate_discipline_constraints([1, 1, 2, 3, 4, 5, 6])
+
+    constraint = track_with_constraints.constraints.get(min_count=5)
+    constraint.disciplines.remove(disciplines[5])
+    assert not track_with_constraints.validate_discipline_constraints([1, 1, 2, 3, 4, 5, 6])
+
+    constraint.min_count = constraint.max_count = 4
+    constraint.save()
+    assert track_with_constraints.validate_discipline_constraints([1, 1, 2, 3, 4, 5])
+
+    constraint.delete()
+    assert track_with_constraints.validate_discipline_constraints([1, 1, 7])
+    assert len(track_with_constraints.get_compiled_constraints().masks) == 1
+
+
+@pytest.mark.django_db
+def test_conflicting_constraints(track, disciplines):
+    """Test that constraints with common disciplines and a different max_repeat conflict."""
+    constraint1 = DisciplineConstraint.objects.create(content_object=track, min_count=1, max_count=2, max_repeat=1)
+    constraint1.disciplines.set(disciplines[:2])
+    constraint2 = DisciplineConstraint.objects.create(content_object=track, min_count=1, max_count=2, max_repeat=2)
+
+    with pytest.raises(ValidationError):
+        constraint2.disciplines.set(disciplines[1:3])
+
+
+@pytest.mark.django_db
+def test_conflicting_constraints_are_not_cached(track, disciplines, locmem_cache, django_capture_on_commit_callbacks):
+    """Test that the rejected disciplines of a constraint are not kept in the cached compiled constraints."""
+    with django_capture_on_commit_callbacks(execute=True):
+        constraint1 = DisciplineConstraint.objects.create(content_object=track, min_count=1, max_count=2, max_repeat=1)
+        constraint1.disciplines.set(disciplines[:2])
+        constraint2 = DisciplineConstraint.objects.create(content_object=track, min_count=1, max_count=2, max_repeat=2)
+    assert track.get_compiled_constraints().masks == (3, 0)
+
+    with pytest.raises(ValidationError), transaction.atomic():
+        constraint2.disciplines.set(disciplines[1:3])
+
+    assert track.get_compiled_constraints() == compile_discipline_constraints(track.constraints.all())
+    assert track.get_compiled_constraints().masks == (3, 0)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "covered,remaining,expected_result",
+    [
+        ({}, 7, {1, 2, 3, 4, 5, 6}),
+        ({1: 2}, 5, {2, 3, 4, 5, 6}),  # discipline 1 is complete
+        ({2: 5}, 2, {1}),  # the other constraint is complete
+        ({1: 1, 2: 4}, 2, {1, 2, 3, 4, 5, 6}),
+        ({1: 1, 2: 5}, 1, {1}),
+        ({}, 6, set()),  # too few internships left to meet the min counts
+        ({}, 8, {1, 2, 3, 4, 5, 6}),  # one internship can be left to a discipline outside the constraints
+        ({2: 5}, 3, {1}),
+        ({1: 3}, 4, set()),  # discipline 1 is already repeated too often
+        ({7: 1}, 7, {1, 2, 3, 4, 5, 6}),  # disciplines outside the constraints are not counted
+    ],
+)
+def test_get_feasible_disciplines(track_with_constraints, covered, remaining, expected_result):
+    """Test that only the disciplines that keep a feasible completion of the track can be chosen."""
+    compiled = track_with_constraints.get_compiled_constraints()
+    assert compiled.get_feasible_disciplines(covered, remaining) == expected_result
+
+
+@pytest.mark.django_db
+def test_get_feasible_disciplines_max_repeat(track, disciplines):
+    """Test that a max_repeat limits the disciplines that can still fill the remaining internships."""
+    constraint = DisciplineConstraint.objects.create(content_object=track, min_count=3, max_count=3, max_repeat=1)
+    constraint.disciplines.set(disciplines[:3])
+    compiled = track.get_compiled_constraints()
+
+    assert compiled.get_feasible_disciplines({1: 1}, 2) == {2, 3}
+    assert compiled.get_feasible_disciplines({1: 1, 3: 1}, 1) == {2}
+    assert not compiled.is_completable({1: 1}, 1)
+
+
+@pytest.mark.django_db
+def test_get_feasible_disciplines_is_cached(
+    track_with_constraints, disciplines, locmem_cache, django_assert_num_queries
+):
+    """Test that the feasible disciplines are cached per covered multiset, until a constraint changes."""
+    assert track_with_constraints.get_feasible_disciplines({1: 2}, 5) == {2, 3, 4, 5, 6}
+
+    with django_assert_num_queries(0):
+        assert track_with_constraints.get_feasible_disciplines({1: 2, 7: 1}, 5) == {2, 3, 4, 5, 6}
+
+    track_with_constraints.constraints.get(min_count=5).delete()
+    assert track_with_constraints.get_feasible_disciplines({1: 2}, 5) == set()
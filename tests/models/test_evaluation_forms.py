@@ -0,0 +1,65 @@
+from unittest import mock
+
+import pytest
+
+from metis.models import Discipline, EvaluationForm
+from metis.models.stages.evaluations.forms import get_project_evaluation_forms, resolve_evaluation_form
+from metis.utils.factories import EvaluationFormFactory
+
+
+@pytest.mark.unit
+def test_resolve_evaluation_form(t_project):
+    """Test that the forms of the period are preferred, and of those the forms of the discipline."""
+    default_form = EvaluationForm.objects.get(project=t_project)
+    period = t_project.periods.first()
+    discipline = Discipline.objects.filter(education=t_project.education).first()
+    period_form = EvaluationFormFactory.create(project=t_project, period=period)
+    discipline_form = EvaluationFormFactory.create(project=t_project, period=period, discipline=discipline)
+
+    assert resolve_evaluation_form(t_project.id) == default_form
+    assert resolve_evaluation_form(t_project.id, t_project.periods.last().id) == default_form
+    assert resolve_evaluation_form(t_project.id, period.id) == period_form
+    assert resolve_evaluation_form(t_project.id, period.id, discipline.id) == discipline_form
+    assert resolve_evaluation_form(t_project.id, None, discipline.id) == discipline_form
+    assert resolve_evaluation_form(0) is None
+
+
+@pytest.mark.unit
+def test_evaluation_forms_cache(t_project, locmem_cache, django_assert_num_queries):
+    """Test that the forms of a project are cached, until a form of the project is saved or deleted."""
+    forms = get_project_evaluation_forms(t_project.id)
+
+    with django_assert_num_queries(0):
+        assert get_project_evaluation_forms(t_project.id) == forms
+
+    new_form = EvaluationFormFactory.create(project=t_project, version=2)
+    assert get_project_evaluation_forms(t_project.id) == [new_form, *forms]
+
+    new_form.delete()
+    assert get_project_evaluation_forms(t_project.id) == forms
+
+
+@pytest.mark.unit
+def test_evaluation_forms_cache_on_commit(t_project, locmem_cache, django_capture_on_commit_callbacks):
+    """Test that the forms cached by another request before the commit are invalidated when the transaction commits."""
+    forms = get_project_evaluation_forms(t_project.id)
+
+    with django_capture_on_commit_callbacks(execute=True) as callbacks:
+        new_form = EvaluationFormFactory.create(project=t_project, version=2)
+        # another request still reads the forms before the commit, and caches them under the new version
+        with mock.patch.object(EvaluationForm.objects, "filter", return_value=forms):
+            assert get_project_evaluation_forms(t_project.id) == forms
+
+    assert len(callbacks) == 1
+    assert get_project_evaluation_forms(t_project.id) == [new_form, *forms]
+
+
+@pytest.mark.unit
+def test_evaluation_form_definition_is_a_copy(t_project):
+    """Test that changing the definition of a form does not change the compiled definition shared by the process."""
+    form = EvaluationForm.objects.get(project=t_project)
+    form.definition["sections"].clear()
+
+    assert form.definition["sections"]
+    assert form.definition == form.compiled.definition
+    assert form.definition is not form.compiled.definition
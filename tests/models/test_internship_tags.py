@@ -0,0 +1,193 @@
+from datetime import timedelta
+from unittest import mock
+
+import pytest
+from django.db import transaction
+from django.utils import timezone
+
+from metis.models import Internship
+from metis.models.stages.internships import get_internship_tags
+from metis.models.stages.timesheets import get_timesheets_minutes
+from metis.tasks.cleanup import refresh_internship_tags
+from metis.utils.factories import EvaluationFactory, TimesheetFactory
+
+
+@pytest.fixture
+def internship(t_project, django_capture_on_commit_callbacks) -> Internship:
+    """Return an internship with timesheets and an evaluation, with the tags updated."""
+    internship = Internship.objects.filter(project=t_project).order_by("id").first()
+    with django_capture_on_commit_callbacks(execute=True):
+        _create_timesheets_and_evaluations(internship)
+
+    return Internship.objects.get(id=internship.id)
+
+
+def _create_timesheets_and_evaluations(internship: Internship) -> None:
+    evaluation_form = internship.evaluation_form
+
+    TimesheetFactory.create(
+        internship=internship, date=internship.start_date, start_time_am="8:00", end_time_am="12:00", is_approved=True
+    )
+    TimesheetFactory.create(
+        internship=internship,
+        date=internship.start_date + timedelta(days=1),
+        start_time_am="8:15",
+        end_time_am="12:00",
+        start_time_pm="12:45",
+        end_time_pm="17:30",
+    )
+    EvaluationFactory.create(internship=internship, form=evaluation_form, intermediate=0, is_approved=False)
+    EvaluationFactory.create(
+        internship=internship, form=evaluation_form, intermediate=0, is_self_evaluation=True, is_approved=True
+    )
+
+
+@pytest.mark.unit
+def test_internship_tags(internship, django_assert_max_num_queries):
+    """Test the tags of an internship, with one query for each type of tags."""
+    with django_assert_max_num_queries(8):
+        tags = get_internship_tags(internship)
+
+    intermediates = internship.evaluation_form.definition["intermediate_evaluations"]
+    assert 'hours.total:"12:30"' in tags
+    assert 'hours.approved:"4:00"' in tags
+    assert internship.get_total_hours() == (12, 30)
+    assert "intermediate.0:not_approved" in tags
+    assert "intermediate.0.self:approved" in tags
+    assert {f"intermediate.{i}:pending" for i in range(1, intermediates + 1)} <= set(tags)
+    assert {"files.count:0", "remarks.count:0"} <= set(tags)
+
+
+@pytest.mark.unit
+def test_internship_tags_by_type(internship):
+    """Test that only the tags of the given type are replaced."""
+    internship.tags = ["custom", 'hours.total:"0:00"']
+    tags = get_internship_tags(internship, type="hours")
+    assert sorted(tags) == ["custom", 'hours.approved:"4:00"', 'hours.total:"12:30"']
+
+
+@pytest.mark.unit
+def test_refresh_tags(t_project, internship, django_assert_max_num_queries):
+    """Test that the tags of many internships are recomputed in batches, with a few queries per batch."""
+    queryset = Internship.objects.filter(project=t_project)
+    expected = {obj.id: sorted(get_internship_tags(obj)) for obj in queryset}
+    queryset.update(tags=[])
+
+    with django_assert_max_num_queries(12):
+        assert Internship.refresh_tags(queryset, batch_size=100) == len(expected)
+    assert {obj.id: sorted(obj.tags) for obj in queryset} == expected
+
+    queryset.update(tags=[])
+    assert Internship.refresh_tags(queryset, type="hours", batch_size=7) == len(expected)
+    assert sorted(Internship.objects.get(id=internship.id).tags) == ['hours.approved:"4:00"', 'hours.total:"12:30"']
+
+
+@pytest.mark.unit
+def test_refresh_internship_tags_task(t_project, internship):
+    """Test that the task repairs the tags of the internships, except those that ended more than a month ago."""
+    queryset = Internship.objects.filter(project=t_project)
+    today = timezone.now().date()
+    queryset.update(end_date=today)
+    ended = queryset.exclude(id=internship.id).order_by("id").first()
+    Internship.objects.filter(id=ended.id).update(end_date=today - timedelta(days=31))
+    expected = {obj.id: sorted(get_internship_tags(obj)) for obj in queryset}
+    queryset.update(tags=[])
+
+    refresh_internship_tags.call_local()
+
+    assert {obj.id: sorted(obj.tags) for obj in queryset} == expected | {ended.id: []}
+    assert 'hours.total:"12:30"' in Internship.objects.get(id=internship.id).tags
+
+
+@pytest.mark.unit
+def test_sync_tags_on_commit(internship, django_capture_on_commit_callbacks):
+    """Test that the tags updates of a transaction are coalesced, and only run once when it is committed."""
+    with (
+        mock.patch.object(Internship, "get_tags_in_bulk", wraps=Internship.get_tags_in_bulk) as get_tags_in_bulk,
+        django_capture_on_commit_callbacks(execute=True) as callbacks,
+    ):
+        for day in range(2, 7):
+            TimesheetFactory.create(
+                internship=internship,
+                date=internship.start_date + timedelta(days=day),
+                start_time_am="8:00",
+                end_time_am="9:00",
+            )
+        assert get_tags_in_bulk.call_count == 0
+
+    assert len(callbacks) == 1
+    assert get_tags_in_bulk.call_count == 1
+    assert 'hours.total:"17:30"' in Internship.objects.get(id=internship.id).tags
+
+
+@pytest.mark.unit
+def test_sync_tags_after_rollback(internship, django_capture_on_commit_callbacks):
+    """Test that the tags are still updated on commit when an earlier savepoint was rolled back."""
+    with django_capture_on_commit_callbacks(execute=True) as callbacks:
+        with pytest.raises(ValueError), transaction.atomic():
+            TimesheetFactory.create(
+                internship=internship,
+                date=internship.start_date + timedelta(days=2),
+                start_time_am="8:00",
+                end_time_am="9:00",
+            )
+            raise ValueError
+
+        TimesheetFactory.create(
+            internship=internship,
+            date=internship.start_date + timedelta(days=3),
+            start_time_am="8:00",
+            end_time_am="10:00",
+        )
+
+    assert len(callbacks) == 1
+    assert 'hours.total:"14:30"' in Internship.objects.get(id=internship.id).tags
+
+
+@pytest.mark.unit
+def test_sync_tags_after_failed_update(internship, django_capture_on_commit_callbacks):
+    """Test that a failed update of the tags does not keep the next transactions from updating them."""
+    with (
+        mock.patch.object(Internship, "refresh_tags", side_effect=RuntimeError) as refresh_tags,
+        django_capture_on_commit_callbacks(execute=True),
+    ):
+        TimesheetFactory.create(
+            internship=internship,
+            date=internship.start_date + timedelta(days=2),
+            start_time_am="8:00",
+            end_time_am="9:00",
+        )
+    assert refresh_tags.call_count == 1
+
+    with django_capture_on_commit_callbacks(execute=True) as callbacks:
+        TimesheetFactory.create(
+            internship=internship,
+            date=internship.start_date + timedelta(days=3),
+            start_time_am="8:00",
+            end_time_am="10:00",
+        )
+
+    assert len(callbacks) == 1
+    assert 'hours.total:"15:30"' in Internship.objects.get(id=internship.id).tags
+
+
+@pytest.mark.unit
+def test_internship_minutes(t_project, internship, django_assert_num_queries):
+    """Test that the minutes of the timesheets are summed in the database, and saved with the hours tags."""
+    assert (internship.total_minutes, internship.approved_minutes) == (750, 240)
+    assert internship.get_total_hours(approved_only=True) == (4, 0)
+
+    minutes = get_timesheets_minutes(Internship.objects.filter(project=t_project).values("id"))
+    assert minutes == {internship.id: (750, 240)}
+
+    Internship.objects.filter(id=internship.id).update(total_minutes=0, approved_minutes=0)
+    Internship.refresh_tags(Internship.objects.filter(id=internship.id), type="evaluations")
+    internship.refresh_from_db()
+    assert internship.total_hours == (0, 0)
+
+    # one query for the batch, one for the timesheets, one bulk update for the tags and minutes, one for the next batch
+    with django_assert_num_queries(4):
+        Internship.refresh_tags(Internship.objects.filter(id=internship.id), type="hours")
+    internship.refresh_from_db()
+    assert (internship.total_minutes, internship.approved_minutes) == (750, 240)
+    assert internship.total_hours == (12, 30)
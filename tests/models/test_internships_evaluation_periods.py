@@ -1,9 +1,18 @@
-from datetime import datetime
+from datetime import date, datetime, timedelta
+from unittest import mock
 
 import pytest
 from django.utils import timezone
 
-from metis.models.stages.internships import EvaluationPeriod, get_evaluation_periods
+from metis.models import EvaluationForm, Internship
+from metis.models.stages.internships import (
+    EvaluationPeriod,
+    _get_evaluation_periods,
+    get_evaluation_periods,
+    get_internships_evaluation_periods,
+)
+from metis.tasks.evaluations import schedule_evaluation_emails
+from metis.utils.factories import EvaluationFactory, EvaluationFormFactory
 
 
 @pytest.mark.parametrize(
@@ -60,3 +69,78 @@ def test_get_evaluation_periods(start_date, end_date, intermediates, expected_pe
 
     periods = get_evaluation_periods(start_date, end_date, intermediates)
     assert periods == expected_periods
+
+
+@pytest.mark.unit
+def test_get_evaluation_periods_is_memoised():
+    """Test that the periods are computed once for the same dates, intermediates and timezone."""
+    start_date, end_date = date(2021, 3, 1), date(2021, 5, 31)
+    periods = get_evaluation_periods(start_date, end_date, 3)
+    hits = _get_evaluation_periods.cache_info().hits
+
+    assert get_evaluation_periods(start_date, end_date, 3) == periods
+    assert _get_evaluation_periods.cache_info().hits == hits + 1
+
+    with timezone.override("UTC"):
+        utc_periods = get_evaluation_periods(start_date, end_date, 3)
+    assert utc_periods[0].start_at.tzinfo != periods[0].start_at.tzinfo
+    assert utc_periods[0].start_at != periods[0].start_at
+
+
+@pytest.mark.unit
+def test_get_internships_evaluation_periods(t_project, django_assert_max_num_queries):
+    """Test the periods of many internships at once, and the internships with an open period at some moment."""
+    queryset = Internship.objects.filter(project=t_project)
+    for i, internship in enumerate(queryset.order_by("id")):
+        Internship.objects.filter(id=internship.id).update(
+            start_date=date(2024, 1, 1) + timedelta(days=i * 30), end_date=date(2024, 3, 1) + timedelta(days=i * 30)
+        )
+
+    with django_assert_max_num_queries(2):
+        internships_periods = get_internships_evaluation_periods(queryset)
+    assert internships_periods == {internship.id: internship.evaluation_periods for internship in queryset}
+
+    at = timezone.make_aware(datetime(2024, 3, 10, 12, 0))
+    open_periods = get_internships_evaluation_periods(queryset, at=at)
+    assert open_periods
+    assert open_periods == {
+        internship_id: [period for period in periods if period.start_at <= at <= period.end_at]
+        for internship_id, periods in internships_periods.items()
+        if any(period.start_at <= at <= period.end_at for period in periods)
+    }
+
+
+@pytest.mark.unit
+def test_schedule_evaluation_emails(t_project):
+    """Test that the mentors are only reminded of the open evaluation periods without an evaluation."""
+    # a Wednesday, 3 days before the deadline of the final evaluations (see `remind_deadline`)
+    now = timezone.make_aware(datetime(2024, 3, 27, 12, 0))
+    reminded, evaluated, closed = Internship.objects.filter(project=t_project).order_by("id")[:3]
+    for internship, start_date in (
+        (reminded, date(2024, 1, 1)),
+        (evaluated, date(2024, 1, 1)),
+        (closed, date(2024, 3, 25)),
+    ):
+        Internship.objects.filter(id=internship.id).update(
+            status=Internship.DEFINITIVE, start_date=start_date, end_date=date(2024, 3, 30)
+        )
+
+    # without intermediate evaluations, the final evaluation of the last internship only opens after a week
+    form = EvaluationForm.objects.get(project=t_project)
+    EvaluationFormFactory.create(
+        project=t_project,
+        period_id=closed.period_id,
+        version=form.version,
+        form_definition={**form.definition, "intermediate_evaluations": 0},
+    )
+    EvaluationFactory.create(internship=evaluated, form=form, intermediate=0, data={})
+
+    with (
+        mock.patch("metis.tasks.evaluations.timezone.now", return_value=now),
+        mock.patch("metis.tasks.evaluations.schedule_evaluation_reminder") as schedule_evaluation_reminder,
+    ):
+        schedule_evaluation_emails.call_local()
+
+    assert [(call.args[0].id, call.args[1].intermediate) for call in schedule_evaluation_reminder.call_args_list] == [
+        (reminded.id, 0)
+    ]
@@ -1,6 +1,6 @@
 import pytest
 
-from metis.models import Link
+from metis.models import Link, Remark
 from metis.utils.factories import PlaceFactory, PlaceTypeFactory
 
 
@@ -26,3 +26,15 @@ def test_institution_children(uz, place_type):
     PlaceFactory(name="Ward 1", parent=uz, type=place_type, education=place_type.education)
     PlaceFactory(name="Ward 2", parent=uz, type=place_type, education=place_type.education)
     assert uz.children.count() == 2
+
+
+@pytest.mark.django_db
+def test_place_remarks_tags(uz, django_capture_on_commit_callbacks):
+    """Test that the remarks tags of a place are updated once, when the transaction is committed."""
+    with django_capture_on_commit_callbacks(execute=True) as callbacks:
+        Remark.objects.create(content_object=uz, text="First")
+        Remark.objects.create(content_object=uz, text="Second")
+
+    assert len(callbacks) == 1
+    uz.refresh_from_db()
+    assert uz.tags == ["remarks.count:2"]
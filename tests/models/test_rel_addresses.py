@@ -0,0 +1,37 @@
+import pytest
+
+from metis.models import Address, Place
+from metis.models.rel.addresses import get_coordinates
+
+
+def _feature(latitude: float, longitude: float) -> dict:
+    return {"type": "Feature", "geometry": {"type": "Point", "coordinates": [longitude, latitude]}}
+
+
+@pytest.mark.unit
+def test_get_coordinates(t_education, locmem_cache, django_assert_num_queries):
+    """Test that the first geocoded address of each object is used, and that the coordinates are cached."""
+    first, second, third = t_education.places.order_by("id")[:3]
+    Address.objects.create(content_object=first, address="a", city="a", postcode="1", country="BE")
+    Address.objects.create(
+        content_object=first, address="b", city="b", postcode="2", country="BE", mapbox_feature=_feature(51.2, 4.4)
+    )
+    Address.objects.create(
+        content_object=first, address="c", city="c", postcode="3", country="BE", mapbox_feature=_feature(50.8, 4.3)
+    )
+    Address.objects.create(
+        content_object=second, address="d", city="d", postcode="4", country="BE", mapbox_feature={"invalid": True}
+    )
+    ids = [first.id, second.id, third.id]
+
+    assert get_coordinates(Place, ids) == {first.id: (51.2, 4.4)}
+    with django_assert_num_queries(0):
+        assert get_coordinates(Place, ids) == {first.id: (51.2, 4.4)}
+
+    Address.objects.create(
+        content_object=third, address="e", city="e", postcode="5", country="BE", mapbox_feature=_feature(51.0, 3.7)
+    )
+    assert get_coordinates(Place, ids) == {first.id: (51.2, 4.4), third.id: (51.0, 3.7)}
+
+    first.addresses.filter(address="b").delete()
+    assert get_coordinates(Place, ids) == {first.id: (50.8, 4.3), third.id: (51.0, 3.7)}
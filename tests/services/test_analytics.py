@@ -0,0 +1,144 @@
+from http import HTTPStatus as status
+from unittest import mock
+
+import pytest
+from django.urls import reverse
+
+from metis.models import Discipline, Evaluation, Internship
+from metis.services import analytics
+from metis.services.analytics import get_evaluation_aggregates, get_evaluation_cube
+from metis.utils.factories import EvaluationFactory, EvaluationFormFactory
+
+
+SCORES = [
+    {"value": None, "label": {"en": "n/a", "nl": "n.v.t."}, "points": None},
+    {"value": "low", "label": {"en": "-", "nl": "-"}, "points": 1},
+    {"value": "high", "label": {"en": "+", "nl": "+"}, "points": 3},
+]
+
+
+@pytest.fixture
+def evaluate(t_project):
+    """Return a function that creates an approved final evaluation of an internship, with the given scores."""
+    sections = [{"code": "skills", "items": [{"value": "one", "label": {"en": "1", "nl": "1"}}]}]
+    form = EvaluationFormFactory.create(
+        project=t_project, version=2, form_definition={"scores": SCORES, "sections": sections}
+    )
+
+    def create(internship: Internship, global_score: str | None, item_score: str | None):
+        data = {"global_score": global_score, "sections": {"skills": {"scores": {"one": [item_score, None, None]}}}}
+        return EvaluationFactory.create(internship=internship, form=form, data=data, is_approved=True)
+
+    return create
+
+
+@pytest.fixture
+def internships(t_project) -> list[Internship]:
+    """Return three internships of the project, the first two in the same discipline."""
+    internships = list(Internship.objects.filter(project=t_project).order_by("id")[:3])
+    disciplines = list(Discipline.objects.filter(education=t_project.education).order_by("id")[:2])
+    for internship, discipline in zip(internships, disciplines[:1] * 2 + disciplines[1:], strict=True):
+        Internship.objects.filter(id=internship.id).update(discipline=discipline)
+
+    return list(Internship.objects.filter(id__in=[internship.id for internship in internships]).order_by("id"))
+
+
+@pytest.mark.unit
+def test_evaluation_cube_is_incremental(t_project, internships, evaluate, locmem_cache):
+    """Test that the cube only processes the new evaluations, and is built again when evaluations are removed."""
+    evaluate(internships[0], "high", "low")
+    latest = evaluate(internships[1], "low", None)
+
+    cube = get_evaluation_cube(t_project)
+    assert cube.count == 2
+    assert len(cube.table) == 4
+    assert cube.table["points"].isna().sum() == 1
+
+    evaluation = evaluate(internships[2], "high", "high")
+    with mock.patch.object(analytics, "_get_scores_table", wraps=analytics._get_scores_table) as get_scores_table:
+        cube = get_evaluation_cube(t_project)
+    # only the new evaluation, and the latest one of the previous build (with the same `updated_at` as the cube)
+    assert [{row[0] for row in call.args[0]} for call in get_scores_table.call_args_list] == [
+        {latest.id, evaluation.id}
+    ]
+    assert cube.count == 3
+    assert sorted(cube.table[cube.table["item"] == "one"]["points"].dropna()) == [1, 3]
+
+    assert get_evaluation_cube(t_project).version == cube.version
+    evaluation.delete()
+    assert get_evaluation_cube(t_project).count == 2
+
+
+@pytest.mark.unit
+def test_evaluation_cube_removed_and_added(t_project, internships, evaluate, locmem_cache):
+    """Test that a removed evaluation is dropped from the cube, even if another one is added and the count is equal."""
+    removed = evaluate(internships[0], "high", "low")
+    evaluate(internships[1], "low", None)
+    cube = get_evaluation_cube(t_project)
+
+    # without signals, as for a bulk update
+    Evaluation.objects.filter(id=removed.id).update(is_approved=False)
+    added = evaluate(internships[2], "high", "high")
+    new_cube = get_evaluation_cube(t_project)
+
+    assert new_cube.count == cube.count == 2
+    assert removed.id not in set(new_cube.table["evaluation_id"])
+    assert added.id in set(new_cube.table["evaluation_id"])
+    assert new_cube.version != cube.version
+
+
+@pytest.mark.unit
+def test_evaluation_cube_invalidated_on_delete(t_project, internships, evaluate, locmem_cache):
+    """Test that the cached cube of the project is dropped when an evaluation is deleted."""
+    evaluation = evaluate(internships[0], "high", "low")
+    get_evaluation_cube(t_project)
+    assert locmem_cache.get(f"evaluation_cube_{t_project.id}") is not None
+
+    evaluation.delete()
+    assert locmem_cache.get(f"evaluation_cube_{t_project.id}") is None
+
+
+@pytest.mark.unit
+def test_evaluation_aggregates(t_project, internships, evaluate):
+    """Test the means, response counts and histograms of the scores, by discipline."""
+    evaluate(internships[0], "high", "low")
+    evaluate(internships[1], "low", None)
+    evaluate(internships[2], "high", "high")
+
+    aggregates = get_evaluation_aggregates(t_project, by="discipline")
+    first, second = internships[0].discipline_id, internships[2].discipline_id
+
+    assert aggregates == [
+        {"discipline": first, "section": "", "item": "", "count": 2, "mean": 2.0, "histogram": {"high": 1, "low": 1}},
+        {
+            "discipline": first,
+            "section": "skills",
+            "item": "one",
+            "count": 2,
+            "mean": 1.0,
+            "histogram": {"low": 1, None: 1},
+        },
+        {"discipline": second, "section": "", "item": "", "count": 1, "mean": 3.0, "histogram": {"high": 1}},
+        {"discipline": second, "section": "skills", "item": "one", "count": 1, "mean": 3.0, "histogram": {"high": 1}},
+    ]
+    assert get_evaluation_aggregates(t_project, by="mentor", intermediate=1) == []
+
+    with pytest.raises(ValueError):
+        get_evaluation_aggregates(t_project, by="student")
+
+
+@pytest.mark.api
+def test_evaluation_analytics_action(api_client, t_office_member, t_random_user, t_project, internships, evaluate):
+    """Test that the office members can get the evaluation aggregates of a project."""
+    evaluate(internships[0], "high", "low")
+    url = reverse("v1:project-evaluation-analytics", args=[t_project.education_id, t_project.id])
+
+    api_client.force_authenticate(user=t_random_user)
+    assert api_client.get(url).status_code == status.FORBIDDEN
+
+    api_client.force_authenticate(user=t_office_member)
+    response = api_client.get(url, {"by": "discipline"})
+    assert response.status_code == status.OK
+    assert [aggregate["count"] for aggregate in response.data] == [1, 1]
+
+    assert api_client.get(url, {"by": "student"}).status_code == status.BAD_REQUEST
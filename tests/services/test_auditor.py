@@ -0,0 +1,100 @@
+import json
+from datetime import date
+from http import HTTPStatus as status
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+
+from metis.models import Discipline, DisciplineConstraint, Internship, Track
+from metis.services.auditor import audit_discipline_constraints
+from metis.utils.factories import InternshipFactory
+
+
+@pytest.fixture
+def track_internships(t_project) -> list[Internship]:
+    """Return two internships of a student in the first two periods of a track, both in the same discipline."""
+    track = Track.objects.get(program__education=t_project.education, name="Track A")
+    periods = {period.program_internship_id: period for period in t_project.periods.all()}
+    discipline = Discipline.objects.get(name="Klinisch")
+    internships = list(Internship.objects.filter(project=t_project, student_id=1).order_by("id"))
+
+    for i, (internship, program_internship) in enumerate(
+        zip(internships, track.program_internships.all(), strict=False)
+    ):
+        Internship.objects.filter(id=internship.id).update(
+            track=track, period=periods[program_internship.id], discipline=discipline, start_date=date(2024, 1 + i, 1)
+        )
+
+    return list(Internship.objects.filter(id__in=[internship.id for internship in internships]).order_by("id"))
+
+
+def _audit(project) -> list[tuple[int | None, str]]:
+    return [(violation.internship_id, violation.code) for violation in audit_discipline_constraints(project)]
+
+
+@pytest.mark.unit
+def test_audit_discipline_constraints(t_project, track_internships, django_assert_max_num_queries):
+    """Test that a valid sequence of disciplines has no violations, in a constant number of queries."""
+    with django_assert_max_num_queries(8):
+        assert _audit(t_project) == []
+
+
+@pytest.mark.unit
+def test_audit_max_repeat(t_project, track_internships):
+    """Test that a discipline repeated more than the max_repeat of the track is reported at the internship."""
+    internship = track_internships[0]
+    period = t_project.periods.get(program_internship=internship.track.program_internships.all()[2])
+    extra = InternshipFactory.create(
+        project=t_project,
+        student=internship.student,
+        track=internship.track,
+        period=period,
+        discipline=internship.discipline,
+        start_date=date(2024, 6, 1),
+    )
+
+    assert _audit(t_project) == [(extra.id, "max_repeat")]
+
+
+@pytest.mark.unit
+def test_audit_not_in_track_and_min_count(t_project, track_internships):
+    """Test that internships outside the track, and min counts that can no longer be met, are reported."""
+    internship = track_internships[1]
+    period = t_project.periods.exclude(program_internship__tracks__track=internship.track).first()
+    Internship.objects.filter(id=internship.id).update(period=period)
+    assert (internship.id, "not_in_track") in _audit(t_project)
+    assert (None, "min_count") not in _audit(t_project)
+
+    constraint = DisciplineConstraint.objects.create(
+        content_object=internship.track, min_count=3, max_count=None, max_repeat=2
+    )
+    constraint.disciplines.set(Discipline.objects.filter(name="Prothetisch"))
+    assert (None, "min_count") in _audit(t_project)
+
+
+@pytest.mark.unit
+def test_audit_constraints_command(t_project, track_internships):
+    """Test the management command, with the JSON output."""
+    Internship.objects.filter(id=track_internships[1].id).update(period=None)
+    out = StringIO()
+    call_command("audit_constraints", t_project.id, "--json", stdout=out)
+
+    violations = json.loads(out.getvalue())
+    assert [violation["code"] for violation in violations] == ["not_in_track"]
+    assert violations[0]["track"] == "Track A"
+
+
+@pytest.mark.api
+def test_constraint_audit_action(api_client, t_office_member, t_random_user, t_project, track_internships):
+    """Test that the office members can get the audit of a project."""
+    url = reverse("v1:project-constraint-audit", args=[t_project.education_id, t_project.id])
+
+    api_client.force_authenticate(user=t_random_user)
+    assert api_client.get(url).status_code == status.FORBIDDEN
+
+    api_client.force_authenticate(user=t_office_member)
+    response = api_client.get(url)
+    assert response.status_code == status.OK
+    assert response.data == []
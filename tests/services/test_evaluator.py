@@ -0,0 +1,65 @@
+from random import Random
+
+import pytest
+
+from metis.models import Education, Internship
+from metis.services.evaluator import evaluate_internships, get_evaluator
+from metis.utils.factories import EvaluationFactory, EvaluationFormFactory
+
+
+SCORES = [
+    {"value": None, "label": {"en": "n/a", "nl": "n.v.t."}, "points": None},
+    {"value": "insufficient", "label": {"en": "-", "nl": "-"}, "points": 0},
+    {"value": "sufficient", "label": {"en": "+/-", "nl": "+/-"}, "points": 1.5},
+    {"value": "good", "label": {"en": "+", "nl": "+"}, "points": 3},
+    {"value": "excellent", "label": {"en": "++", "nl": "++"}, "points": 4},
+]
+
+
+def _create_evaluations(project, strategy: str) -> list[Internship]:
+    """Create a form with the given strategy, and random approved final evaluations for the internships."""
+    randomizer = Random(strategy)
+    sections = [
+        {"code": f"section{i}", "items": [{"value": f"item{j}", "label": {"en": "-", "nl": "-"}} for j in range(i)]}
+        for i in range(1, 5)
+    ]
+    form = EvaluationFormFactory.create(
+        project=project,
+        version=2,
+        form_definition={"scores": SCORES, "sections": sections, "final_score_strategy": strategy},
+    )
+    internships = list(Internship.objects.filter(project=project).order_by("id"))
+
+    for internship in internships[:-1]:
+        data = {
+            "global_score": randomizer.choice(SCORES)["value"],
+            "global_remarks": "",
+            "sections": {
+                section["code"]: {
+                    "scores": {
+                        item["value"]: [randomizer.choice(SCORES[1:] * 3 + SCORES[:1])["value"], None, None]
+                        for item in section["items"]
+                    },
+                }
+                for section in sections
+            },
+        }
+        EvaluationFactory.create(internship=internship, form=form, data=data, is_approved=True)
+
+    return internships
+
+
+@pytest.mark.parametrize("strategy", ["average_items", "average_sections_first"])
+@pytest.mark.parametrize("education_code", ["audio", "gezbev"])
+@pytest.mark.unit
+def test_evaluate_internships(t_project, strategy, education_code, django_assert_max_num_queries):
+    """Test that the batch evaluator gives exactly the scores of the evaluator of each internship, in two queries."""
+    Education.objects.filter(id=t_project.education_id).update(code=education_code)
+    internships = _create_evaluations(t_project, strategy)
+
+    with django_assert_max_num_queries(2):
+        scores = evaluate_internships(Internship.objects.filter(project=t_project))
+
+    assert internships[-1].id not in scores
+    assert scores == {internship.id: get_evaluator(internship).evaluate() for internship in internships[:-1]}
+    assert any(score is not None for score in scores.values())
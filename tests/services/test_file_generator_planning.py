@@ -0,0 +1,36 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from metis.services.file_generator.planner.planning import PlanningExcel
+
+
+def _count_queries(questioning) -> int:
+    with CaptureQueriesContext(connection) as context:
+        PlanningExcel(questioning, options={"solver": "sparse"}).get_content()
+    return len(context.captured_queries)
+
+
+@pytest.mark.unit
+def test_planning_excel(t_tops_questioning):
+    """Test that every student with tops is planned, with real names and the place distribution."""
+    excel = PlanningExcel(t_tops_questioning)
+
+    assert len(excel.planning) == t_tops_questioning.responses.count()
+    assert [student.reverse_name for student, _, _, _ in excel.planning] == sorted(
+        student.reverse_name for student, _, _, _ in excel.planning
+    )
+    assert sum(num_students for _, num_students, _ in excel.list_of_places) == len(excel.planning)
+    assert sum(excel.ranks.values()) == len(excel.planning)
+
+
+@pytest.mark.unit
+def test_planning_excel_query_count_is_constant(t_tops_questioning):
+    """Test that the number of queries of a planning file does not depend on the number of students."""
+    num_queries = _count_queries(t_tops_questioning)
+
+    responses = list(t_tops_questioning.responses.order_by("id"))
+    assert len(responses) > 2
+    t_tops_questioning.responses.exclude(id__in=[response.id for response in responses[:2]]).delete()
+
+    assert _count_queries(t_tops_questioning) == num_queries
@@ -0,0 +1,52 @@
+from collections import Counter
+
+import pytest
+
+from metis.models import ProjectPlaceAvailability, Track
+from metis.services.file_generator.planner.track_planning import (
+    TrackPlanningExcel,
+    get_track_planning_inputs_fingerprint,
+)
+
+
+@pytest.fixture
+def t_track(t_tops_questioning) -> Track:
+    """Return the track of the period of the tops questioning, with all the students of the project in it."""
+    track = t_tops_questioning.period.program_internship.tracks.first().track
+    t_tops_questioning.project.students.update(track=track)
+    return track
+
+
+@pytest.mark.unit
+def test_track_planning_excel(t_tops_questioning, t_track):
+    """Test that every student with tops is planned, in places without disciplines, with a discipline of the period."""
+    excel = TrackPlanningExcel(t_tops_questioning.project, t_track)
+    period_disciplines = set(t_tops_questioning.period.program_internship.get_available_disciplines())
+
+    assert len(excel.planning) == t_tops_questioning.responses.count()
+    assert {period for _, period, _, _, _ in excel.planning} == {t_tops_questioning.period}
+    assert {discipline for _, _, _, discipline, _ in excel.planning} <= period_disciplines
+    assert all(count <= 4 for count in Counter(place for _, _, place, _, _ in excel.planning).values())
+
+    df = excel.get_planning_sheet().df
+    assert len(df) == len(excel.planning)
+    assert "-" not in set(df["discipline"])
+
+
+@pytest.mark.unit
+def test_track_planning_inputs_fingerprint(t_tops_questioning, t_track):
+    """Test that the fingerprint of the inputs of a track planning changes when a response or availability changes."""
+    project = t_tops_questioning.project
+    fingerprint = get_track_planning_inputs_fingerprint(project, t_track)
+    assert get_track_planning_inputs_fingerprint(project, t_track) == fingerprint
+
+    response = t_tops_questioning.responses.first()
+    response.data = {"tops": list(reversed(response.data["tops"]))}
+    response.save()
+    new_fingerprint = get_track_planning_inputs_fingerprint(project, t_track)
+    assert new_fingerprint != fingerprint
+
+    availability = ProjectPlaceAvailability.objects.filter(period=t_tops_questioning.period).first()
+    availability.max += 1
+    availability.save()
+    assert get_track_planning_inputs_fingerprint(project, t_track) != new_fingerprint
@@ -55,3 +55,11 @@ def test_file_guard_student(file_for_student, t_office_member, place_contact, st
     assert check_file_access(file_for_student, t_office_member) is True
     assert check_file_access(file_for_student, place_contact.user) is False
     assert check_file_access(file_for_student, student.user) is True
+
+
+@pytest.mark.unit
+def test_file_guard_questioning(t_tops_questioning, t_office_member, t_random_user, student):  # noqa: D103
+    file = FileFactory(content_object=t_tops_questioning, tags=["_visible:student"])
+    assert check_file_access(file, t_office_member) is True
+    assert check_file_access(file, t_random_user) is False
+    assert check_file_access(file, student.user) is False
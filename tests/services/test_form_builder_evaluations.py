@@ -1,6 +1,8 @@
 import pytest
 
+from metis.services.form_builder import evaluations
 from metis.services.form_builder.evaluations import (
+    compile_evaluation_form,
     validate_evaluation_form_definition,
     validate_evaluation_form_response,
 )
@@ -221,3 +223,36 @@ def test_response_with_remarks_is_invalid(form_definition_with_section_remarks,
 def test_response_with_remarks_is_valid(form_definition_with_section_remarks, data):
     """Test that a valid form response doesn't raise an exception (with section remarks)."""
     validate_evaluation_form_response(form_definition_with_section_remarks, data)
+
+
+@pytest.mark.unit
+def test_compile_evaluation_form(form_definition):
+    """Test that a definition is compiled once, to its score points and item index arrays."""
+    form_definition["sections"].append(
+        {"code": "two", "items": [{"value": "1", "label": {"en": "Item 1", "nl": "Item 1"}}]}
+    )
+    compiled = compile_evaluation_form(form_definition)
+
+    assert compiled.points == {None: None, "one": 1, "two": 2, "three": 3}
+    assert compiled.max_points == 3
+    assert compiled.sections == ("one", "two")
+    assert compiled.items == (("one", "1"), ("one", "2"), ("one", "3"), ("two", "1"))
+    assert compiled.item_sections == (0, 0, 0, 1)
+    assert compiled.definition == validate_evaluation_form_definition(form_definition).model_dump()
+
+    # an equal definition, with its keys in another order, is the same compiled form
+    assert compile_evaluation_form(dict(reversed(form_definition.items()))) is compiled
+
+
+@pytest.mark.unit
+def test_compile_evaluation_form_is_bounded(form_definition, monkeypatch):
+    """Test that the least recently used compiled forms are dropped when the cache is full."""
+    monkeypatch.setattr(evaluations, "COMPILED_EVALUATION_FORMS_SIZE", 2)
+    definitions = [{**form_definition, "intermediate_evaluations": i} for i in range(3)]
+
+    first, second = compile_evaluation_form(definitions[0]), compile_evaluation_form(definitions[1])
+    assert compile_evaluation_form(definitions[0]) is first
+    compile_evaluation_form(definitions[2])
+
+    assert compile_evaluation_form(definitions[0]) is first
+    assert compile_evaluation_form(definitions[1]) is not second
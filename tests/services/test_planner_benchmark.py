@@ -0,0 +1,131 @@
+import json
+import os
+import tracemalloc
+from collections.abc import Callable
+from contextlib import nullcontext
+from functools import partial
+from time import perf_counter
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from metis.services.file_generator.planner.planning import PlanningExcel
+from metis.services.planner.flow import min_cost_flow_optimizer
+from metis.services.planner.hungarian import hungarian_optimizer
+from metis.services.planner.utils import find_students_for_places, get_tops_index
+from metis.utils.fixtures.planning import create_planning_cohort, synthetic_cohort
+
+
+# the results are written as JSON to this file (if set), to compare them between releases
+BENCHMARK_OUTPUT = os.environ.get("METIS_BENCHMARK_OUTPUT")
+
+COHORT_SIZES = [(100, 30), (500, 150), (2000, 600)]  # students, places
+EXCEL_COHORT_SIZES = [(50, 15), (200, 60)]
+
+
+def _measure(func: Callable[[], object], *, count_queries: bool = False) -> dict:
+    """Run a function once, and measure its wall time (in seconds), peak memory (in bytes) and number of queries."""
+    context = CaptureQueriesContext(connection) if count_queries else nullcontext()
+
+    with context:
+        tracemalloc.start()
+        try:
+            start = perf_counter()
+            func()
+            wall_time = perf_counter() - start
+            _, peak_memory = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    queries = len(context.captured_queries) if count_queries else 0
+    return {"wall_time": round(wall_time, 4), "peak_memory": peak_memory, "queries": queries}
+
+
+@pytest.fixture(scope="module")
+def benchmark_results():
+    """Collect the benchmark results of the module, and write them as JSON at the end (see `BENCHMARK_OUTPUT`)."""
+    results = []
+    yield results
+
+    if BENCHMARK_OUTPUT:
+        with open(BENCHMARK_OUTPUT, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+@pytest.mark.parametrize("num_students, num_places", COHORT_SIZES)
+@pytest.mark.parametrize("solver", ["dense", "sparse"])
+@pytest.mark.benchmark
+def test_benchmark_hungarian_optimizer(benchmark_results, solver, num_students, num_places):
+    """Benchmark the hungarian optimizer on synthetic cohorts, with 5% triage students."""
+    student_tops, availability = synthetic_cohort(num_students, num_places, triage=0.05, seed=num_students)
+    student_tops = [(student_id, tops) for student_id, tops in student_tops if tops is not None]
+    planning = []
+
+    def run():
+        planning.extend(hungarian_optimizer(list(student_tops), dict(availability), None, 42, solver=solver))
+
+    result = _measure(run)
+    benchmark_results.append(
+        {"target": f"hungarian_optimizer[{solver}]", "students": num_students, "places": num_places, **result}
+    )
+    assert len({student_id for student_id, _, _, _ in planning}) == len(planning) <= len(student_tops), result
+
+
+@pytest.mark.parametrize("num_students, num_places", COHORT_SIZES)
+@pytest.mark.benchmark
+def test_benchmark_min_cost_flow_optimizer(benchmark_results, num_students, num_places):
+    """Benchmark the min-cost-flow optimizer against the (sparse) hungarian optimizer, on the same cohorts."""
+    student_tops, availability = synthetic_cohort(num_students, num_places, triage=0.05, seed=num_students)
+    student_tops = [(student_id, tops) for student_id, tops in student_tops if tops is not None]
+    plannings = {}
+
+    def run(optimizer: Callable, name: str) -> None:
+        plannings[name] = optimizer(list(student_tops), dict(availability), None, 42)
+
+    for name, optimizer in [
+        ("hungarian_optimizer[sparse]", partial(hungarian_optimizer, solver="sparse")),
+        ("min_cost_flow_optimizer", min_cost_flow_optimizer),
+    ]:
+        result = _measure(partial(run, optimizer, name))
+        benchmark_results.append({"target": name, "students": num_students, "places": num_places, **result})
+
+    # both are optimal, so they have the same ranks (a sum of exp(rank) only has one decomposition)
+    assert sorted(rank for *_, rank, _ in plannings["min_cost_flow_optimizer"]) == sorted(
+        rank for *_, rank, _ in plannings["hungarian_optimizer[sparse]"]
+    ), benchmark_results[-2:]
+
+
+@pytest.mark.parametrize("num_students, num_places", COHORT_SIZES)
+@pytest.mark.benchmark
+def test_benchmark_find_students_for_places(benchmark_results, num_students, num_places):
+    """Benchmark the search of the top students of every place, with a shared index of the tops."""
+    student_tops, _ = synthetic_cohort(num_students, num_places, triage=0.05, seed=num_students)
+    project_place_ids = list(range(1, num_places + 1))
+    found = {}
+
+    def run():
+        found.update(find_students_for_places(student_tops, project_place_ids, tops_index=get_tops_index(student_tops)))
+
+    result = _measure(run)
+    benchmark_results.append(
+        {"target": "find_students_for_places", "students": num_students, "places": num_places, **result}
+    )
+    assert found.keys() <= set(project_place_ids), result
+
+
+@pytest.mark.parametrize("num_students, num_places", EXCEL_COHORT_SIZES)
+@pytest.mark.benchmark
+def test_benchmark_planning_excel(benchmark_results, t_project, num_students, num_places):
+    """Benchmark the full planning file, from the database to the xlsx content."""
+    questioning = create_planning_cohort(
+        t_project.periods.first(), num_students, num_places, triage=0.05, seed=num_students
+    )
+    content = []
+
+    def run():
+        content.append(PlanningExcel(questioning, options={"solver": "sparse"}).get_content())
+
+    result = _measure(run, count_queries=True)
+    benchmark_results.append({"target": "PlanningExcel", "students": num_students, "places": num_places, **result})
+    assert content[0], result
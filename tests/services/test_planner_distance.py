@@ -0,0 +1,145 @@
+import numpy as np
+import pytest
+
+from metis.models import Address, ProjectPlace, Student
+from metis.services.file_generator.planner.planning import (
+    PlanningExcelOptions,
+    get_distance_term,
+    load_planning_inputs,
+)
+from metis.services.planner.distance import DistanceTerm, apply_distance_term, get_edge_distances, haversine
+from metis.services.planner.flow import min_cost_flow_optimizer
+from metis.services.planner.hungarian import hungarian_optimizer
+
+
+BRUSSELS = (50.8467, 4.3525)
+ANTWERP = (51.2194, 4.4025)
+GHENT = (51.0543, 3.7174)
+
+
+@pytest.mark.unit
+def test_haversine():
+    """Test the haversine distance, element-wise and as a matrix."""
+    assert haversine(*BRUSSELS, *ANTWERP) == pytest.approx(41.7, abs=0.5)
+    assert haversine(*BRUSSELS, *BRUSSELS) == 0
+
+    latitudes, longitudes = np.array([BRUSSELS, ANTWERP, GHENT]).T
+    matrix = haversine(latitudes[:, None], longitudes[:, None], latitudes, longitudes)
+    assert matrix.shape == (3, 3)
+    np.testing.assert_allclose(matrix, matrix.T)
+    np.testing.assert_allclose(np.diag(matrix), 0)
+
+
+@pytest.mark.unit
+def test_edge_distances_with_unknown_coordinates():
+    """Test that edges with unknown coordinates have no distance."""
+    distance = DistanceTerm(student_coordinates={1: BRUSSELS}, place_coordinates={10: ANTWERP, 20: GHENT})
+    distances = get_edge_distances(distance, np.array([1, 1, 2]), np.array([10, 30, 10]))
+
+    assert distances[0] == pytest.approx(41.7, abs=0.5)
+    assert np.isnan(distances[1:]).all()
+
+
+@pytest.mark.unit
+def test_apply_distance_term():
+    """Test the distance cost and the pruning, with a max distance for all students and per student."""
+    student_ids = np.array([1, 1, 2, 2, 3])
+    project_place_ids = np.array([10, 20, 10, 20, 10])
+    costs = np.ones(5)
+    coordinates = {1: BRUSSELS, 2: BRUSSELS}
+    places = {10: ANTWERP, 20: BRUSSELS}
+
+    keep, new_costs = apply_distance_term(
+        DistanceTerm(coordinates, places, weight=0.1), student_ids, project_place_ids, costs
+    )
+    assert keep.all()
+    np.testing.assert_allclose(new_costs, [1 + 4.17, 1, 1 + 4.17, 1, 1], atol=0.05)
+
+    keep, _ = apply_distance_term(
+        DistanceTerm(coordinates, places, max_distance=10), student_ids, project_place_ids, costs
+    )
+    assert keep.tolist() == [False, True, False, True, True]
+
+    keep, _ = apply_distance_term(
+        DistanceTerm(coordinates, places, max_distance={1: 10}), student_ids, project_place_ids, costs
+    )
+    assert keep.tolist() == [False, True, True, True, True]
+
+
+@pytest.mark.parametrize("solver", ["dense", "sparse"])
+@pytest.mark.unit
+def test_hungarian_optimizer_with_distance(solver):
+    """Test that a big enough distance weight swaps the places of two students."""
+    student_tops = [(1, [10, 20]), (2, [20, 10])]
+    availability = {10: 1, 20: 1}
+    distance = DistanceTerm(
+        student_coordinates={1: GHENT, 2: ANTWERP}, place_coordinates={10: ANTWERP, 20: GHENT}, weight=0.1
+    )
+
+    result = hungarian_optimizer(list(student_tops), dict(availability), solver=solver)
+    assert sorted(result) == [(1, 10, 1, False), (2, 20, 1, False)]
+
+    result = hungarian_optimizer(list(student_tops), dict(availability), solver=solver, distance=distance)
+    assert sorted(result) == [(1, 20, 2, False), (2, 10, 2, False)]
+
+
+@pytest.mark.parametrize("solver", ["dense", "sparse"])
+@pytest.mark.unit
+def test_optimizers_with_max_distance(solver):
+    """Test that edges beyond the max distance are pruned before solving."""
+    student_tops = [(1, [10, 20]), (2, [10, 20])]
+    availability = {10: 2, 20: 2}
+    distance = DistanceTerm(
+        student_coordinates={1: BRUSSELS, 2: BRUSSELS}, place_coordinates={10: ANTWERP, 20: BRUSSELS}, max_distance=20
+    )
+
+    result = hungarian_optimizer(list(student_tops), dict(availability), solver=solver, distance=distance)
+    assert sorted(result) == [(1, 20, 2, False), (2, 20, 2, False)]
+
+    result = min_cost_flow_optimizer(student_tops, availability, distance=distance)
+    assert sorted(result) == [(1, 20, 2, False), (2, 20, 2, False)]
+
+    distance = distance._replace(max_distance=1)
+    assert hungarian_optimizer(list(student_tops), {10: 2}, solver=solver, distance=distance) == []
+    assert min_cost_flow_optimizer(student_tops, {10: 2}, distance=distance) == []
+
+
+@pytest.mark.parametrize("solver", ["dense", "sparse"])
+@pytest.mark.unit
+def test_hungarian_optimizer_with_unreachable_student(solver):
+    """Test that a student whose tops are all beyond the max distance is left unplanned, instead of failing."""
+    distance = DistanceTerm(
+        student_coordinates={1: BRUSSELS, 2: BRUSSELS}, place_coordinates={10: ANTWERP, 20: BRUSSELS}, max_distance=20
+    )
+
+    result = hungarian_optimizer([(1, [10]), (2, [10, 20])], {10: 1, 20: 1}, solver=solver, distance=distance)
+    assert result == [(2, 20, 2, False)]
+
+
+@pytest.mark.unit
+def test_get_distance_term(t_tops_questioning):
+    """Test that the distance term has the coordinates of the students and project places with a geocoded address."""
+    student_id, tops = next(iter(load_planning_inputs(t_tops_questioning).student_tops))
+    student = Student.objects.get(id=student_id)
+    project_place = ProjectPlace.objects.get(id=tops[0])
+    for content_object, (latitude, longitude) in ((student.user, BRUSSELS), (project_place.place, ANTWERP)):
+        Address.objects.create(
+            content_object=content_object,
+            address="-",
+            city="-",
+            postcode="-",
+            country="BE",
+            mapbox_feature={"geometry": {"type": "Point", "coordinates": [longitude, latitude]}},
+        )
+    student_tops = [(student_id, tops)]
+    availability = dict.fromkeys(tops, 1)
+
+    assert get_distance_term(PlanningExcelOptions(), student_tops, availability) is None
+
+    distance = get_distance_term(PlanningExcelOptions(max_distance=50), student_tops, availability)
+    assert distance == DistanceTerm(
+        student_coordinates={student_id: BRUSSELS},
+        place_coordinates={project_place.id: ANTWERP},
+        weight=0.0,
+        max_distance=50,
+    )
@@ -0,0 +1,101 @@
+import pytest
+
+from metis.services.planner.flow import min_cost_flow_optimizer
+from metis.services.planner.hungarian import hungarian_optimizer
+from metis.utils.fixtures.planning import synthetic_cohort
+
+
+@pytest.mark.parametrize(
+    "student_tops, project_place_availability, expected",
+    [
+        (
+            [(1, [1, 2, 3]), (2, [2, 3, 1]), (3, [3, 1, 2])],
+            {1: 1, 2: 1, 3: 1},
+            [(1, 1, 1, False), (2, 2, 1, False), (3, 3, 1, False)],
+        ),
+        ([(1, [1, 2, 3]), (2, [2, 3, 1]), (3, [3, 1, 2])], {1: 0, 2: 0, 3: 0}, []),
+        ([], {1: 1, 2: 1, 3: 1}, []),
+        ([(1, [1, 2, 3]), (2, [2, 3, 1]), (3, [3, 1, 2])], {}, []),
+        ([(1, None), (2, [2, 3, 1]), (3, [3, 1, 2])], {1: 1, 2: 1, 3: 1}, [(2, 2, 1, False), (3, 3, 1, False)]),
+        # more availability than students
+        (
+            [(1, [1, 2, 3]), (2, [2, 3, 1]), (3, [3, 1, 2])],
+            {1: 2, 2: 2, 3: 2},
+            [(1, 1, 1, False), (2, 2, 1, False), (3, 3, 1, False)],
+        ),
+        # less availability than students > one student is left without a project
+        (
+            [(1, [1, 2, 3]), (2, [2, 3, 1]), (3, [3, 1, 2])],
+            {1: 1, 2: 1},
+            [(1, 1, 1, False), (2, 2, 1, False)],
+        ),
+    ],
+)
+@pytest.mark.unit
+def test_min_cost_flow_optimizer(student_tops, project_place_availability, expected):
+    """Test the min_cost_flow_optimizer function."""
+    result = min_cost_flow_optimizer(student_tops, project_place_availability)
+    assert result == expected
+
+
+@pytest.mark.parametrize(
+    "student_tops, project_place_availability, expected_ranks",
+    [
+        # all students have the same preferences
+        ([(1, [1, 2, 3]), (2, [1, 2, 3]), (3, [1, 2, 3])], {1: 1, 2: 1, 3: 1}, [1, 2, 3]),
+        # capacity is modelled natively
+        ([(1, [1, 2]), (2, [1, 2]), (3, [1, 2])], {1: 2, 2: 2}, [1, 1, 2]),
+    ],
+)
+@pytest.mark.unit
+def test_min_cost_flow_optimizer_ties(student_tops, project_place_availability, expected_ranks):
+    """Test the min_cost_flow_optimizer function when several plannings are optimal."""
+    result = min_cost_flow_optimizer(student_tops, project_place_availability)
+    assert sorted(rank for _, _, rank, _ in result) == expected_ranks
+    assert len({student_id for student_id, _, _, _ in result}) == len(student_tops)
+
+
+@pytest.mark.unit
+def test_min_cost_flow_optimizer_with_preassigned_pairs():
+    """Test the min_cost_flow_optimizer function with preassigned pairs."""
+    student_tops = [(1, [1, 2, 3]), (2, [2, 3, 1]), (3, [3, 1, 2])]
+    result = min_cost_flow_optimizer(student_tops, {1: 1, 2: 1, 3: 1}, [(1, 2)])
+    assert result == [(2, 3, 2, False), (3, 1, 2, False), (1, 2, 2, True)]
+
+
+@pytest.mark.parametrize(
+    "project_place_minimum, expected",
+    [
+        ({}, [(1, 1, 1, False), (2, 1, 1, False), (3, 1, 1, False)]),
+        ({2: 1}, [(1, 1, 1, False), (2, 1, 1, False), (3, 2, 2, False)]),
+        ({2: 2}, [(1, 2, 2, False), (2, 1, 1, False), (3, 2, 2, False)]),
+        ({3: 2}, [(1, 1, 1, False), (2, 3, 2, False), (3, 3, 3, False)]),
+        # the minimum can only be filled with students that chose the place
+        ({3: 3}, [(1, 1, 1, False), (2, 3, 2, False), (3, 3, 3, False)]),
+    ],
+)
+@pytest.mark.unit
+def test_min_cost_flow_optimizer_with_minimum(project_place_minimum, expected):
+    """Test that places with a minimum get filled, even if that means worse ranks for other students."""
+    student_tops = [(1, [1, 2]), (2, [1, 3]), (3, [1, 2, 3])]
+    result = min_cost_flow_optimizer(student_tops, {1: 3, 2: 3, 3: 3}, project_place_minimum=project_place_minimum)
+    assert sorted(result) == expected
+
+
+@pytest.mark.unit
+def test_min_cost_flow_optimizer_minimum_counts_preassigned_pairs():
+    """Test that preassigned students count towards the minimum of a place."""
+    student_tops = [(1, [1, 2]), (2, [1, 2]), (3, [1, 2])]
+    result = min_cost_flow_optimizer(student_tops, {1: 3, 2: 3}, [(1, 2)], project_place_minimum={2: 1})
+    assert sorted(result) == [(1, 2, 2, True), (2, 1, 1, False), (3, 1, 1, False)]
+
+
+@pytest.mark.parametrize("num_students, num_places", [(50, 20), (300, 40)])
+@pytest.mark.unit
+def test_min_cost_flow_optimizer_matches_hungarian(num_students, num_places):
+    """Test that the flow planning has the same ranks as the hungarian planning, when there are no minimums."""
+    student_tops, availability = synthetic_cohort(num_students, num_places, seed=num_students)
+
+    hungarian = hungarian_optimizer(list(student_tops), dict(availability), None, 3, solver="dense")
+    flow = min_cost_flow_optimizer(student_tops, availability, None, 3)
+    assert sorted(rank for _, _, rank, _ in flow) == sorted(rank for _, _, rank, _ in hungarian)
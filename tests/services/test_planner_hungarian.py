@@ -1,6 +1,13 @@
+from random import Random
+from time import perf_counter
+
+import numpy as np
 import pytest
+from scipy.optimize import linear_sum_assignment
 
 from metis.services.planner.hungarian import hungarian_optimizer
+from metis.services.planner.utils import get_tops_index
+from metis.utils.fixtures.planning import synthetic_cohort
 
 
 @pytest.mark.parametrize(
@@ -77,3 +84,138 @@ def test_hungarian_optimizer_with_preassigned_pairs(
     """Test the hungarian_optimizer function with preassigned pairs."""
     result = hungarian_optimizer(student_tops, project_place_availability, preassigned_pairs)
     assert result == expected
+
+
+def _legacy_hungarian_optimizer(student_tops, project_place_availability, preassigned_pairs=None, seed=None):
+    """Loop-based cost matrix construction, as it was before the vectorized fill. Used as a reference."""
+    if seed:
+        Random(seed).shuffle(student_tops)
+
+    student_ids = [student_id for student_id, choices in student_tops if choices is not None]
+
+    if preassigned_pairs is not None:
+        for student_id, project_place_id in preassigned_pairs:
+            student_ids.remove(student_id)
+            project_place_availability[project_place_id] -= 1
+            if project_place_availability[project_place_id] <= 0:
+                del project_place_availability[project_place_id]
+
+    project_place_ids = [
+        project_place_id
+        for project_place_id, availability in project_place_availability.items()
+        for _ in range(availability)
+    ]
+    cost_matrix = np.full((len(student_ids), len(project_place_ids)), np.inf)
+    rank_matrix = np.full((len(student_ids), len(project_place_ids)), np.inf)
+
+    for student_id, choices in student_tops:
+        if choices is None or student_id not in student_ids:
+            continue
+        for rank, project_place_id in enumerate(choices):
+            if project_place_id not in project_place_availability:
+                continue
+            i = student_ids.index(student_id)
+            for j in range(project_place_availability[project_place_id]):
+                k = project_place_ids.index(project_place_id) + j
+                cost_matrix[i][k] = np.exp(rank)
+                rank_matrix[i][k] = rank
+
+    row_idx, col_idx = linear_sum_assignment(cost_matrix)
+    pairs = [
+        (int(student_ids[i]), int(project_place_ids[j]), int(rank_matrix[i][j]) + 1, False)
+        for i, j in zip(row_idx, col_idx, strict=True)
+    ]
+
+    if preassigned_pairs is not None:
+        ranks = {
+            (student_id, project_place_id): rank + 1
+            for student_id, choices in student_tops
+            if choices is not None
+            for rank, project_place_id in enumerate(choices)
+        }
+        pairs += [(i, j, ranks[(i, j)], True) for i, j in preassigned_pairs]
+
+    return pairs
+
+
+@pytest.mark.parametrize("seed", [None, 1, 1234567890])
+@pytest.mark.unit
+def test_hungarian_optimizer_matches_reference(seed):
+    """Test that the vectorized cost matrix yields the same planning as the loop-based construction."""
+    student_tops, availability = synthetic_cohort(300, 90, seed=7)
+    preassigned_pairs = [(student_id, choices[0]) for student_id, choices in student_tops[:5]]
+
+    expected = _legacy_hungarian_optimizer(list(student_tops), dict(availability), list(preassigned_pairs), seed)
+    result = hungarian_optimizer(list(student_tops), dict(availability), list(preassigned_pairs), seed)
+    assert result == expected
+
+
+@pytest.mark.parametrize("solver", ["dense", "sparse"])
+@pytest.mark.unit
+def test_hungarian_optimizer_with_tops_index(solver):
+    """Test that a shared index of all the tops yields the same planning as the tops of the planned students."""
+    student_tops, availability = synthetic_cohort(300, 90, seed=11)
+    tops_index = get_tops_index(student_tops)
+    planned_tops = student_tops[::2]
+    preassigned_pairs = [(student_id, choices[0]) for student_id, choices in planned_tops[:3]]
+
+    expected = hungarian_optimizer(list(planned_tops), dict(availability), list(preassigned_pairs), 5, solver=solver)
+    result = hungarian_optimizer(
+        list(planned_tops), dict(availability), list(preassigned_pairs), 5, solver=solver, tops_index=tops_index
+    )
+    assert result == expected
+
+
+@pytest.mark.benchmark
+def test_hungarian_optimizer_timing():
+    """Compare the timing of the cost matrix constructions and solvers on a cohort of 2000 students and 600 places."""
+    student_tops, availability = synthetic_cohort(2000, 600, seed=42)
+    optimizers = {
+        "legacy": _legacy_hungarian_optimizer,
+        "dense": lambda *args: hungarian_optimizer(*args, solver="dense"),
+        "sparse": lambda *args: hungarian_optimizer(*args, solver="sparse"),
+    }
+    timings = {}
+    results = {}
+
+    for name, optimizer in optimizers.items():
+        start = perf_counter()
+        results[name] = optimizer(list(student_tops), dict(availability), None, 42)
+        timings[name] = perf_counter() - start
+
+    message = "hungarian_optimizer 2000x600: " + ", ".join(f"{name} {t:.3f}s" for name, t in timings.items())
+    assert results["legacy"] == results["dense"], message
+    assert sorted(pair[2] for pair in results["sparse"]) == sorted(pair[2] for pair in results["dense"]), message
+
+
+@pytest.mark.parametrize("num_students, num_places", [(50, 20), (300, 90), (600, 100)])
+@pytest.mark.unit
+def test_hungarian_optimizer_sparse_solver(num_students, num_places):
+    """Test that the sparse solver finds a planning with the same ranks as the dense one."""
+    student_tops, availability = synthetic_cohort(num_students, num_places, seed=num_students)
+
+    dense = hungarian_optimizer(list(student_tops), dict(availability), None, 3, solver="dense")
+    sparse = hungarian_optimizer(list(student_tops), dict(availability), None, 3, solver="sparse")
+    assert sorted(rank for _, _, rank, _ in sparse) == sorted(rank for _, _, rank, _ in dense)
+    assert len({student_id for student_id, _, _, _ in sparse}) == len(sparse)
+
+
+@pytest.mark.unit
+def test_hungarian_optimizer_sparse_solver_unmatched_students():
+    """Test that the sparse solver leaves out students without available tops, instead of failing."""
+    student_tops = [(1, [1, 2]), (2, [1]), (3, [1])]
+    availability = {1: 1, 2: 1, 3: 1}
+
+    with pytest.raises(ValueError):
+        hungarian_optimizer(list(student_tops), dict(availability), solver="dense")
+
+    result = hungarian_optimizer(list(student_tops), dict(availability), solver="sparse")
+    assert len(result) == 2
+    assert (1, 2, 2, False) in result
+
+
+@pytest.mark.unit
+def test_hungarian_optimizer_invalid_solver():
+    """Test that an invalid solver raises a ValueError."""
+    with pytest.raises(ValueError):
+        hungarian_optimizer([(1, [1])], {1: 1}, solver="greedy")
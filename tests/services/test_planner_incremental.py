@@ -0,0 +1,119 @@
+from collections import Counter
+
+import pytest
+
+from metis.services.planner.hungarian import hungarian_optimizer
+from metis.services.planner.incremental import PlanningDelta, get_moved_students, incremental_optimizer
+from metis.utils.fixtures.planning import synthetic_cohort
+
+
+def _assert_valid_planning(planning, student_tops, availability):
+    tops = dict(student_tops)
+    assert len({student_id for student_id, _, _, _ in planning}) == len(planning)
+    for place_id, count in Counter(place_id for _, place_id, _, _ in planning).items():
+        assert count <= availability[place_id]
+    for student_id, place_id, rank, preassigned in planning:
+        assert preassigned or tops[student_id].index(place_id) + 1 == rank
+
+
+@pytest.fixture()
+def planning_data():
+    """Provide a synthetic cohort with its optimal planning."""
+    student_tops, availability = synthetic_cohort(300, 60, num_tops=6, seed=5)
+    previous = hungarian_optimizer(list(student_tops), dict(availability), None, 1)
+    return previous, student_tops, availability
+
+
+@pytest.mark.unit
+def test_incremental_optimizer_without_changes(planning_data):
+    """Test that nobody moves if nothing changes."""
+    previous, student_tops, availability = planning_data
+    planning = incremental_optimizer(previous, student_tops, availability, PlanningDelta())
+    assert sorted(planning) == sorted(previous)
+
+
+@pytest.mark.parametrize("radius", [0, 1, None])
+@pytest.mark.unit
+def test_incremental_optimizer_changed_tops(planning_data, radius):
+    """Test that a student with new tops is re-planned, moving few other students."""
+    previous, student_tops, availability = planning_data
+    student_id, choices = student_tops[0]
+    delta = PlanningDelta(student_tops={student_id: choices[::-1]})
+
+    planning = incremental_optimizer(previous, student_tops, availability, delta, radius=radius)
+    new_tops = dict(student_tops) | delta.student_tops
+    _assert_valid_planning(planning, new_tops.items(), availability)
+    assert len(planning) == len(previous)
+
+    full = hungarian_optimizer(list(new_tops.items()), dict(availability), None, 1)
+    assert len(get_moved_students(previous, planning)) <= len(get_moved_students(previous, full))
+
+
+@pytest.mark.unit
+def test_incremental_optimizer_removed_student(planning_data):
+    """Test that a student without tops is removed from the planning."""
+    previous, student_tops, availability = planning_data
+    student_id = previous[0][0]
+
+    planning = incremental_optimizer(
+        previous, student_tops, availability, PlanningDelta(student_tops={student_id: None})
+    )
+    assert student_id not in {s for s, _, _, _ in planning}
+    assert len(planning) == len(previous)  # all the seats were taken, so somebody else gets the free seat
+    assert len(get_moved_students(previous, planning)) < 10
+
+
+@pytest.mark.unit
+def test_incremental_optimizer_seats(planning_data):
+    """Test that students are moved out of a place that lost seats, and into a place with new seats."""
+    previous, student_tops, availability = planning_data
+    full_place_id = Counter(place_id for _, place_id, _, _ in previous).most_common(1)[0][0]
+    delta = PlanningDelta(seats={full_place_id: -availability[full_place_id]})
+
+    planning = incremental_optimizer(previous, student_tops, availability, delta)
+    _assert_valid_planning(planning, student_tops, availability | {full_place_id: 0})
+    assert full_place_id not in {place_id for _, place_id, _, _ in planning}
+    assert len(planning) == min(len(previous), sum(availability.values()) - availability[full_place_id])
+
+    planning = incremental_optimizer(previous, student_tops, availability, PlanningDelta(seats={full_place_id: 5}))
+    _assert_valid_planning(planning, student_tops, availability | {full_place_id: availability[full_place_id] + 5})
+    assert len(planning) >= len(previous)
+    assert Counter(place_id for _, place_id, _, _ in planning)[full_place_id] == availability[full_place_id] + 5
+
+
+@pytest.mark.unit
+def test_incremental_optimizer_pinned_pairs():
+    """Test that pinned pairs are part of the new planning, as preassigned pairs."""
+    student_tops = [(1, [1, 2, 3]), (2, [2, 3, 1]), (3, [3, 1, 2])]
+    previous = [(1, 1, 1, False), (2, 2, 1, False), (3, 3, 1, False)]
+
+    planning = incremental_optimizer(previous, student_tops, {1: 1, 2: 1, 3: 1}, PlanningDelta(pinned_pairs=[(1, 2)]))
+    assert sorted(planning) == [(1, 2, 2, True), (2, 3, 2, False), (3, 1, 2, False)]
+
+    planning = incremental_optimizer(planning, student_tops, {1: 1, 2: 1, 3: 1}, PlanningDelta())
+    assert sorted(planning) == [(1, 2, 2, True), (2, 3, 2, False), (3, 1, 2, False)]
+
+    # a new pin of the same student replaces the previous one
+    planning = incremental_optimizer(planning, student_tops, {1: 1, 2: 1, 3: 1}, PlanningDelta(pinned_pairs=[(1, 3)]))
+    assert sorted(planning) == [(1, 3, 3, True), (2, 2, 1, False), (3, 1, 2, False)]
+
+
+@pytest.mark.unit
+def test_incremental_optimizer_pinned_pairs_without_seats():
+    """Test that students cannot be pinned to a place without a free seat for them."""
+    student_tops = [(1, [1, 2]), (2, [2, 1])]
+    previous = [(1, 1, 1, True), (2, 2, 1, False)]
+
+    with pytest.raises(ValueError):
+        incremental_optimizer(previous, student_tops, {1: 1, 2: 1}, PlanningDelta(pinned_pairs=[(2, 1)]))
+
+    with pytest.raises(ValueError):
+        incremental_optimizer(previous, student_tops, {1: 1, 2: 1}, PlanningDelta(pinned_pairs=[(2, 3)]))
+
+
+@pytest.mark.unit
+def test_get_moved_students():
+    """Test the comparison of two plannings."""
+    previous = [(1, 1, 1, False), (2, 2, 1, False), (3, 3, 1, False)]
+    planning = [(1, 1, 1, False), (2, 3, 2, False), (4, 2, 1, False)]
+    assert get_moved_students(previous, planning) == {2, 3, 4}
@@ -0,0 +1,70 @@
+from functools import partial
+
+import pytest
+
+from metis.services.planner.flow import min_cost_flow_optimizer
+from metis.services.planner.hungarian import hungarian_optimizer
+from metis.services.planner.sweep import SweepResult, sweep_optimizer
+from metis.utils.fixtures.planning import synthetic_cohort
+
+
+@pytest.mark.unit
+def test_sweep_result():
+    """Test the outcome statistics of a planning."""
+    result = SweepResult(seed=1, planning=[(1, 1, 1, False), (2, 2, 3, False), (3, 3, 1, True)])
+    assert result.histogram == {1: 2, 3: 1}
+    assert result.sum_of_ranks == 5
+    assert result.first_choices == 2
+    assert result.worst_rank == 3
+
+
+@pytest.mark.unit
+def test_sweep_optimizer():
+    """Test that each seed of the sweep gives the same planning as a single run with that seed."""
+    student_tops, availability = synthetic_cohort(80, 25, num_tops=5, seed=1)
+    seeds = list(range(1, 9))
+
+    results, best = sweep_optimizer(student_tops, availability, None, seeds, max_workers=2)
+    assert [result.seed for result in results] == seeds
+
+    for result in results:
+        assert result.planning == hungarian_optimizer(list(student_tops), dict(availability), None, result.seed)
+
+    assert best == min(results, key=lambda r: (r.sum_of_ranks, -r.first_choices, r.worst_rank))
+
+
+@pytest.mark.parametrize("objective", ["sum_of_ranks", "first_choices", "worst_rank"])
+@pytest.mark.unit
+def test_sweep_optimizer_objectives(objective):
+    """Test that the best seed is chosen by the given objective, and that the sweep does not modify its input."""
+    student_tops, availability = synthetic_cohort(60, 20, num_tops=4, seed=2)
+    original_tops, original_availability = list(student_tops), dict(availability)
+    preassigned_pairs = [(student_tops[0][0], student_tops[0][1][0])]
+
+    results, best = sweep_optimizer(
+        student_tops, availability, preassigned_pairs, range(1, 6), objective=objective, max_workers=1
+    )
+    assert getattr(best, objective) == (max if objective == "first_choices" else min)(
+        getattr(result, objective) for result in results
+    )
+    assert all((*preassigned_pairs[0], 1, True) in result.planning for result in results)
+    assert student_tops == original_tops
+    assert availability == original_availability
+
+
+@pytest.mark.unit
+def test_sweep_optimizer_with_flow():
+    """Test the sweep with another (partial) optimizer."""
+    student_tops = [(1, [1, 2]), (2, [1, 2]), (3, [1, 2])]
+    optimizer = partial(min_cost_flow_optimizer, project_place_minimum={2: 2})
+
+    results, best = sweep_optimizer(student_tops, {1: 3, 2: 3}, None, [1, 2], optimizer=optimizer, max_workers=2)
+    assert len(results) == 2
+    assert best.histogram == {1: 1, 2: 2}
+
+
+@pytest.mark.unit
+def test_sweep_optimizer_invalid_objective():
+    """Test that an invalid objective raises a ValueError."""
+    with pytest.raises(ValueError):
+        sweep_optimizer([(1, [1])], {1: 1}, None, [1], objective="happiness")
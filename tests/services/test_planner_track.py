@@ -0,0 +1,152 @@
+from collections import Counter
+
+import pytest
+
+from metis.services.planner.flow import min_cost_flow_optimizer
+from metis.services.planner.track import TrackConstraint, track_optimizer
+from metis.utils.fixtures.planning import synthetic_cohort
+
+
+# project places 1..4 each cover one discipline 1..4, project place 5 covers disciplines 1 and 2
+PLACE_DISCIPLINES = {1: [1], 2: [2], 3: [3], 4: [4], 5: [1, 2]}
+
+
+def _validate(planning, constraints, covered_disciplines=None):
+    """Check a track planning against the constraints, per student."""
+    covered_disciplines = covered_disciplines or {}
+    disciplines = {}
+    for _, student_id, _, discipline_id, _ in planning:
+        disciplines.setdefault(student_id, Counter(covered_disciplines.get(student_id, {})))[discipline_id] += 1
+
+    for counts in disciplines.values():
+        for constraint in constraints:
+            total = sum(counts[d] for d in constraint.disciplines)
+            if constraint.max_count is not None and total > constraint.max_count:
+                return False
+            if constraint.max_repeat is not None and any(
+                counts[d] > constraint.max_repeat for d in constraint.disciplines
+            ):
+                return False
+    return True
+
+
+@pytest.mark.unit
+def test_track_optimizer_without_constraints():
+    """Test that each period is planned on its own when the track has no constraints."""
+    period_tops = {10: [(1, [1, 2]), (2, [1, 2])], 20: [(1, [1, 2]), (2, [2, 1])]}
+    period_availability = {10: {1: 1, 2: 1}, 20: {1: 1, 2: 1}}
+
+    result = track_optimizer(period_tops, period_availability, PLACE_DISCIPLINES, [])
+    assert sorted(rank for period_id, _, _, _, rank in result if period_id == 10) == [1, 2]
+    assert sorted(result)[2:] == [(20, 1, 1, 1, 1), (20, 2, 2, 2, 1)]
+
+
+@pytest.mark.unit
+def test_track_optimizer_max_repeat():
+    """Test that a student does not get the same discipline twice, even if it is the first choice of each period."""
+    constraints = [TrackConstraint(disciplines=frozenset({1, 2, 3, 4}), max_repeat=1)]
+    period_tops = {10: [(1, [1, 2, 3])], 20: [(1, [1, 2, 3])], 30: [(1, [1, 2, 3])]}
+    period_availability = {period_id: {1: 1, 2: 1, 3: 1} for period_id in period_tops}
+
+    result = track_optimizer(period_tops, period_availability, PLACE_DISCIPLINES, constraints)
+    assert sorted(discipline_id for _, _, _, discipline_id, _ in result) == [1, 2, 3]
+    assert sorted(rank for _, _, _, _, rank in result) == [1, 2, 3]
+
+
+@pytest.mark.unit
+def test_track_optimizer_min_count():
+    """Test that a required discipline is planned in one of the periods, at the best rank overall."""
+    constraints = [
+        TrackConstraint(disciplines=frozenset({4}), min_count=1, max_count=1),
+        TrackConstraint(disciplines=frozenset({1, 2, 3}), max_repeat=None),
+    ]
+    period_tops = {10: [(1, [1, 4])], 20: [(1, [2, 3, 4])]}
+    period_availability = {10: {1: 1, 4: 1}, 20: {2: 1, 3: 1, 4: 1}}
+
+    result = track_optimizer(period_tops, period_availability, PLACE_DISCIPLINES, constraints)
+    assert sorted(result) == [(10, 1, 4, 4, 2), (20, 1, 2, 2, 1)]
+
+
+@pytest.mark.unit
+def test_track_optimizer_min_count_with_remaining_positions():
+    """Test that a minimum is left to the periods that are not planned, if the student still has positions there."""
+    constraints = [
+        TrackConstraint(disciplines=frozenset({4}), min_count=1, max_count=1),
+        TrackConstraint(disciplines=frozenset({1, 2, 3}), max_repeat=None),
+    ]
+    period_tops = {10: [(1, [1, 4])], 20: [(1, [2, 3, 4])]}
+    period_availability = {10: {1: 1, 4: 1}, 20: {2: 1, 3: 1, 4: 1}}
+
+    result = track_optimizer(
+        period_tops, period_availability, PLACE_DISCIPLINES, constraints, remaining_positions={1: 1}
+    )
+    assert sorted(result) == [(10, 1, 1, 1, 1), (20, 1, 2, 2, 1)]
+
+
+@pytest.mark.unit
+def test_track_optimizer_place_with_several_disciplines():
+    """Test that the discipline of a place with several disciplines is chosen to satisfy the constraints."""
+    constraints = [TrackConstraint(disciplines=frozenset({1, 2}), min_count=2, max_count=2, max_repeat=1)]
+    period_tops = {10: [(1, [1])], 20: [(1, [5])]}
+    period_availability = {10: {1: 1}, 20: {5: 1}}
+
+    result = track_optimizer(period_tops, period_availability, PLACE_DISCIPLINES, constraints)
+    assert sorted(result) == [(10, 1, 1, 1, 1), (20, 1, 5, 2, 1)]
+
+
+@pytest.mark.unit
+def test_track_optimizer_covered_and_period_disciplines():
+    """Test that covered disciplines count for the constraints, and periods only allow their disciplines."""
+    constraints = [TrackConstraint(disciplines=frozenset({1, 2, 3, 4}), max_repeat=1)]
+    period_tops = {10: [(1, [1, 2, 3, 4]), (2, [1, 2, 3, 4])]}
+    period_availability = {10: {1: 2, 2: 2, 3: 2, 4: 2}}
+
+    result = track_optimizer(
+        period_tops,
+        period_availability,
+        PLACE_DISCIPLINES,
+        constraints,
+        period_disciplines={10: [2, 3, 4]},
+        covered_disciplines={1: Counter({2: 1})},
+    )
+    assert sorted(result) == [(10, 1, 3, 3, 3), (10, 2, 2, 2, 2)]
+
+
+@pytest.mark.unit
+def test_track_optimizer_max_count_leaves_student_unmatched():
+    """Test that a maximum is never exceeded, even if the student is left without a place."""
+    constraints = [TrackConstraint(disciplines=frozenset({1, 2}), max_count=1, max_repeat=None)]
+    period_tops = {10: [(1, [1])], 20: [(1, [2])]}
+    period_availability = {10: {1: 1}, 20: {2: 1}}
+
+    result = track_optimizer(period_tops, period_availability, PLACE_DISCIPLINES, constraints)
+    assert len(result) == 1
+
+
+@pytest.mark.parametrize("seed", [None, 3])
+@pytest.mark.unit
+def test_track_optimizer_matches_single_period_planning(seed):
+    """Test that a single period without constraints is planned with the same ranks as the min-cost-flow planner."""
+    student_tops, availability = synthetic_cohort(60, 20, num_tops=5, seed=5)
+    place_disciplines = {project_place_id: [project_place_id % 4] for project_place_id in availability}
+
+    expected = min_cost_flow_optimizer(student_tops, availability, None, seed)
+    result = track_optimizer({1: student_tops}, {1: availability}, place_disciplines, [], seed=seed)
+    assert sorted(rank for *_, rank in result) == sorted(rank for _, _, rank, _ in expected)
+
+
+@pytest.mark.unit
+def test_track_optimizer_synthetic_cohort_is_valid():
+    """Test that a planning of several periods of a synthetic cohort satisfies the track constraints."""
+    constraints = [
+        TrackConstraint(disciplines=frozenset({0, 1}), min_count=1, max_count=2, max_repeat=1),
+        TrackConstraint(disciplines=frozenset({2, 3}), min_count=1, max_count=2, max_repeat=1),
+    ]
+    period_tops, period_availability = {}, {}
+    for period_id in range(3):
+        period_tops[period_id], period_availability[period_id] = synthetic_cohort(40, 15, num_tops=6, seed=period_id)
+    place_disciplines = {project_place_id: [project_place_id % 4] for project_place_id in range(1, 16)}
+
+    result = track_optimizer(period_tops, period_availability, place_disciplines, constraints, seed=1)
+    assert _validate(result, constraints)
+    assert len({(period_id, student_id) for period_id, student_id, *_ in result}) == len(result)
@@ -1,6 +1,6 @@
 import pytest
 
-from metis.services.planner.utils import find_students_for_places
+from metis.services.planner.utils import find_students_for_places, get_tops_index
 
 
 @pytest.mark.parametrize(
@@ -28,3 +28,22 @@ def test_student_finder_for_places(student_tops, project_places, expected):
     """Test the hungarian optimizer with preassigned pairs."""
     result = find_students_for_places(student_tops, project_places)
     assert result == expected
+
+
+@pytest.mark.unit
+def test_tops_index():
+    """Test the inverted index of the tops, sorted by rank and skipping students without tops."""
+    student_tops = [(1, [1, 2, 3]), (2, [2, 3, 1]), (3, None), (4, [2])]
+    assert get_tops_index(student_tops) == {
+        1: [(0, 1), (2, 2)],
+        2: [(0, 2), (0, 4), (1, 1)],
+        3: [(1, 2), (2, 1)],
+    }
+
+
+@pytest.mark.unit
+def test_student_finder_for_places_with_tops_index():
+    """Test that a shared index of all the tops only returns the students of the given tops."""
+    tops_index = get_tops_index([(1, [1, 2, 3]), (2, [2, 3, 1]), (3, [3, 1, 2])])
+    result = find_students_for_places([(1, [1, 2, 3]), (3, [3, 1, 2])], [1, 2], tops_index=tops_index)
+    assert result == {1: [1, 3], 2: [1, 3]}
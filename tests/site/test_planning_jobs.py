@@ -0,0 +1,178 @@
+from http import HTTPStatus as status
+from unittest import mock
+
+import pytest
+from django.urls import reverse
+
+from metis.models import ProjectPlaceAvailability
+from metis.services.file_generator.planner.jobs import (
+    get_planning_file_code,
+    get_planning_inputs_fingerprint,
+    get_planning_job,
+    get_planning_job_id,
+    run_planning_job,
+    start_planning_job,
+)
+from metis.services.file_generator.planner.planning import PlanningExcelOptions, validate_planning_options
+
+
+@pytest.fixture(autouse=True)
+def media_root(settings, tmp_path):
+    """Store the planning files in a temporary directory."""
+    settings.MEDIA_ROOT = tmp_path
+
+
+@pytest.mark.site
+def test_planning_file_job(client, t_office_member, t_tops_questioning):
+    """Test that the planning file is generated by a job, and downloaded from the job page."""
+    client.force_login(user=t_office_member)
+
+    response = client.get(reverse("planning_file", args=[t_tops_questioning.id]), {"solver": "flow"})
+    assert response.status_code == status.FOUND
+
+    job_id = response.url.rstrip("/").split("/")[-1]
+    assert response.url == reverse("planning_job", args=[t_tops_questioning.id, job_id])
+    assert t_tops_questioning.files.filter(code=get_planning_file_code(job_id)).count() == 1
+
+    response = client.get(response.url)
+    assert response.status_code == status.OK
+    assert response["Content-Disposition"].startswith("attachment")
+
+
+@pytest.mark.site
+def test_planning_file_invalid_options(client, t_office_member, t_tops_questioning):
+    """Test that invalid planning options are rejected before a job is started."""
+    client.force_login(user=t_office_member)
+
+    response = client.get(reverse("planning_file", args=[t_tops_questioning.id]), {"sweep": "1000"})
+    assert response.status_code == status.BAD_REQUEST
+    assert not t_tops_questioning.files.exists()
+
+
+@pytest.mark.site
+@pytest.mark.parametrize("option", ["s_first", "s_skip", "p_force", "p_skip"])
+def test_planning_file_unknown_ids(client, t_office_member, t_tops_questioning, option):
+    """Test that students or project places that are not part of the questioning are rejected before a job starts."""
+    client.force_login(user=t_office_member)
+
+    response = client.get(reverse("planning_file", args=[t_tops_questioning.id]), {option: "0"})
+    assert response.status_code == status.BAD_REQUEST
+    assert not t_tops_questioning.files.exists()
+
+
+@pytest.mark.site
+def test_validate_planning_options(t_tops_questioning):
+    """Test that the students and project places of the questioning are valid planning options."""
+    response = t_tops_questioning.responses.exclude(data__tops=None).first()
+    options = PlanningExcelOptions(
+        students_with_first_choice=[response.object_id],
+        places_with_students=[response.data["tops"][0]],
+        places_to_skip=[response.data["tops"][-1]],
+    )
+    validate_planning_options(t_tops_questioning, options)
+
+    with pytest.raises(ValueError):
+        validate_planning_options(
+            t_tops_questioning, options.model_copy(update={"students_to_skip": [response.object_id]})
+        )
+
+
+@pytest.mark.site
+def test_planning_job_unknown(client, t_office_member, t_tops_questioning):
+    """Test that an unknown job is not found."""
+    client.force_login(user=t_office_member)
+
+    response = client.get(reverse("planning_job", args=[t_tops_questioning.id, "0123456789abcdef"]))
+    assert response.status_code == status.NOT_FOUND
+
+
+@pytest.mark.site
+def test_planning_job_failed(client, t_office_member, t_tops_questioning, locmem_cache, caplog):
+    """Test that a failed job logs its error, and that its page only shows a generic message."""
+    job_id = get_planning_job_id(t_tops_questioning, PlanningExcelOptions())
+
+    with (
+        mock.patch("metis.services.file_generator.planner.jobs.PlanningExcel", side_effect=RuntimeError("secret")),
+        pytest.raises(RuntimeError),
+    ):
+        run_planning_job(t_tops_questioning.id, {}, job_id)
+
+    assert "secret" in caplog.text
+    assert get_planning_job(t_tops_questioning, job_id).state == "failed"
+
+    client.force_login(user=t_office_member)
+    response = client.get(reverse("planning_job", args=[t_tops_questioning.id, job_id]))
+    assert response.status_code == status.OK
+    assert b"secret" not in response.content
+
+
+@pytest.mark.site
+def test_planning_job_invalid_planning(client, t_office_member, t_tops_questioning, locmem_cache, caplog):
+    """Test that a job that can't make the planning with its options shows why on its page."""
+    job_id = get_planning_job_id(t_tops_questioning, PlanningExcelOptions())
+    error = "The pinned students exceed the capacity of project place 1"
+
+    with mock.patch("metis.services.file_generator.planner.jobs.PlanningExcel", side_effect=ValueError(error)):
+        run_planning_job(t_tops_questioning.id, {}, job_id)
+
+    assert not caplog.records
+    assert get_planning_job(t_tops_questioning, job_id) == (job_id, "failed", None, error)
+
+    client.force_login(user=t_office_member)
+    response = client.get(reverse("planning_job", args=[t_tops_questioning.id, job_id]))
+    assert response.status_code == status.OK
+    assert error.encode() in response.content
+
+
+@pytest.mark.site
+def test_planning_job_access(client, t_random_user, t_tops_questioning):
+    """Test that only the office members of the project can start a planning job."""
+    client.force_login(user=t_random_user)
+
+    response = client.get(reverse("planning_file", args=[t_tops_questioning.id]))
+    assert response.status_code == status.FORBIDDEN
+
+
+@pytest.mark.site
+def test_start_planning_job_deduplicates_running_jobs(t_tops_questioning, locmem_cache):
+    """Test that identical option sets share one job, and that a running job is not started twice."""
+    options = PlanningExcelOptions(solver="sparse")
+
+    with mock.patch("metis.tasks.planning.generate_planning_file") as generate_planning_file:
+        job = start_planning_job(t_tops_questioning, options)
+        same_job = start_planning_job(t_tops_questioning, PlanningExcelOptions(solver="sparse"))
+        other_job = start_planning_job(t_tops_questioning, PlanningExcelOptions(solver="dense"))
+
+    assert job.job_id == same_job.job_id != other_job.job_id
+    assert job.state == same_job.state == "queued"
+    assert generate_planning_file.call_count == 2
+    assert get_planning_job(t_tops_questioning, job.job_id).is_running
+
+
+@pytest.mark.site
+def test_planning_job_reuses_file_until_inputs_change(t_tops_questioning):
+    """Test that a finished planning is served from its stored file, until a response or the availability changes."""
+    options = PlanningExcelOptions(solver="sparse")
+    job = start_planning_job(t_tops_questioning, options)
+    assert job.state == "done"
+
+    with mock.patch("metis.tasks.planning.generate_planning_file") as generate_planning_file:
+        same_job = start_planning_job(t_tops_questioning, PlanningExcelOptions(solver="sparse"))
+    assert same_job.job_id == job.job_id
+    assert same_job.file == job.file
+    generate_planning_file.assert_not_called()
+
+    response = t_tops_questioning.responses.first()
+    response.data = {"tops": list(reversed(response.data["tops"]))}
+    response.save()
+    assert get_planning_inputs_fingerprint(t_tops_questioning) not in job.job_id
+
+    new_job = start_planning_job(t_tops_questioning, options)
+    assert new_job.job_id != job.job_id
+    assert new_job.state == "done"
+    assert get_planning_job(t_tops_questioning, job.job_id) is None
+
+    availability = ProjectPlaceAvailability.objects.filter(period=t_tops_questioning.period).first()
+    availability.max += 1
+    availability.save()
+    assert get_planning_job_id(t_tops_questioning, options) != new_job.job_id
@@ -0,0 +1,70 @@
+from http import HTTPStatus as status
+
+import pytest
+from django.urls import reverse
+
+from metis.models import Track
+from metis.services.file_generator.planner.jobs import get_planning_file_code
+
+
+@pytest.fixture(autouse=True)
+def media_root(settings, tmp_path):
+    """Store the planning files in a temporary directory."""
+    settings.MEDIA_ROOT = tmp_path
+
+
+def _track_planning_url(project) -> str:
+    return reverse("project_excel", args=[project.id, "track_planning"])
+
+
+@pytest.mark.site
+def test_track_planning_file(client, t_office_member, t_tops_questioning):
+    """Test that the planning of a track is generated by a job, and downloaded from the job page."""
+    project = t_tops_questioning.project
+    track = t_tops_questioning.period.program_internship.tracks.first().track
+    client.force_login(user=t_office_member)
+
+    response = client.get(_track_planning_url(project), {"track": track.id})
+    assert response.status_code == status.FOUND
+
+    job_id = response.url.rstrip("/").split("/")[-1]
+    assert response.url == reverse("track_planning_job", args=[project.id, job_id])
+    assert project.files.filter(code=get_planning_file_code(job_id)).count() == 1
+
+    response = client.get(response.url)
+    assert response.status_code == status.OK
+    assert response["Content-Disposition"].startswith("attachment")
+
+    # the stored file is reused until the inputs change
+    response = client.get(_track_planning_url(project), {"track": track.id})
+    assert response.url.rstrip("/").split("/")[-1] == job_id
+    assert project.files.filter(code=get_planning_file_code(job_id)).count() == 1
+
+
+@pytest.mark.site
+@pytest.mark.parametrize("track", ["", "abc", "0"])
+def test_track_planning_file_invalid_track(client, t_office_member, t_project, track):
+    """Test that an invalid or unknown track is rejected."""
+    client.force_login(user=t_office_member)
+
+    response = client.get(_track_planning_url(t_project), {"track": track})
+    assert response.status_code in {status.BAD_REQUEST, status.NOT_FOUND}
+
+
+@pytest.mark.site
+def test_track_planning_file_access(client, t_random_user, t_project):
+    """Test that only the office members of the project can download the planning of a track."""
+    track = Track.objects.filter(program_id=t_project.program_id).first()
+    client.force_login(user=t_random_user)
+
+    response = client.get(_track_planning_url(t_project), {"track": track.id})
+    assert response.status_code == status.FORBIDDEN
+
+
+@pytest.mark.site
+def test_track_planning_job_access(client, t_random_user, t_project):
+    """Test that only the office members of the project can follow a track planning job."""
+    client.force_login(user=t_random_user)
+
+    response = client.get(reverse("track_planning_job", args=[t_project.id, "0123456789abcdef"]))
+    assert response.status_code == status.FORBIDDEN